@@ -2,7 +2,12 @@ from flask import jsonify, request
 import requests
 import dotenv
 import os
-from jose import jwt
+import functools
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from jose import jwt, jwk
 
 dotenv.load_dotenv()
 
@@ -10,9 +15,142 @@ AUTH0_DOMAIN = os.environ.get("AUTH0_DOMAIN")
 API_IDENTIFIER = os.environ.get("API_IDENTIFIER")
 ALGORITHMS = ["RS256"]
 
-# Get JWKS
-jwks_url = f"https://{AUTH0_DOMAIN}/.well-known/jwks.json"
-jwks = requests.get(jwks_url).json()
+# JWKS settings (URL can be pointed at a local server for testing)
+JWKS_URL = os.environ.get("JWKS_URL") or f"https://{AUTH0_DOMAIN}/.well-known/jwks.json"
+JWKS_CACHE_TTL = int(os.environ.get("JWKS_CACHE_TTL", 3600))
+JWKS_MIN_REFRESH_INTERVAL = int(os.environ.get("JWKS_MIN_REFRESH_INTERVAL", 30))
+
+# Verified token cache settings
+TOKEN_CACHE_SIZE = int(os.environ.get("TOKEN_CACHE_SIZE", 1024))
+
+
+class JWKSCache:
+    """Signing keys from the JWKS endpoint, indexed by kid"""
+
+    def __init__(self, url, ttl=JWKS_CACHE_TTL, min_refresh_interval=JWKS_MIN_REFRESH_INTERVAL,
+                 fetch=None, clock=time.monotonic):
+        self.url = url
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self._fetch = fetch or self._fetch_jwks
+        self._clock = clock
+        self._keys = {}
+        self._fetched_at = None
+        # Last fetch attempt, successful or not; refreshes back off from it
+        self._attempted_at = None
+        self._lock = threading.Lock()
+
+    def _fetch_jwks(self):
+        """Download the JWKS document"""
+        response = requests.get(self.url, timeout=5)
+        response.raise_for_status()
+        return response.json()
+
+    def _is_stale(self):
+        return self._fetched_at is None or self._clock() - self._fetched_at >= self.ttl
+
+    def _can_refresh(self):
+        return self._attempted_at is None or self._clock() - self._attempted_at >= self.min_refresh_interval
+
+    def refresh(self, force=False):
+        """Reload keys; concurrent callers wait for a single fetch
+
+        A failed fetch keeps serving the cached keys, and no further fetch is
+        attempted for min_refresh_interval, so an outage never queues fetches.
+        """
+        attempted_at = self._attempted_at
+        with self._lock:
+            # Another thread tried (and succeeded or failed) while we waited for the lock
+            if self._attempted_at != attempted_at:
+                return
+            if not force and not self._is_stale():
+                return
+            if not self._can_refresh():
+                return
+
+            self._attempted_at = self._clock()
+            try:
+                jwks = self._fetch()
+            except Exception as e:
+                if not self._keys:
+                    raise
+                print(f"JWKS refresh failed, serving cached keys: {e}")
+                return
+
+            keys = {}
+            for key in jwks.get("keys", []):
+                if key.get("kty") != "RSA" or "kid" not in key:
+                    continue
+                keys[key["kid"]] = jwk.construct(key, key.get("alg", ALGORITHMS[0]))
+
+            self._keys = keys
+            self._fetched_at = self._clock()
+
+    def get_key(self, kid):
+        """Return the parsed key for kid, refreshing once if it is unknown"""
+        if self._is_stale():
+            self.refresh()
+
+        key = self._keys.get(kid)
+        if key is None:
+            # Unknown kid usually means the signing keys were rotated. refresh()
+            # backs off on its own, and waits out a fetch another caller started
+            self.refresh(force=True)
+            key = self._keys.get(kid)
+        return key
+
+
+class TokenCache:
+    """LRU cache of verified token payloads, each expiring at the token's exp"""
+
+    def __init__(self, maxsize=TOKEN_CACHE_SIZE, clock=time.time):
+        self.maxsize = maxsize
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token):
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token):
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, payload = entry
+                if self._clock() < expires_at:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return payload
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, token, payload):
+        expires_at = payload.get("exp")
+        if not expires_at or self.maxsize <= 0:
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (expires_at, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+jwks_cache = JWKSCache(JWKS_URL)
+token_cache = TokenCache()
 
 def get_token_auth_header():
     auth = request.headers.get("Authorization", None)
@@ -28,20 +166,15 @@ def get_token_auth_header():
     return parts[1]
 
 def verify_jwt(token):
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
+
     unverified_header = jwt.get_unverified_header(token)
-    rsa_key = {}
-    for key in jwks["keys"]:
-        if key["kid"] == unverified_header["kid"]:
-            rsa_key = {
-                "kty": key["kty"],
-                "kid": key["kid"],
-                "use": key["use"],
-                "n": key["n"],
-                "e": key["e"]
-            }
-    if not rsa_key:
+    rsa_key = jwks_cache.get_key(unverified_header.get("kid"))
+    if rsa_key is None:
         raise Exception("No RSA key found.")
-    
+
     payload = jwt.decode(
         token,
         rsa_key,
@@ -49,9 +182,11 @@ def verify_jwt(token):
         audience=API_IDENTIFIER,
         issuer=f"https://{AUTH0_DOMAIN}/"
     )
+    token_cache.put(token, payload)
     return payload
 
 def requires_auth(f):
+    @functools.wraps(f)
     def decorated(*args, **kwargs):
         token = get_token_auth_header()
         try:
@@ -59,4 +194,4 @@ def requires_auth(f):
             return f(*args, **kwargs, user=payload)
         except Exception as e:
             return jsonify({"error": str(e)}), 401
-    return decorated
\ No newline at end of file
+    return decorated
@@ -0,0 +1,130 @@
+"""Per-request decode latency and bytes written: in-memory Whisper input vs the old temp WAV path
+
+    python benchmarks/bench_audio_decode.py [--seconds 30] [--runs 5] [--model base]
+
+The corpus is fixed synthetic clips: a 16 kHz mono WAV (the fast path that
+skips ffmpeg), a 44.1 kHz stereo WAV, and MP3/Ogg encodes of it when pydub and
+ffmpeg are installed. "in-memory" is decode_audio(...).to_float32(). "temp wav"
+is the pre-change path: pydub decode, export to a NamedTemporaryFile, then the
+ffmpeg re-decode whisper.load_audio runs on that path. Bytes written is this
+process's wchar from /proc/self/io, so it counts the temp file and anything
+piped to ffmpeg. --model also times Whisper itself on each input.
+"""
+import argparse
+import importlib.util
+import io
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [BACKEND_DIR, os.path.dirname(BACKEND_DIR), os.path.join(BACKEND_DIR, 'tests')]
+
+import numpy as np
+from audio_fixtures import recording, tone, wav_bytes
+from backend.endpoints.audio_ingest import TARGET_RATE, decode_audio
+
+HAVE_PYDUB = importlib.util.find_spec('pydub') is not None and shutil.which('ffmpeg') is not None
+
+
+def bytes_written():
+    with open('/proc/self/io') as counters:
+        for line in counters:
+            if line.startswith('wchar:'):
+                return int(line.split()[1])
+
+
+def corpus(seconds):
+    """[(label, upload bytes, format)] built the same way on every run"""
+    pattern = [(3, True), (1, False)] * max(1, int(seconds // 4))
+    clips = [('wav 16k mono', wav_bytes(recording(pattern)), 'wav')]
+
+    left = tone(seconds, frequency=220, rate=44100)
+    right = tone(seconds, frequency=330, rate=44100)
+    stereo = wav_bytes(np.column_stack((left, right)).tobytes(), rate=44100, channels=2)
+    clips.append(('wav 44.1k stereo', stereo, 'wav'))
+
+    if HAVE_PYDUB:
+        from pydub import AudioSegment
+        segment = AudioSegment.from_file(io.BytesIO(stereo), format='wav')
+        for fmt, label in (('mp3', 'mp3 44.1k stereo'), ('ogg', 'ogg 44.1k stereo')):
+            encoded = io.BytesIO()
+            segment.export(encoded, format=fmt)
+            clips.append((label, encoded.getvalue(), fmt))
+    return clips
+
+
+def in_memory(data, fmt):
+    return decode_audio(io.BytesIO(data)).to_float32()
+
+
+def temp_wav(data, fmt):
+    """The old transcribe_with_whisper input path, ending where whisper.load_audio does"""
+    from pydub import AudioSegment
+    segment = AudioSegment.from_file(io.BytesIO(data), format=fmt).set_channels(1).set_frame_rate(TARGET_RATE)
+    tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
+    try:
+        segment.export(tmp_file.name, format='wav')
+        pcm = subprocess.run(
+            ['ffmpeg', '-nostdin', '-threads', '0', '-i', tmp_file.name,
+             '-f', 's16le', '-ac', '1', '-acodec', 'pcm_s16le', '-ar', str(TARGET_RATE), '-'],
+            capture_output=True, check=True
+        ).stdout
+    finally:
+        tmp_file.close()
+        os.unlink(tmp_file.name)
+    return np.frombuffer(pcm, dtype='<i2').astype(np.float32) / 32768.0
+
+
+def measure(path, data, fmt, runs, model=None):
+    """(median seconds, bytes written per request)"""
+    timings = []
+    written = bytes_written()
+    for _ in range(runs):
+        started = time.perf_counter()
+        samples = path(data, fmt)
+        if model is not None:
+            model.transcribe(samples, fp16=False)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), (bytes_written() - written) / runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=30, help='length of each clip')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--model', help='also run this Whisper model on each decoded input')
+    args = parser.parse_args()
+
+    model = None
+    if args.model:
+        from backend.endpoints.whisper_model import WhisperModelManager
+        model = WhisperModelManager(args.model)
+        if not model.load():
+            sys.exit(f'Could not load Whisper: {model.error}')
+
+    paths = [('in-memory', in_memory)]
+    if HAVE_PYDUB:
+        paths.append(('temp wav', temp_wav))
+    else:
+        print('pydub or ffmpeg missing: only 16 kHz WAV (no ffmpeg needed) is decoded')
+
+    print(f'{args.seconds:g}s clips, median of {args.runs} runs{", with Whisper " + args.model if model else ""}')
+    print(f'{"clip":18} {"path":10} {"latency":>10} {"bytes written":>14}')
+    for label, data, fmt in corpus(args.seconds):
+        for name, path in paths:
+            try:
+                latency, written = measure(path, data, fmt, args.runs, model)
+            except (ImportError, OSError, subprocess.CalledProcessError) as error:
+                # Without ffmpeg only the WAV fast path can decode
+                print(f'{label:18} {name:10} {"skipped":>10}  {error}')
+                continue
+            print(f'{label:18} {name:10} {latency * 1000:7.1f} ms {written:14,.0f}')
+
+
+if __name__ == '__main__':
+    main()
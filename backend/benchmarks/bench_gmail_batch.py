@@ -0,0 +1,68 @@
+"""Page latency of GmailService.get_messages, batched vs one messages.get per message
+
+    python benchmarks/bench_gmail_batch.py [--sizes 10 50 100] [--latency-ms 40] [--repeat 3]
+
+Runs against tests/fake_gmail.py, a local HTTP stand-in for Gmail that adds a
+fixed delay to every round trip. The sequential column replays the old code
+path: messages.list, then one messages.get per id.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [BACKEND_DIR, os.path.dirname(BACKEND_DIR), os.path.join(BACKEND_DIR, 'tests')]
+
+from fake_gmail import FakeGmail
+from backend.endpoints.gmail_service import LIST_REQUEST_PARAMS, GmailService
+
+
+def sequential_page(service, max_results):
+    message_ids, _ = service._list_message_ids(max_results=max_results)
+    return [
+        service._extract_message_data(
+            service.service.users().messages().get(userId='me', id=message_id, **LIST_REQUEST_PARAMS).execute(),
+            include_body=False
+        )
+        for message_id in message_ids
+    ]
+
+
+def batched_page(service, max_results):
+    return service.get_messages(max_results=max_results)['messages']
+
+
+def measure(fake, page, service, size, repeat):
+    """Median seconds and round trips for one page of size messages"""
+    timings = []
+    fake.round_trips = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        messages = page(service, size)
+        timings.append(time.perf_counter() - started)
+        assert len(messages) == size, len(messages)
+    return statistics.median(timings), fake.round_trips // repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 50, 100])
+    parser.add_argument('--latency-ms', type=float, default=40)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with FakeGmail(messages=max(args.sizes), latency=args.latency_ms / 1000) as fake:
+        service = fake.connect(GmailService())
+        print(f'{args.latency_ms:.0f} ms per round trip')
+        print(f'{"messages":>8} {"sequential":>16} {"batched":>16} {"speedup":>8}')
+        for size in args.sizes:
+            sequential, sequential_trips = measure(fake, sequential_page, service, size, args.repeat)
+            batched, batched_trips = measure(fake, batched_page, service, size, args.repeat)
+            print(f'{size:8d} {sequential * 1000:9.0f} ms {sequential_trips:3d}rt '
+                  f'{batched * 1000:9.0f} ms {batched_trips:3d}rt {sequential / batched:7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Per-request Gmail client overhead: cached credentials and client vs rebuilding them every request
+
+    python benchmarks/bench_gmail_client_cache.py [--requests 300] [--latency-ms 0]
+
+"rebuild" is the old route prologue: Credentials.from_authorized_user_file plus
+googleapiclient's build() (parsing the bundled discovery document and opening a
+fresh connection) on every request. "cached" is GmailService.load_credentials(),
+which only stats the token file while it is unchanged. Each is timed on its own
+and followed by one small request (users.getProfile) against tests/fake_gmail.py.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [BACKEND_DIR, os.path.dirname(BACKEND_DIR), os.path.join(BACKEND_DIR, 'tests')]
+
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build
+from fake_gmail import FakeGmail, write_token_file
+from backend.endpoints.gmail_service import GmailService
+from config import Config
+
+
+def rebuild_per_request(token_file, endpoint):
+    creds = Credentials.from_authorized_user_file(token_file, Config.SCOPES)
+    return build('gmail', 'v1', credentials=creds, client_options={'api_endpoint': endpoint})
+
+
+def time_requests(prologue, requests, with_call):
+    """Median milliseconds for prologue() (returning a client), plus one getProfile if with_call"""
+    timings = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        client = prologue()
+        if with_call:
+            client.users().getProfile(userId='me').execute()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    args = parser.parse_args()
+
+    with FakeGmail(messages=10, latency=args.latency_ms / 1000) as fake, \
+            tempfile.TemporaryDirectory() as scratch:
+        token_file = os.path.join(scratch, 'token.json')
+        write_token_file(token_file)
+
+        GmailService._build_service = lambda self: fake.connect(self)
+        service = GmailService(token_file=token_file)
+
+        def cached():
+            service.load_credentials()
+            return service.service
+
+        print(f'{args.requests} requests, median per request')
+        print(f'{"":10} {"prologue only":>14} {"+ getProfile":>14}')
+        for label, prologue in (('rebuild', lambda: rebuild_per_request(token_file, fake.url)), ('cached', cached)):
+            overhead = time_requests(prologue, args.requests, with_call=False)
+            total = time_requests(prologue, args.requests, with_call=True)
+            print(f'{label:10} {overhead:11.3f} ms {total:11.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Memory and throughput of the per-user Gmail client pool with 1,000 simulated users
+
+    python benchmarks/bench_gmail_pool.py [--users 1000] [--pool-size 256] [--requests 2000]
+                                          [--threads 16] [--latency-ms 5]
+
+Every user gets a token file and is served by tests/fake_gmail.py. The warm-up
+loads each user once (token read, client build, message store open) and reports
+RSS per pooled client. The timed phase sends --requests inbox reads for random
+users from --threads threads, so users evicted from a pool smaller than
+--users are rebuilt on their next request. Throughput is CPU-bound: the client
+library rebuilds its resource methods on every users().messages() call.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [BACKEND_DIR, os.path.dirname(BACKEND_DIR), os.path.join(BACKEND_DIR, 'tests')]
+
+from fake_gmail import FakeGmail, write_token_file
+from backend.endpoints.gmail_pool import CredentialStore, GmailClientPool
+from backend.endpoints.gmail_service import GmailService
+
+
+def rss_mb(field='VmRSS'):
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith(field + ':'):
+                return int(line.split()[1]) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--pool-size', type=int, default=256)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--latency-ms', type=float, default=5)
+    args = parser.parse_args()
+
+    with FakeGmail(messages=50, latency=args.latency_ms / 1000) as fake, \
+            tempfile.TemporaryDirectory() as scratch:
+        GmailService._build_service = lambda self: fake.connect(self)
+        store = CredentialStore(scratch)
+        subs = [f'auth0|user{i}' for i in range(args.users)]
+        for sub in subs:
+            write_token_file(store.token_file(sub))
+        pool = GmailClientPool(store, maxsize=args.pool_size)
+
+        baseline = rss_mb()
+        started = time.perf_counter()
+        for sub in subs:
+            assert pool.load(sub) is not None
+        warmup = time.perf_counter() - started
+        pooled = len(pool._services)
+        grown = rss_mb() - baseline
+        print(f'warm-up: {args.users} users in {warmup:.2f}s, {pooled} pooled clients, '
+              f'RSS +{grown:.1f} MB ({grown * 1024 / pooled:.0f} KiB per client)')
+
+        per_thread = args.requests // args.threads
+        failures = []
+
+        def worker(seed):
+            rng = random.Random(seed)
+            for _ in range(per_thread):
+                service = pool.load(rng.choice(subs))
+                if service is None or service.get_messages(max_results=10) is None:
+                    failures.append(seed)
+
+        fake.round_trips = 0
+        threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(args.threads)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        total = per_thread * args.threads
+        print(f'requests: {total} from {args.threads} threads in {elapsed:.2f}s = {total / elapsed:,.0f} req/s, '
+              f'{len(failures)} failed, {fake.round_trips} Gmail round trips')
+        print(f'peak RSS: {rss_mb("VmHWM"):.1f} MB')
+
+
+if __name__ == '__main__':
+    main()
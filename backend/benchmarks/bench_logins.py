@@ -0,0 +1,105 @@
+"""Concurrent logins per second through create_get_user against the shared engine
+
+    python benchmarks/bench_logins.py [--threads 1 4 16] [--seconds 3] [--users 500]
+                                      [--write-ratio 0.2] [--database-url sqlite:///bench.db]
+                                      [--compare-untuned]
+
+Each login is what /api/user_profile does after the token is verified: a user
+cache lookup and, on a miss or changed claims, an upsert. --write-ratio is the
+share of logins whose name claim changed, forcing a write. --compare-untuned
+repeats the SQLite run without WAL, synchronous=NORMAL and the busy timeout so
+the "database is locked" errors they prevent show up in the error count.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from flask import Flask
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import database
+from config import Config
+from database import db, init_db
+from endpoints import profile
+
+
+def make_app(url, tuned):
+    Config.DATABASE_URL = url
+    if not tuned:
+        Config.SQLITE_BUSY_TIMEOUT_MS = 0
+        if event.contains(Engine, 'connect', database._set_sqlite_pragmas):
+            event.remove(Engine, 'connect', database._set_sqlite_pragmas)
+    app = Flask(__name__)
+    init_db(app)
+    return app
+
+
+def run(app, threads, seconds, users, write_ratio):
+    """Logins per second and error count with threads logging in concurrently"""
+    profile.user_cache.clear()
+    stop = time.perf_counter() + seconds
+    counts = [0] * threads
+    errors = [0] * threads
+
+    def worker(slot):
+        rng = random.Random(slot)
+        with app.app_context():
+            while time.perf_counter() < stop:
+                n = rng.randrange(users)
+                name = f'User {n} #{rng.random()}' if rng.random() < write_ratio else f'User {n}'
+                response = profile.create_get_user(
+                    {'sub': f'auth0|bench{n}', 'email': f'bench{n}@example.com', 'name': name}
+                )
+                # Failures come back as (response, 500)
+                if isinstance(response, tuple):
+                    errors[slot] += 1
+                else:
+                    counts[slot] += 1
+            db.session.remove()
+
+    workers = [threading.Thread(target=worker, args=(slot,)) for slot in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return sum(counts) / (time.perf_counter() - started), sum(errors)
+
+
+def report(label, app, args):
+    print(label)
+    for threads in args.threads:
+        rate, errors = run(app, threads, args.seconds, args.users, args.write_ratio)
+        print(f'  {threads:3d} threads: {rate:10,.0f} logins/s  {errors} errors')
+    with app.app_context():
+        db.engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--seconds', type=float, default=3.0)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    parser.add_argument('--database-url')
+    parser.add_argument('--compare-untuned', action='store_true')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        url = args.database_url or f'sqlite:///{os.path.join(scratch, "bench.db")}'
+        report(f'tuned ({url})', make_app(url, tuned=True), args)
+
+        if args.compare_untuned and url.startswith('sqlite'):
+            untuned_url = f'sqlite:///{os.path.join(scratch, "untuned.db")}'
+            report(f'untuned ({untuned_url})', make_app(untuned_url, tuned=False), args)
+
+
+if __name__ == '__main__':
+    main()
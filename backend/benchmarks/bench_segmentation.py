@@ -0,0 +1,111 @@
+"""Silence segmentation and parallel transcription throughput on a one-hour recording
+
+    python benchmarks/bench_segmentation.py [--minutes 60] [--workers 1 2 4]
+
+The recording is synthetic and seeded: 2-12 s utterances (tones over low hiss)
+separated by 0.3-2 s pauses. split_on_silence is timed on its own, then the
+segments are transcribed on a spawn process pool for each --workers count.
+With speech_recognition and pocketsphinx installed that is
+SpeechToTextService.transcribe_segmented(method='sphinx'). Otherwise each
+segment gets a spectrogram as a CPU-bound stand-in, which still shows how the
+pool scales with cores. Each pool is warmed up before timing.
+"""
+import argparse
+import importlib.util
+import multiprocessing
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [BACKEND_DIR, os.path.dirname(BACKEND_DIR), os.path.join(BACKEND_DIR, 'tests')]
+
+import numpy as np
+from audio_fixtures import recording
+from backend.endpoints.audio_ingest import DecodedAudio
+from backend.endpoints.segmentation import split_on_silence
+
+HAVE_SPHINX = all(importlib.util.find_spec(name) for name in ('speech_recognition', 'pocketsphinx'))
+
+
+def synthetic_pattern(minutes, seed=0):
+    rng = random.Random(seed)
+    pattern, total = [], 0.0
+    while total < minutes * 60:
+        speech, pause = rng.uniform(2, 12), rng.uniform(0.3, 2)
+        pattern += [(speech, True), (pause, False)]
+        total += speech + pause
+    return pattern
+
+
+def spectrogram_frames(pcm):
+    """25 ms windows every 10 ms through an FFT, as an acoustic front end would"""
+    samples = np.frombuffer(pcm, dtype='<i2').astype(np.float32)
+    starts = np.arange(0, max(len(samples) - 400, 0), 160)
+    frames = samples[starts[:, None] + np.arange(400)] * np.hanning(400)
+    return int(np.log1p(np.abs(np.fft.rfft(frames))).shape[0])
+
+
+def run_stand_in(segments, workers):
+    pcms = [segment.pcm for segment in segments]
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        list(pool.map(spectrogram_frames, pcms[:workers]))
+        started = time.perf_counter()
+        list(pool.map(spectrogram_frames, pcms))
+        return time.perf_counter() - started
+
+
+def run_sphinx(audio, segments, workers):
+    from backend.endpoints import stt_service
+    from config import Config
+
+    if stt_service._process_pool is not None:
+        stt_service._process_pool.shutdown()
+        stt_service._process_pool = None
+    Config.STT_MAX_WORKERS = workers
+    list(stt_service._get_process_pool().map(
+        stt_service._transcribe_segment, ['sphinx'] * workers, [segments[0].pcm] * workers
+    ))
+    started = time.perf_counter()
+    result = stt_service.SpeechToTextService().transcribe_segmented(audio, 'sphinx')
+    elapsed = time.perf_counter() - started
+    if not result['success']:
+        sys.exit(f'Sphinx failed: {result["error"]}')
+    return elapsed
+
+
+def main():
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--minutes', type=float, default=60)
+    parser.add_argument('--workers', type=int, nargs='+', default=sorted({1, max(1, cores // 2), cores}))
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    audio = DecodedAudio(recording(synthetic_pattern(args.minutes), noise=0.003))
+    print(f'{audio.duration_seconds / 60:.1f} min recording built in {time.perf_counter() - started:.1f}s, '
+          f'{cores} cores')
+
+    started = time.perf_counter()
+    segments = split_on_silence(audio.pcm)
+    elapsed = time.perf_counter() - started
+    print(f'segmentation: {len(segments)} segments in {elapsed:.2f}s '
+          f'({audio.duration_seconds / elapsed:,.0f}x realtime)')
+
+    label = 'sphinx' if HAVE_SPHINX else 'spectrogram stand-in (sphinx not installed)'
+    print(f'transcription: {label}')
+    baseline = None
+    for workers in args.workers:
+        if HAVE_SPHINX:
+            elapsed = run_sphinx(audio, segments, workers)
+        else:
+            elapsed = run_stand_in(segments, workers)
+        baseline = baseline or elapsed
+        print(f'  {workers:3d} workers {elapsed:8.2f}s {audio.duration_seconds / elapsed:8.1f}x realtime '
+              f'{baseline / elapsed:6.2f}x speedup')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Peak RSS to build and send a message with a 1, 10 and 25 MB attachment
+
+    python benchmarks/bench_send_memory.py [--sizes 1 10 25]
+
+Each measurement runs in a fresh interpreter and reports how far the VmHWM
+high-water mark (Linux) rose while sending through tests/fake_gmail.py.
+"inline" is the in-memory MIME + base64url path used for small messages;
+"streamed" writes the message to a temp file and uploads it as resumable media.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def high_water_kb():
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1])
+
+
+def child(path, mode):
+    sys.path[:0] = [BACKEND_DIR, os.path.dirname(BACKEND_DIR), os.path.join(BACKEND_DIR, 'tests')]
+    from fake_gmail import FakeGmail
+    from backend.endpoints import gmail_service
+    from config import Config
+
+    # Force the path under test whatever the attachment size
+    Config.STREAMING_SEND_THRESHOLD = 0 if mode == 'streamed' else float('inf')
+    with FakeGmail(messages=0) as fake:
+        service = fake.connect(gmail_service.GmailService())
+        before = high_water_kb()
+        result = service.send_email('to@example.com', 'Report', 'See attached', attachments=[path])
+        grown = high_water_kb() - before
+    assert result and result['status'] == 'sent', result
+    print(json.dumps({'grown_kb': grown, 'sent_bytes': fake.sent[-1]['raw_size']}))
+
+
+def measure(path, mode):
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', path, mode],
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 25])
+    parser.add_argument('--child', nargs=2, metavar=('PATH', 'MODE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child)
+        return
+
+    print(f'{"attachment":>10} {"inline peak":>14} {"streamed peak":>14}')
+    with tempfile.TemporaryDirectory() as scratch:
+        for megabytes in args.sizes:
+            path = os.path.join(scratch, f'attachment-{megabytes}mb.bin')
+            with open(path, 'wb') as f:
+                f.write(os.urandom(megabytes * 1024 * 1024))
+            inline = measure(path, 'inline')
+            streamed = measure(path, 'streamed')
+            print(f'{megabytes:7d} MB {inline["grown_kb"] / 1024:11.1f} MB {streamed["grown_kb"] / 1024:11.1f} MB')
+
+
+if __name__ == '__main__':
+    main()
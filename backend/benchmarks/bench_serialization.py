@@ -0,0 +1,87 @@
+"""CPU time and peak memory to parse and serialize 500-message email pages
+
+    python benchmarks/bench_serialization.py [--messages 500] [--pages 50]
+
+Compares the old path (three header scans into a dict, then Flask's jsonify)
+with EmailRecord plus fast_json.dumps, using orjson when installed and the
+stdlib fallback otherwise. Peak memory is the tracemalloc high-water mark for
+building and encoding one page.
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [BACKEND_DIR, os.path.join(BACKEND_DIR, 'tests')]
+
+from flask import Flask, jsonify
+from fake_gmail import make_message
+from endpoints import fast_json
+from endpoints.email_record import EmailRecord
+
+
+def legacy_extract(message):
+    """The pre-EmailRecord parser: one generator scan per header"""
+    headers = message['payload'].get('headers', [])
+    return {
+        'id': message['id'],
+        'subject': next((h['value'] for h in headers if h['name'] == 'Subject'), ''),
+        'sender': next((h['value'] for h in headers if h['name'] == 'From'), ''),
+        'date': next((h['value'] for h in headers if h['name'] == 'Date'), ''),
+        'snippet': message.get('snippet', '')
+    }
+
+
+def legacy_page(messages):
+    return jsonify({'messages': [legacy_extract(m) for m in messages], 'next_page_token': None}).get_data()
+
+
+def record_page(messages):
+    return fast_json.json_response({
+        'messages': [EmailRecord.from_message(m) for m in messages],
+        'next_page_token': None
+    }).get_data()
+
+
+def measure(page, messages, pages):
+    """(CPU seconds per page, peak bytes for one page, response size)"""
+    started = time.process_time()
+    for _ in range(pages):
+        body = page(messages)
+    cpu = (time.process_time() - started) / pages
+
+    tracemalloc.start()
+    page(messages)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return cpu, peak, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=500)
+    parser.add_argument('--pages', type=int, default=50)
+    args = parser.parse_args()
+
+    messages = [make_message(i) for i in range(args.messages)]
+    app = Flask(__name__)
+    orjson = fast_json.orjson
+
+    with app.app_context():
+        runs = [('dict + jsonify', legacy_page)]
+        if orjson is not None:
+            runs.append(('EmailRecord + orjson', record_page))
+        runs.append(('EmailRecord + stdlib', record_page))
+
+        print(f'{args.messages} messages per page, {args.pages} pages')
+        for label, page in runs:
+            fast_json.orjson = orjson if 'orjson' in label else None
+            cpu, peak, size = measure(page, messages, args.pages)
+            print(f'  {label:22s} {cpu * 1000:8.2f} ms CPU/page  {peak / 1024:8.0f} KiB peak  {size:,} bytes')
+        fast_json.orjson = orjson
+
+
+if __name__ == '__main__':
+    main()
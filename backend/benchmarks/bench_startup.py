@@ -0,0 +1,84 @@
+"""Startup cost: the slowest imports under python -X importtime and time to first response
+
+    python benchmarks/bench_startup.py [--runs 5] [--top 15] [--modules app endpoints.sst]
+
+Each run is a fresh interpreter, as a gunicorn worker would be. Time to first
+response covers interpreter start, importing app and serving /api/hello through
+Flask's test client. Modules that fail to import (missing optional
+dependencies) are reported and skipped.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FIRST_RESPONSE = '''
+import app
+response = app.app.test_client().get('/api/hello')
+assert response.status_code == 200, response.status_code
+'''
+
+
+def child_env():
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join((BACKEND_DIR, os.path.dirname(BACKEND_DIR)))
+    env.setdefault('DATABASE_URL', 'sqlite://')
+    return env
+
+
+def import_times(module):
+    """[(cumulative_us, self_us, name)] for one import of module, or None if it fails"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=BACKEND_DIR, env=child_env(), capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        print(f'{module}: import failed: {result.stderr.strip().splitlines()[-1]}')
+        return None
+
+    rows = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+    return rows
+
+
+def first_response_seconds():
+    started = time.perf_counter()
+    subprocess.run([sys.executable, '-c', FIRST_RESPONSE], cwd=BACKEND_DIR, env=child_env(),
+                   check=True, capture_output=True)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--modules', nargs='+', default=[
+        'app', 'Auth.auth', 'endpoints.stt_service', 'endpoints.translation_service', 'endpoints.sst'
+    ])
+    args = parser.parse_args()
+
+    for module in args.modules:
+        rows = import_times(module)
+        if rows is None:
+            continue
+        total_us = sum(self_us for _, self_us, _ in rows)
+        print(f'\n{module}: {total_us / 1000:.1f} ms across {len(rows)} modules')
+        for cumulative_us, self_us, name in sorted(rows, reverse=True)[:args.top]:
+            print(f'  {cumulative_us / 1000:9.1f} ms cumulative {self_us / 1000:8.1f} ms self  {name}')
+
+    timings = [first_response_seconds() for _ in range(args.runs)]
+    print(f'\ntime to first /api/hello response over {args.runs} runs: '
+          f'median {statistics.median(timings) * 1000:.0f} ms, max {max(timings) * 1000:.0f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Verifications per second through verify_jwt with and without the verified-token cache
+
+    python benchmarks/bench_token_cache.py [--seconds 3] [--tokens 20]
+
+Signs tokens with a throwaway RSA key and serves it from a local JWKS, so no
+Auth0 tenant is needed. The cached run replays the same tokens the way one SPA
+session does; the uncached run uses a zero-size cache so every call verifies.
+"""
+import argparse
+import os
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import rsa
+from jose import jwk, jwt
+from Auth import auth
+from Auth.auth import JWKSCache, TokenCache
+
+DOMAIN = 'bench.example.com'
+AUDIENCE = 'https://api.example.com'
+
+
+def make_tokens(count, key_bits=2048):
+    _, private_key = rsa.newkeys(key_bits)
+    pem = private_key.save_pkcs1().decode()
+    public = dict(jwk.construct(pem, 'RS256').public_key().to_dict(), kid='bench')
+    expires = int(time.time()) + 3600
+    tokens = [
+        jwt.encode({'sub': f'auth0|user{i}', 'aud': AUDIENCE, 'iss': f'https://{DOMAIN}/', 'exp': expires},
+                   pem, algorithm='RS256', headers={'kid': 'bench'})
+        for i in range(count)
+    ]
+    return tokens, public
+
+
+def run(tokens, seconds):
+    """Round-robin verify_jwt over tokens for about seconds; returns calls per second"""
+    calls = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        for token in tokens:
+            auth.verify_jwt(token)
+        calls += len(tokens)
+    return calls / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=3.0)
+    parser.add_argument('--tokens', type=int, default=20)
+    args = parser.parse_args()
+
+    tokens, public = make_tokens(args.tokens)
+    auth.AUTH0_DOMAIN = DOMAIN
+    auth.API_IDENTIFIER = AUDIENCE
+    auth.jwks_cache = JWKSCache('unused', fetch=lambda: {'keys': [public]})
+
+    auth.token_cache = TokenCache(maxsize=0)
+    uncached = run(tokens, args.seconds)
+
+    auth.token_cache = TokenCache()
+    cached = run(tokens, args.seconds)
+
+    print(f'uncached: {uncached:12,.0f} verifications/s')
+    print(f'cached:   {cached:12,.0f} verifications/s  ({cached / uncached:,.0f}x)')
+    print(f'cache:    {auth.token_cache.stats()}')
+
+
+if __name__ == '__main__':
+    main()
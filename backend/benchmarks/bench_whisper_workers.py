@@ -0,0 +1,125 @@
+"""RSS per worker and first-request latency for Whisper, loaded lazily vs preloaded before fork
+
+    python benchmarks/bench_whisper_workers.py [--workers 4] [--model base] [--threads 1] [--seconds 5]
+
+Mimics a pre-forking server: the master either preloads the model
+(WhisperModelManager.preload, as with WHISPER_PRELOAD=1 and gunicorn --preload)
+or leaves it to the workers, then forks --workers workers that each serve one
+transcription of a fixed synthetic clip. Memory is read from each process's
+/proc/<pid>/smaps_rollup once every worker has answered. Pss splits shared pages
+between the processes mapping them, so the Pss column adds up to what the
+machine actually spends. Needs openai-whisper and Linux.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import time
+import traceback
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [BACKEND_DIR, os.path.dirname(BACKEND_DIR), os.path.join(BACKEND_DIR, 'tests')]
+
+from audio_fixtures import tone
+from backend.endpoints.whisper_model import WhisperModelManager
+
+
+def memory_mb(pid):
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as rollup:
+        for line in rollup:
+            name, _, value = line.partition(':')
+            if value.strip().endswith('kB'):
+                fields[name] = int(value.split()[0]) / 1024
+    return {
+        'rss': fields['Rss'],
+        'pss': fields['Pss'],
+        'private': fields['Private_Clean'] + fields['Private_Dirty']
+    }
+
+
+def serve_first_request(manager, samples, report, release):
+    """Worker body: load if needed, transcribe once, then wait to be measured"""
+    started = time.perf_counter()
+    if not manager.ready and not manager.load():
+        raise RuntimeError(manager.error)
+    manager.transcribe(samples, fp16=False)
+    line = json.dumps({'pid': os.getpid(), 'first_request': time.perf_counter() - started})
+    os.write(report, line.encode() + b'\n')
+    # Stay alive (and mapped) until the parent has read every worker's memory
+    os.read(release, 1)
+
+
+def run(mode, args, samples):
+    manager = WhisperModelManager(args.model, torch_threads=args.threads)
+    if mode == 'preload' and not manager.preload():
+        sys.exit(f'Could not load Whisper: {manager.error}')
+
+    report_read, report_write = os.pipe()
+    release_read, release_write = os.pipe()
+    pids = []
+    for _ in range(args.workers):
+        pid = os.fork()
+        if pid == 0:
+            status = 0
+            try:
+                os.close(report_read)
+                os.close(release_write)
+                serve_first_request(manager, samples, report_write, release_read)
+            except BaseException as error:
+                traceback.print_exc()
+                os.write(report_write, json.dumps({'pid': os.getpid(), 'error': str(error)}).encode() + b'\n')
+                status = 1
+            finally:
+                os._exit(status)
+        pids.append(pid)
+    os.close(report_write)
+    os.close(release_read)
+
+    with os.fdopen(report_read) as reports:
+        workers = [json.loads(reports.readline()) for _ in pids]
+    for worker in workers:
+        if 'error' not in worker:
+            worker.update(memory_mb(worker['pid']))
+    master = memory_mb(os.getpid())
+    os.close(release_write)
+    for pid in pids:
+        os.waitpid(pid, 0)
+
+    failed = [worker['error'] for worker in workers if 'error' in worker]
+    if failed:
+        sys.exit(f'{mode}: {len(failed)} workers failed: {failed[0]}')
+    return master, workers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--model', default='base')
+    parser.add_argument('--threads', type=int, default=1, help='torch threads per worker')
+    parser.add_argument('--seconds', type=float, default=5, help='length of the test clip')
+    args = parser.parse_args()
+
+    if importlib.util.find_spec('whisper') is None:
+        sys.exit('openai-whisper is not installed')
+    if not os.path.exists('/proc/self/smaps_rollup'):
+        sys.exit('needs Linux /proc/<pid>/smaps_rollup')
+
+    samples = tone(args.seconds).astype('float32') / 32768.0
+    print(f'{args.workers} workers, model {args.model}, {args.threads} torch threads each')
+    print(f'{"mode":8} {"master RSS":>11} {"worker RSS":>11} {"worker Pss":>11} '
+          f'{"private":>9} {"total Pss":>10} {"first request":>14}')
+    # lazy first: the preload run leaves the model loaded in this process
+    for mode in ('lazy', 'preload'):
+        master, workers = run(mode, args, samples)
+        count = len(workers)
+        mean = {key: sum(worker[key] for worker in workers) / count
+                for key in ('rss', 'pss', 'private', 'first_request')}
+        total = master['pss'] + mean['pss'] * count
+        print(f'{mode:8} {master["rss"]:8.0f} MB {mean["rss"]:8.0f} MB {mean["pss"]:8.0f} MB '
+              f'{mean["private"]:6.0f} MB {total:7.0f} MB {mean["first_request"]:12.2f} s')
+
+
+if __name__ == '__main__':
+    main()
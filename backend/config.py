@@ -8,9 +8,94 @@ class Config:
     GOOGLE_CLIENT_ID = os.environ.get('GOOGLE_CLIENT_ID')
     GOOGLE_CLIENT_SECRET = os.environ.get('GOOGLE_CLIENT_SECRET')
     GOOGLE_REDIRECT_URI = os.environ.get('GOOGLE_REDIRECT_URI')
+
+    # Database settings (sqlite:///users.db or a postgresql:// URL)
+    DATABASE_URL = os.environ.get('DATABASE_URL') or 'sqlite:///users.db'
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+
+    # Retry/backoff and circuit breaker settings for outbound API calls
+    RETRY_MAX_ATTEMPTS = int(os.environ.get('RETRY_MAX_ATTEMPTS', 3))
+    CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('CIRCUIT_FAILURE_THRESHOLD', 5))
+    CIRCUIT_RESET_TIMEOUT = int(os.environ.get('CIRCUIT_RESET_TIMEOUT', 30))
+    GMAIL_MAX_CONCURRENCY = int(os.environ.get('GMAIL_MAX_CONCURRENCY', 16))
+    OPENAI_MAX_CONCURRENCY = int(os.environ.get('OPENAI_MAX_CONCURRENCY', 8))
+    GOOGLE_SPEECH_MAX_CONCURRENCY = int(os.environ.get('GOOGLE_SPEECH_MAX_CONCURRENCY', 4))
+
+    # Load heavy dependencies (JWKS, models) in a background thread at startup
+    WARMUP_ON_START = os.environ.get('WARMUP_ON_START', '1') == '1'
     
     # Gmail API settings
-    SCOPES = ['https://www.googleapis.com/auth/gmail.readonly'],
-        # 'https://www.googleapis.com/auth/gmail.send'  # Add this line
+    SCOPES = [
+        'https://www.googleapis.com/auth/gmail.readonly',
+        'https://www.googleapis.com/auth/gmail.send'
+    ]
     CREDENTIALS_FILE = 'credentials.json'
-    TOKEN_FILE = 'token.json'
\ No newline at end of file
+    TOKEN_FILE = 'token.json'
+    # Per-user tokens and local mail data live under USER_DATA_DIR/<hashed Auth0 sub>/
+    USER_DATA_DIR = os.environ.get('USER_DATA_DIR') or 'user_data'
+    GMAIL_POOL_SIZE = int(os.environ.get('GMAIL_POOL_SIZE', 256))
+    OAUTH_STATE_MAX_AGE = int(os.environ.get('OAUTH_STATE_MAX_AGE', 600))
+    # Refresh the access token this many seconds before it expires
+    TOKEN_REFRESH_MARGIN = int(os.environ.get('TOKEN_REFRESH_MARGIN', 300))
+
+    # Bulk send: messages.send costs 100 of the 15,000 quota units a user gets per minute
+    SEND_RATE_PER_SECOND = float(os.environ.get('SEND_RATE_PER_SECOND', 2.5))
+    SEND_BURST = int(os.environ.get('SEND_BURST', 10))
+    SEND_MAX_WORKERS = int(os.environ.get('SEND_MAX_WORKERS', 4))
+    SEND_BATCH_LIMIT = int(os.environ.get('SEND_BATCH_LIMIT', 500))
+    # Seconds the reply path caches a message's subject/threadId/Message-ID
+    THREAD_INFO_TTL = int(os.environ.get('THREAD_INFO_TTL', 300))
+    # Attachments larger than this in total are streamed through a media upload
+    STREAMING_SEND_THRESHOLD = int(os.environ.get('STREAMING_SEND_THRESHOLD', 1024 * 1024))
+    # Uploaded attachments (directory inside each user's data dir); sends refer to them by id
+    UPLOAD_DIR = os.environ.get('UPLOAD_DIR') or 'uploads'
+    UPLOAD_MAX_AGE = int(os.environ.get('UPLOAD_MAX_AGE', 24 * 3600))
+    # Flask rejects larger request bodies with 413; Gmail's own message limit is 35 MB
+    MAX_CONTENT_LENGTH = int(os.environ.get('MAX_UPLOAD_MB', 35)) * 1024 * 1024
+
+    # Local Gmail message store (file name inside each user's data dir)
+    MESSAGE_STORE_PATH = os.environ.get('MESSAGE_STORE_PATH') or 'messages.db'
+    MESSAGE_SYNC_SIZE = int(os.environ.get('MESSAGE_SYNC_SIZE', 100))
+    MESSAGE_SYNC_INTERVAL = int(os.environ.get('MESSAGE_SYNC_INTERVAL', 30))
+
+    # Opt-in local full-text search over fetched messages (file name inside each user's data dir)
+    LOCAL_SEARCH = os.environ.get('LOCAL_SEARCH', '0') == '1'
+    SEARCH_INDEX_PATH = os.environ.get('SEARCH_INDEX_PATH') or 'search_index.db'
+
+    # Background prefetch after Gmail login: newest message bodies and the first drafts page
+    PREFETCH_WORKERS = int(os.environ.get('PREFETCH_WORKERS', 2))
+    PREFETCH_MESSAGES = int(os.environ.get('PREFETCH_MESSAGES', 20))
+    PREFETCH_DRAFTS = int(os.environ.get('PREFETCH_DRAFTS', 20))
+    # Prefetch pauses until the user has been idle this many seconds
+    PREFETCH_YIELD_SECONDS = float(os.environ.get('PREFETCH_YIELD_SECONDS', 1.0))
+    # How long logout waits for a running prefetch to stop
+    PREFETCH_CANCEL_TIMEOUT = int(os.environ.get('PREFETCH_CANCEL_TIMEOUT', 10))
+    DRAFTS_CACHE_TTL = int(os.environ.get('DRAFTS_CACHE_TTL', 60))
+
+    # Whisper: model size, load-at-import and torch threads per worker. Set WHISPER_PRELOAD=1
+    # only with gunicorn --preload; it imports torch and may download the model at import time
+    WHISPER_MODEL_SIZE = os.environ.get('WHISPER_MODEL_SIZE') or 'base'
+    WHISPER_PRELOAD = os.environ.get('WHISPER_PRELOAD', '0') == '1'
+    WHISPER_TORCH_THREADS = int(
+        os.environ.get('WHISPER_TORCH_THREADS')
+        or max(1, (os.cpu_count() or 1) // int(os.environ.get('WEB_CONCURRENCY', 1)))
+    )
+
+    # Recordings longer than this are split on silence and the pieces transcribed in parallel
+    STT_SEGMENT_MIN_SECONDS = int(os.environ.get('STT_SEGMENT_MIN_SECONDS', 60))
+    STT_MAX_SEGMENT_SECONDS = int(os.environ.get('STT_MAX_SEGMENT_SECONDS', 30))
+    STT_MIN_SILENCE_MS = int(os.environ.get('STT_MIN_SILENCE_MS', 400))
+    STT_MAX_WORKERS = int(os.environ.get('STT_MAX_WORKERS') or os.cpu_count() or 1)
+
+    # Async transcription jobs: backend ('thread' or 'inline'), worker count and queue bound
+    TRANSCRIBE_JOB_BACKEND = os.environ.get('TRANSCRIBE_JOB_BACKEND') or 'thread'
+    TRANSCRIBE_JOB_WORKERS = int(os.environ.get('TRANSCRIBE_JOB_WORKERS', 2))
+    TRANSCRIBE_JOB_QUEUE_SIZE = int(os.environ.get('TRANSCRIBE_JOB_QUEUE_SIZE', 32))
+    # Seconds a finished job's result stays available for polling
+    TRANSCRIBE_JOB_TTL = int(os.environ.get('TRANSCRIBE_JOB_TTL', 3600))
+    # Seconds between keep-alive comments on an idle job event stream
+    TRANSCRIBE_SSE_HEARTBEAT = int(os.environ.get('TRANSCRIBE_SSE_HEARTBEAT', 15))
@@ -0,0 +1,144 @@
+import csv
+import sqlite3
+import click
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, func, select
+from sqlalchemy.engine import Engine
+from config import Config
+
+# Shared SQLAlchemy instance; models and endpoints import it from here
+db = SQLAlchemy()
+
+
+def _database_url():
+    url = Config.DATABASE_URL
+    # Heroku-style URLs use the old postgres:// scheme
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+    return url
+
+
+def _engine_options(url):
+    """Engine options for the configured database"""
+    if url.startswith("sqlite"):
+        return {"connect_args": {"timeout": Config.SQLITE_BUSY_TIMEOUT_MS / 1000}}
+
+    return {
+        "pool_size": Config.DB_POOL_SIZE,
+        "max_overflow": Config.DB_MAX_OVERFLOW,
+        "pool_timeout": Config.DB_POOL_TIMEOUT,
+        "pool_recycle": Config.DB_POOL_RECYCLE,
+        "pool_pre_ping": True
+    }
+
+
+@event.listens_for(Engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL lets readers run alongside a writer; busy_timeout waits instead of failing"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(Config.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+def init_db(app):
+    """Configure the shared engine for app and create tables"""
+    url = _database_url()
+    app.config["SQLALCHEMY_DATABASE_URI"] = url
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = _engine_options(url)
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+
+    db.init_app(app)
+    app.cli.add_command(users_cli)
+
+    with app.app_context():
+        db.create_all()
+
+
+def dialect_insert():
+    """Return the dialect-specific insert() that supports ON CONFLICT"""
+    dialect = db.engine.dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    return None
+
+
+# Bulk import/export: flask users export users.csv / flask users import users.csv
+USER_FIELDS = ["auth0_id", "email", "name"]
+
+
+@click.group("users")
+def users_cli():
+    """Bulk user import and export"""
+
+
+@users_cli.command("export")
+@click.argument("path", type=click.Path(dir_okay=False, writable=True))
+@click.option("--batch-size", default=1000, show_default=True)
+def export_users(path, batch_size):
+    """Stream all users to a CSV file"""
+    from models.User import User
+
+    count = 0
+    stmt = select(User).order_by(User.id).execution_options(yield_per=batch_size)
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=USER_FIELDS)
+        writer.writeheader()
+        for user in db.session.scalars(stmt):
+            writer.writerow({field: getattr(user, field) for field in USER_FIELDS})
+            count += 1
+
+    click.echo(f"Exported {count} users to {path}")
+
+
+@users_cli.command("import")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--batch-size", default=1000, show_default=True)
+def import_users(path, batch_size):
+    """Insert users from a CSV file, skipping rows that clash with existing users"""
+    from models.User import User
+
+    insert = dialect_insert()
+    if insert is None:
+        raise click.ClickException("Bulk import needs SQLite or Postgres")
+    # No conflict target: a duplicate auth0_id or email is skipped rather than aborting the import
+    stmt = insert(User).on_conflict_do_nothing()
+    required = [field for field in USER_FIELDS if not User.__table__.columns[field].nullable]
+
+    def flush(batch):
+        db.session.execute(stmt, batch)
+        db.session.commit()
+
+    before = db.session.scalar(select(func.count()).select_from(User))
+    count = 0
+    invalid = 0
+    batch = []
+    with open(path, newline="") as f:
+        # Line 1 is the header
+        for line, row in enumerate(csv.DictReader(f), start=2):
+            values = {field: (row.get(field) or "").strip() or None for field in USER_FIELDS}
+            missing = [field for field in required if values[field] is None]
+            if missing:
+                click.echo(f"Skipping line {line}: missing {', '.join(missing)}", err=True)
+                invalid += 1
+                continue
+            batch.append(values)
+            count += 1
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+
+    if batch:
+        flush(batch)
+
+    inserted = db.session.scalar(select(func.count()).select_from(User)) - before
+    click.echo(f"Imported {inserted} users from {path}; "
+               f"skipped {count - inserted} duplicates and {invalid} invalid rows")
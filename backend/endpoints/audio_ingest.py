@@ -0,0 +1,139 @@
+import io
+import time
+import wave
+from dataclasses import dataclass
+from typing import Optional
+
+# Speech models want 16 kHz mono 16-bit PCM
+TARGET_RATE = 16000
+TARGET_CHANNELS = 1
+TARGET_SAMPLE_WIDTH = 2
+
+# Upload MIME types mapped to ffmpeg demuxer names
+MIME_FORMATS = {
+    'audio/webm': 'webm',
+    'video/webm': 'webm',
+    'audio/ogg': 'ogg',
+    'audio/opus': 'ogg',
+    'audio/mpeg': 'mp3',
+    'audio/mp3': 'mp3',
+    'audio/wav': 'wav',
+    'audio/wave': 'wav',
+    'audio/x-wav': 'wav',
+    'audio/vnd.wave': 'wav',
+    'audio/mp4': 'mp4',
+    'audio/m4a': 'mp4',
+    'audio/x-m4a': 'mp4',
+    'video/mp4': 'mp4',
+    'audio/flac': 'flac',
+    'audio/x-flac': 'flac',
+}
+
+
+def sniff_format(data, mimetype=None):
+    """Container format from magic bytes, then the upload's MIME type; None lets ffmpeg probe"""
+    if data[:4] == b'RIFF' and data[8:12] == b'WAVE':
+        return 'wav'
+    if data[:4] == b'\x1a\x45\xdf\xa3':
+        # EBML header; MediaRecorder's webm and matroska share one demuxer
+        return 'webm'
+    if data[:4] == b'OggS':
+        return 'ogg'
+    if data[:4] == b'fLaC':
+        return 'flac'
+    if data[4:8] == b'ftyp':
+        return 'mp4'
+    if data[:3] == b'ID3' or (len(data) > 1 and data[0] == 0xFF and data[1] & 0xE0 == 0xE0):
+        # ID3 tag or a bare MPEG audio frame sync
+        return 'mp3'
+
+    if mimetype:
+        return MIME_FORMATS.get(mimetype.split(';')[0].strip().lower())
+    return None
+
+
+@dataclass(slots=True)
+class DecodedAudio:
+    """An upload decoded once to 16 kHz mono 16-bit PCM"""
+    pcm: bytes
+    source_format: Optional[str] = None
+    decode_seconds: float = 0.0
+    # True when the upload was already 16 kHz mono PCM WAV and ffmpeg was skipped
+    fast_path: bool = False
+
+    @property
+    def duration_seconds(self):
+        return len(self.pcm) / (TARGET_RATE * TARGET_CHANNELS * TARGET_SAMPLE_WIDTH)
+
+    def wav_io(self):
+        """The PCM wrapped in a WAV header, for speech_recognition.AudioFile"""
+        wav_io = io.BytesIO()
+        with wave.open(wav_io, 'wb') as wav:
+            wav.setnchannels(TARGET_CHANNELS)
+            wav.setsampwidth(TARGET_SAMPLE_WIDTH)
+            wav.setframerate(TARGET_RATE)
+            wav.writeframes(self.pcm)
+        wav_io.seek(0)
+        return wav_io
+
+    def to_float32(self):
+        """float32 samples in [-1, 1], the array Whisper takes directly"""
+        import numpy as np
+        return np.frombuffer(self.pcm, dtype='<i2').astype(np.float32) / 32768.0
+
+    def timing(self):
+        return {
+            'format': self.source_format,
+            'fast_path': self.fast_path,
+            'decode_seconds': round(self.decode_seconds, 4),
+            'duration_seconds': round(self.duration_seconds, 3)
+        }
+
+
+def _read_target_wav(data):
+    """PCM frames if data is already a 16 kHz mono 16-bit WAV, else None"""
+    try:
+        with wave.open(io.BytesIO(data), 'rb') as wav:
+            if (wav.getcomptype() != 'NONE'
+                    or wav.getframerate() != TARGET_RATE
+                    or wav.getnchannels() != TARGET_CHANNELS
+                    or wav.getsampwidth() != TARGET_SAMPLE_WIDTH):
+                return None
+            return wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError):
+        # Float or extensible WAVs are left to ffmpeg
+        return None
+
+
+def decode_audio(audio_file, mimetype=None):
+    """Read an upload and decode it exactly once into a DecodedAudio"""
+    started = time.perf_counter()
+    audio_file.seek(0)
+    data = audio_file.read()
+    if not data:
+        raise ValueError('Empty audio file')
+
+    if mimetype is None:
+        mimetype = getattr(audio_file, 'mimetype', None)
+    source_format = sniff_format(data, mimetype)
+
+    if source_format == 'wav':
+        pcm = _read_target_wav(data)
+        if pcm is not None:
+            return DecodedAudio(pcm, source_format, time.perf_counter() - started, fast_path=True)
+
+    # pydub pulls in audioop and shells out to ffmpeg, so import it only when needed
+    from pydub import AudioSegment
+
+    # One ffmpeg run that also downmixes and resamples; format=None lets ffmpeg probe
+    segment = AudioSegment.from_file(
+        io.BytesIO(data),
+        format=source_format,
+        parameters=['-ac', str(TARGET_CHANNELS), '-ar', str(TARGET_RATE)]
+    )
+    # No-ops when ffmpeg already produced the target layout
+    segment = (segment.set_channels(TARGET_CHANNELS)
+               .set_frame_rate(TARGET_RATE)
+               .set_sample_width(TARGET_SAMPLE_WIDTH))
+
+    return DecodedAudio(segment.raw_data, source_format, time.perf_counter() - started)
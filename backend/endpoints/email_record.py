@@ -0,0 +1,55 @@
+from dataclasses import dataclass
+from typing import List, Optional
+
+
+@dataclass(slots=True)
+class EmailRecord:
+    """Parsed Gmail message as returned by the email and draft endpoints"""
+    id: str
+    subject: str = ''
+    sender: str = ''
+    date: str = ''
+    snippet: str = ''
+    # None for metadata-only records; filled in when the message is opened
+    body: Optional[str] = None
+    attachments: Optional[List[dict]] = None
+    draft_id: Optional[str] = None
+
+    @classmethod
+    def from_message(cls, message):
+        """Build a record from a Gmail message resource, indexing headers in one pass"""
+        headers = {}
+        for header in message['payload'].get('headers', []):
+            headers.setdefault(header['name'].lower(), header['value'])
+
+        return cls(
+            id=message['id'],
+            subject=headers.get('subject', ''),
+            sender=headers.get('from', ''),
+            date=headers.get('date', ''),
+            snippet=message.get('snippet', '')
+        )
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    @property
+    def has_body(self):
+        return self.body is not None
+
+    def to_dict(self):
+        """Plain dict for JSON; unset optional fields are left out"""
+        data = {
+            'id': self.id,
+            'subject': self.subject,
+            'sender': self.sender,
+            'date': self.date,
+            'snippet': self.snippet
+        }
+        if self.body is not None:
+            data['body'] = self.body
+            data['attachments'] = self.attachments or []
+        if self.draft_id is not None:
+            data['draft_id'] = self.draft_id
+        return data
@@ -1,18 +1,32 @@
-from flask import Flask, request, jsonify, redirect, session
+from flask import Flask, request, jsonify, redirect, session, Response, stream_with_context
 from flask_cors import CORS
-from backend.endpoints.gmail_service import GmailService
+from werkzeug.utils import secure_filename
+from itsdangerous import URLSafeTimedSerializer, BadSignature
+from Auth.auth import requires_auth
+from backend.endpoints.gmail_pool import CredentialStore, GmailClientPool
+from backend.endpoints.prefetch import Prefetcher
+from backend.endpoints.fast_json import dumps, json_response
 from config import Config
 
 app = Flask(__name__)
 app.config.from_object(Config)
 CORS(app, origins=['http://localhost:5173'])  # Vite default port
 
-gmail_service = GmailService()
+# One GmailService per Auth0 user, each with its own token and local mail data
+gmail_pool = GmailClientPool(CredentialStore(Config.USER_DATA_DIR))
+
+# Warms the inbox and drafts after login so the first dashboard load is served locally
+prefetcher = Prefetcher()
+
+# Signs the Auth0 sub into the OAuth state so the callback knows whose token it is
+oauth_state = URLSafeTimedSerializer(Config.SECRET_KEY, salt='gmail-oauth-state')
 
 @app.route('/api/auth/login')
-def login():
+@requires_auth
+def login(user):
     """Initiate OAuth2 flow"""
-    auth_url = gmail_service.get_authorization_url()
+    state = oauth_state.dumps(user['sub'])
+    auth_url = gmail_pool.get(user['sub']).get_authorization_url(state=state)
     return jsonify({'auth_url': auth_url})
 
 @app.route('/oauth2/callback')
@@ -24,40 +38,82 @@ def oauth_callback():
     if error:
         return redirect('http://localhost:5173/error')
     
+    try:
+        sub = oauth_state.loads(request.args.get('state', ''), max_age=Config.OAUTH_STATE_MAX_AGE)
+    except BadSignature:
+        return redirect('http://localhost:5173/error')
+    
     if code:
-        success = gmail_service.exchange_code_for_token(code)
+        gmail_service = gmail_pool.get(sub)
+        with gmail_pool.user_lock(sub):
+            success = gmail_service.exchange_code_for_token(code)
         if success:
+            prefetcher.schedule(sub, gmail_service)
             return redirect('http://localhost:5173/dashboard')
     
     return redirect('http://localhost:5173/error')
 
 @app.route('/api/auth/status')
-def auth_status():
+@requires_auth
+def auth_status(user):
     """Check if user is authenticated"""
-    is_authenticated = gmail_service.load_credentials()
+    is_authenticated = gmail_pool.load(user['sub']) is not None
     return jsonify({'authenticated': is_authenticated})
 
 # email function fetching
 @app.route('/api/emails')
-def get_emails():
-    """Get emails with optional query"""
+@requires_auth
+def get_emails(user):
+    """Get a page of emails with optional query; ?stream=ndjson emits one message per line"""
     query = request.args.get('query', '')
     max_results = int(request.args.get('max_results', 10))
+    page_token = request.args.get('page_token')
     
-    if not gmail_service.load_credentials():
+    gmail_service = gmail_pool.load(user['sub'])
+    if gmail_service is None:
         return jsonify({'error': 'Not authenticated'}), 401
     
-    messages = gmail_service.get_messages(query, max_results)
+    if request.args.get('stream') == 'ndjson':
+        result = gmail_service.stream_messages(query, max_results, page_token)
+        if result is None:
+            return jsonify({'error': 'Failed to fetch emails'}), 500
+        
+        messages, next_page_token = result
+        
+        def generate():
+            try:
+                for message in messages:
+                    yield dumps({'message': message}) + b'\n'
+            except Exception as error:
+                # Headers are already sent, so report the failure in-band
+                yield dumps({'error': f'Failed to fetch emails: {error}'}) + b'\n'
+                return
+            yield dumps({'next_page_token': next_page_token}) + b'\n'
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
     
-    if messages is None:
+    # Plain inbox listings are served from the local store; searches go to Gmail
+    if query:
+        page = gmail_service.get_messages(query, max_results, page_token)
+    else:
+        page = gmail_service.get_stored_messages(max_results, page_token)
+    
+    if page is None:
         return jsonify({'error': 'Failed to fetch emails'}), 500
     
-    return jsonify({'messages': messages})
+    return json_response({
+        'messages': page['messages'],
+        'next_page_token': page['next_page_token'],
+        # True when a search was answered from the local index of already-fetched mail
+        'partial': page.get('partial', False)
+    })
 
 @app.route('/api/emails/<message_id>')
-def get_email(message_id):
+@requires_auth
+def get_email(message_id, user):
     """Get specific email by ID"""
-    if not gmail_service.load_credentials():
+    gmail_service = gmail_pool.load(user['sub'])
+    if gmail_service is None:
         return jsonify({'error': 'Not authenticated'}), 401
     
     message = gmail_service.get_message_by_id(message_id)
@@ -65,15 +121,48 @@ def get_email(message_id):
     if message is None:
         return jsonify({'error': 'Email not found'}), 404
     
-    return jsonify({'message': message})
+    return json_response({'message': message})
+
+@app.route('/api/emails/<message_id>/attachments/<attachment_id>')
+@requires_auth
+def download_attachment(message_id, attachment_id, user):
+    """Stream an attachment; filename and mime_type come from the message's attachment list
+
+    ?part_id= identifies the attachment if Gmail has since re-issued its attachment id.
+    """
+    gmail_service = gmail_pool.load(user['sub'])
+    if gmail_service is None:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    # Never trust client-supplied metadata: a text/html Content-Type from a query
+    # parameter would let any link render script on this origin
+    attachment = gmail_service.get_attachment_info(message_id, attachment_id, request.args.get('part_id'))
+    if attachment is None:
+        return jsonify({'error': 'Attachment not found'}), 404
+    
+    chunks = gmail_service.iter_attachment(message_id, attachment['attachment_id'])
+    
+    if chunks is None:
+        return jsonify({'error': 'Attachment not found'}), 404
+    
+    filename = secure_filename(attachment['filename']) or 'attachment'
+    return Response(
+        stream_with_context(chunks),
+        mimetype=attachment['mime_type'] or 'application/octet-stream',
+        headers={
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'X-Content-Type-Options': 'nosniff'
+        }
+    )
 
 @app.route('/api/auth/logout')
-def logout():
+@requires_auth
+def logout(user):
     """Logout user"""
-    # Remove token file
-    import os
-    if os.path.exists(Config.TOKEN_FILE):
-        os.remove(Config.TOKEN_FILE)
+    # Stop any prefetch first so it cannot write mail back after the wipe
+    prefetcher.cancel(user['sub'])
+    # Remove this user's token file and local mail data
+    gmail_pool.logout(user['sub'])
     
     return jsonify({'message': 'Logged out successfully'})
 
@@ -82,9 +171,11 @@ if __name__ == '__main__':
 
 
 @app.route('/api/emails/send', methods=['POST'])
-def send_email():
+@requires_auth
+def send_email(user):
     """Send a new email"""
-    if not gmail_service.load_credentials():
+    gmail_service = gmail_pool.load(user['sub'])
+    if gmail_service is None:
         return jsonify({'error': 'Not authenticated'}), 401
     
     data = request.get_json()
@@ -93,23 +184,80 @@ def send_email():
     if not data.get('to') or not data.get('subject') or not data.get('body'):
         return jsonify({'error': 'Missing required fields: to, subject, body'}), 400
     
+    # Attachments are ids from /api/attachments, never paths on this server
+    try:
+        attachments = gmail_service.upload_paths(data.get('attachments'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     result = gmail_service.send_email(
         to=data['to'],
         subject=data['subject'],
         body=data['body'],
         html_body=data.get('html_body'),
-        attachments=data.get('attachments')
+        attachments=attachments
     )
     
     if result is None:
         return jsonify({'error': 'Failed to send email'}), 500
     
-    return jsonify({'result': result})
+    return json_response({'result': result})
+
+@app.route('/api/attachments', methods=['POST'])
+@requires_auth
+def upload_attachment(user):
+    """Store a file for a later send; the returned id goes in the send's attachments list"""
+    gmail_service = gmail_pool.load(user['sub'])
+    if gmail_service is None:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    upload = request.files.get('file')
+    if upload is None or upload.filename == '':
+        return jsonify({'error': 'No file provided'}), 400
+    
+    filename = secure_filename(upload.filename) or 'attachment'
+    upload_id = gmail_service.save_upload(upload.stream, filename)
+    return jsonify({'id': upload_id, 'filename': filename}), 201
+
+@app.route('/api/emails/send/batch', methods=['POST'])
+@requires_auth
+def send_email_batch(user):
+    """Send a list of emails; returns a status entry per message"""
+    gmail_service = gmail_pool.load(user['sub'])
+    if gmail_service is None:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    data = request.get_json()
+    messages = data.get('messages') if data else None
+    
+    if not isinstance(messages, list) or not messages:
+        return jsonify({'error': 'Missing required field: messages'}), 400
+    
+    if len(messages) > Config.SEND_BATCH_LIMIT:
+        return jsonify({'error': f'At most {Config.SEND_BATCH_LIMIT} messages per batch'}), 400
+    
+    resolved = []
+    for index, item in enumerate(messages):
+        if isinstance(item, dict) and item.get('attachments') is not None:
+            try:
+                item = dict(item, attachments=gmail_service.upload_paths(item['attachments']))
+            except ValueError as e:
+                return jsonify({'error': f'messages[{index}]: {e}'}), 400
+        resolved.append(item)
+    
+    results = gmail_service.send_batch(resolved)
+    
+    if results is None:
+        return jsonify({'error': 'Failed to send emails'}), 500
+    
+    return json_response({'results': results})
 
 @app.route('/api/emails/<message_id>/reply', methods=['POST'])
-def reply_to_email(message_id):
+@requires_auth
+def reply_to_email(message_id, user):
     """Reply to an email"""
-    if not gmail_service.load_credentials():
+    gmail_service = gmail_pool.load(user['sub'])
+    if gmail_service is None:
         return jsonify({'error': 'Not authenticated'}), 401
     
     data = request.get_json()
@@ -117,19 +265,13 @@ def reply_to_email(message_id):
     if not data.get('to') or not data.get('body'):
         return jsonify({'error': 'Missing required fields: to, body'}), 400
     
-    # Get original email to create proper subject
-    original_email = gmail_service.get_message_by_id(message_id)
-    if not original_email:
+    # One metadata fetch (cached) gives the subject, thread and Message-ID for the reply
+    if gmail_service.get_thread_info(message_id) is None:
         return jsonify({'error': 'Original email not found'}), 404
     
-    # Create reply subject
-    original_subject = original_email.get('subject', '')
-    reply_subject = f"Re: {original_subject}" if not original_subject.startswith('Re:') else original_subject
-    
     result = gmail_service.send_reply(
         original_message_id=message_id,
         to=data['to'],
-        subject=reply_subject,
         body=data['body'],
         html_body=data.get('html_body')
     )
@@ -137,25 +279,32 @@ def reply_to_email(message_id):
     if result is None:
         return jsonify({'error': 'Failed to send reply'}), 500
     
-    return jsonify({'result': result})
+    return json_response({'result': result})
 
 @app.route('/api/drafts', methods=['GET'])
-def get_drafts():
-    """Get draft emails"""
-    if not gmail_service.load_credentials():
+@requires_auth
+def get_drafts(user):
+    """Get a page of draft emails"""
+    max_results = int(request.args.get('max_results', 20))
+    page_token = request.args.get('page_token')
+    
+    gmail_service = gmail_pool.load(user['sub'])
+    if gmail_service is None:
         return jsonify({'error': 'Not authenticated'}), 401
     
-    drafts = gmail_service.get_draft_messages()
+    result = gmail_service.get_draft_messages(max_results, page_token)
     
-    if drafts is None:
+    if result is None:
         return jsonify({'error': 'Failed to fetch drafts'}), 500
     
-    return jsonify({'drafts': drafts})
+    return json_response({'drafts': result['drafts'], 'next_page_token': result['next_page_token']})
 
 @app.route('/api/drafts', methods=['POST'])
-def create_draft():
+@requires_auth
+def create_draft(user):
     """Create a draft email"""
-    if not gmail_service.load_credentials():
+    gmail_service = gmail_pool.load(user['sub'])
+    if gmail_service is None:
         return jsonify({'error': 'Not authenticated'}), 401
     
     data = request.get_json()
@@ -173,4 +322,4 @@ def create_draft():
     if result is None:
         return jsonify({'error': 'Failed to create draft'}), 500
     
-    return jsonify({'result': result})
\ No newline at end of file
+    return json_response({'result': result})
\ No newline at end of file
@@ -0,0 +1,105 @@
+import hashlib
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from backend.endpoints.gmail_service import GmailService
+from backend.endpoints.message_store import MessageStore
+from backend.endpoints.search_index import SearchIndex
+from config import Config
+
+
+class CredentialStore:
+    """Per-user directories for Gmail tokens and local mail data, keyed by Auth0 sub"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def user_dir(self, sub):
+        # Hash the sub so it is safe as a directory name
+        digest = hashlib.sha256(sub.encode('utf-8')).hexdigest()[:32]
+        path = os.path.join(self.root, digest)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def token_file(self, sub):
+        return os.path.join(self.user_dir(sub), 'token.json')
+
+    def delete_token(self, sub):
+        try:
+            os.remove(self.token_file(sub))
+        except FileNotFoundError:
+            pass
+
+
+class GmailClientPool:
+    """LRU pool of per-user GmailService instances"""
+
+    def __init__(self, credential_store, maxsize=Config.GMAIL_POOL_SIZE):
+        self.credential_store = credential_store
+        self.maxsize = maxsize
+        self._services = OrderedDict()
+        self._lock = threading.Lock()
+        # Entries vanish once no caller holds the lock, so this does not grow per sub ever seen
+        self._user_locks = weakref.WeakValueDictionary()
+
+    def user_lock(self, sub):
+        """Lock serializing credential loads and logout for one user"""
+        with self._lock:
+            lock = self._user_locks.get(sub)
+            if lock is None:
+                lock = self._user_locks[sub] = threading.Lock()
+            return lock
+
+    def _create(self, sub):
+        user_dir = self.credential_store.user_dir(sub)
+        search_index = None
+        if Config.LOCAL_SEARCH:
+            search_index = SearchIndex(os.path.join(user_dir, Config.SEARCH_INDEX_PATH))
+        return GmailService(
+            store=MessageStore(os.path.join(user_dir, Config.MESSAGE_STORE_PATH)),
+            search_index=search_index,
+            token_file=self.credential_store.token_file(sub),
+            upload_dir=os.path.join(user_dir, Config.UPLOAD_DIR)
+        )
+
+    def get(self, sub):
+        """Return the user's service, creating it on first use"""
+        with self._lock:
+            service = self._services.get(sub)
+            if service is not None:
+                self._services.move_to_end(sub)
+                return service
+
+        # Build outside the pool lock so one slow user does not block the others
+        with self.user_lock(sub):
+            with self._lock:
+                service = self._services.get(sub)
+            if service is None:
+                service = self._create(sub)
+
+            with self._lock:
+                self._services[sub] = service
+                self._services.move_to_end(sub)
+                while len(self._services) > self.maxsize:
+                    # In-flight requests keep their reference; the evicted service
+                    # and its SQLite connections are freed once they finish
+                    self._services.popitem(last=False)
+        return service
+
+    def load(self, sub):
+        """Return the user's service if they have valid Gmail credentials, else None"""
+        service = self.get(sub)
+        service.mark_foreground()
+        with self.user_lock(sub):
+            if not service.load_credentials():
+                return None
+        return service
+
+    def logout(self, sub):
+        """Forget the user's Gmail token, local mail data and pooled client"""
+        with self.user_lock(sub):
+            self.credential_store.delete_token(sub)
+            with self._lock:
+                service = self._services.pop(sub, None)
+            (service or self._create(sub)).clear_local_data()
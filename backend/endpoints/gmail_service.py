@@ -1,21 +1,169 @@
 from email import encoders
 from email.mime.base import MIMEBase
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.header import Header
+from email.utils import formataddr, getaddresses
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import os
+import re
 import json
+import shutil
 import base64
+import mimetypes
+import tempfile
+import threading
+import uuid
+import time
+import weakref
+import datetime
+from urllib.parse import urlsplit
 from google.auth.transport.requests import Request
+from google_auth_httplib2 import AuthorizedHttp
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import Flow
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest, MediaFileUpload, build_http
 from config import Config
+from backend.endpoints.email_record import EmailRecord
+from backend.endpoints.rate_limit import TokenBucket
+from backend.endpoints.resilience import Upstream, default_classifier
+
+# Gmail accepts up to 100 calls per batch but recommends keeping batches to 50
+GMAIL_BATCH_SIZE = 50
+# Smaller batches when streaming so the first messages arrive quickly
+STREAM_CHUNK_SIZE = 10
+# Page tokens that point into the local message store rather than Gmail
+LOCAL_PAGE_PREFIX = 'local:'
+# Body part types in order of preference
+BODY_TYPE_PREFERENCE = ('text/plain', 'text/html')
+# Encoded bytes decoded per chunk when streaming attachments
+ATTACHMENT_CHUNK_SIZE = 64 * 1024
+# Reply path only needs these headers from the original message
+THREAD_INFO_REQUEST_PARAMS = {
+    'format': 'metadata',
+    'metadataHeaders': ['Subject', 'Message-ID', 'References'],
+    'fields': 'id,threadId,payload/headers'
+}
+THREAD_INFO_CACHE_SIZE = 256
+# Raw bytes per base64 chunk; a multiple of 57 so every output line is a full 76 chars
+BASE64_CHUNK_SIZE = 57 * 1024
+# Resumable upload chunk size for large outgoing messages
+UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024
+# messages.list leaves out spam and trash, so the synced store must too
+EXCLUDED_LABELS = frozenset({'SPAM', 'TRASH'})
+# save_upload() ids; anything else in a send's attachments is rejected
+UPLOAD_ID_PATTERN = re.compile(r'[0-9a-f]{32}')
+# POST endpoints that create or deliver something; a resumable upload ends in /messages/send too
+NON_IDEMPOTENT_PATHS = ('/messages/send', '/messages/import', '/messages', '/drafts/send', '/drafts')
+HISTORY_TYPES = ['messageAdded', 'messageDeleted', 'labelAdded', 'labelRemoved']
+# List views only need these headers; bodies are fetched when a message is opened
+LIST_REQUEST_PARAMS = {
+    'format': 'metadata',
+    'metadataHeaders': ['Subject', 'From', 'Date'],
+    'fields': 'id,threadId,historyId,internalDate,snippet,payload/headers'
+}
+
+
+def _is_gmail_quota_error(error):
+    """429 and 403 rateLimitExceeded/userRateLimitExceeded are one user's quota, not an outage"""
+    if not isinstance(error, HttpError):
+        return False
+    status = error.resp.status
+    return status == 429 or (status == 403 and b'ateLimitExceeded' in (error.content or b''))
+
+
+def _gmail_classifier(error):
+    """Gmail reports per-user rate limits as 403 rateLimitExceeded rather than 429"""
+    retryable, retry_after = default_classifier(error)
+    if not retryable and _is_gmail_quota_error(error):
+        retryable = True
+    return retryable, retry_after
+
+
+def _gmail_send_classifier(error):
+    """A 5xx or timeout on a send may arrive after Gmail delivered it; only quota refusals are safe to retry"""
+    _, retry_after = default_classifier(error)
+    return _is_gmail_quota_error(error), retry_after
+
+
+def _is_non_idempotent(method, uri):
+    """messages.send/insert/import and drafts.create/send; a retry could send or store twice"""
+    return method == 'POST' and urlsplit(uri).path.rstrip('/').endswith(NON_IDEMPOTENT_PATHS)
+
+
+gmail_upstream = Upstream(
+    'gmail',
+    max_attempts=Config.RETRY_MAX_ATTEMPTS,
+    max_concurrency=Config.GMAIL_MAX_CONCURRENCY,
+    failure_threshold=Config.CIRCUIT_FAILURE_THRESHOLD,
+    reset_timeout=Config.CIRCUIT_RESET_TIMEOUT,
+    classifier=_gmail_classifier,
+    # The breaker is shared by every user, so one user's quota must not trip it
+    is_quota_error=_is_gmail_quota_error
+)
+
+
+class ResilientHttpRequest(HttpRequest):
+    """HttpRequest whose execute() goes through the shared Gmail retry/circuit layer"""
+    
+    def execute(self, http=None, num_retries=0):
+        if _is_non_idempotent(self.method, self.uri):
+            return gmail_upstream.call_with(_gmail_send_classifier, super().execute, http=http)
+        return gmail_upstream.call(super().execute, http=http)
+
+
+class ThreadLocalHttp:
+    """Stands in for the client's http and hands each calling thread its own connection
+
+    One user's concurrent requests share a built client; a single httplib2
+    connection under them interleaves requests and hands back each other's responses.
+    """
+
+    def __init__(self, service):
+        # Weak so the pool can drop an evicted service without waiting for the cycle collector
+        self._thread_http = weakref.WeakMethod(service.thread_http)
+
+    def __getattr__(self, name):
+        return getattr(self._thread_http()(), name)
+
+    def request(self, *args, **kwargs):
+        return self._thread_http()().request(*args, **kwargs)
+
 
 class GmailService:
-    def __init__(self):
+    def __init__(self, store=None, search_index=None, token_file=None, upload_dir=None):
         self.service = None
         self.creds = None
+        # Where this user's OAuth token is persisted
+        self.token_file = token_file or Config.TOKEN_FILE
+        # Optional MessageStore that list/detail reads are served from
+        self.store = store
+        # Optional SearchIndex that answers queries before falling back to Gmail
+        self.search_index = search_index
+        # This user's uploaded attachments; the only files a send may read
+        self.upload_dir = upload_dir
+        self._last_sync = 0
+        # mtime of the token file the cached creds were loaded from
+        self._token_mtime = None
+        # Shared across requests so bulk sends stay under the per-user send quota
+        self.send_limiter = TokenBucket(Config.SEND_RATE_PER_SECOND, Config.SEND_BURST)
+        # Per-thread authorized connections for concurrent dispatch
+        self._local = threading.local()
+        # message id -> (expires_at, thread info) for the reply path
+        self._thread_info = OrderedDict()
+        self._thread_info_lock = threading.Lock()
+        # One sync at a time, so a request arriving mid-prefetch waits instead of repeating it
+        self._sync_lock = threading.Lock()
+        # (expires_at, max_results, page) for the first page of drafts
+        self._drafts_cache = None
+        # monotonic time of the user's latest request; background prefetch yields to it
+        self.last_foreground = 0
         
-    def get_authorization_url(self):
-        """Generate authorization URL for OAuth2 flow"""
+    def get_authorization_url(self, state=None):
+        """Generate authorization URL for OAuth2 flow; state is echoed back to the callback"""
         flow = Flow.from_client_secrets_file(
             Config.CREDENTIALS_FILE,
             scopes=Config.SCOPES,
@@ -24,7 +172,8 @@ class GmailService:
         
         authorization_url, _ = flow.authorization_url(
             access_type='offline',
-            include_granted_scopes='true'
+            include_granted_scopes='true',
+            state=state
         )
         
         return authorization_url
@@ -47,132 +196,588 @@ class GmailService:
         return True
     
     def load_credentials(self):
-        """Load existing credentials"""
-        if os.path.exists(Config.TOKEN_FILE):
+        """Load existing credentials, reusing the cached client while the token file is unchanged"""
+        try:
+            token_mtime = os.path.getmtime(self.token_file)
+        except OSError:
+            # Token file was removed (e.g. logout)
+            self.creds = None
+            self.service = None
+            self._token_mtime = None
+            return False
+        
+        if self.creds is None or token_mtime != self._token_mtime:
             self.creds = Credentials.from_authorized_user_file(
-                Config.TOKEN_FILE, Config.SCOPES
+                self.token_file, Config.SCOPES
             )
+            self._token_mtime = token_mtime
+            self.service = None
         
-        # Refresh if expired
-        if self.creds and self.creds.expired and self.creds.refresh_token:
+        # Refresh shortly before expiry; the built client shares this creds object
+        if self._needs_refresh() and self.creds.refresh_token:
             self.creds.refresh(Request())
             self._save_credentials()
         
-        if self.creds and self.creds.valid:
-            self._build_service()
+        if self.creds.valid:
+            if self.service is None:
+                self._build_service()
             return True
         
         return False
     
+    def clear_local_data(self):
+        """Forget cached credentials, the built client and locally stored mail"""
+        self.creds = None
+        self.service = None
+        self._token_mtime = None
+        self._drafts_cache = None
+        with self._thread_info_lock:
+            self._thread_info.clear()
+        if self.store:
+            self.store.clear()
+        if self.search_index:
+            self.search_index.clear()
+        if self.upload_dir:
+            shutil.rmtree(self.upload_dir, ignore_errors=True)
+    
+    def mark_foreground(self):
+        """Record a user request so background prefetch backs off"""
+        self.last_foreground = time.monotonic()
+    
+    def _needs_refresh(self):
+        """True if the access token is expired or about to expire"""
+        if self.creds.expiry is None:
+            return not self.creds.valid
+        # google-auth stores expiry as naive UTC
+        remaining = self.creds.expiry - datetime.datetime.utcnow()
+        return remaining < datetime.timedelta(seconds=Config.TOKEN_REFRESH_MARGIN)
+    
     def _save_credentials(self):
         """Save credentials to file"""
-        with open(Config.TOKEN_FILE, 'w') as token:
+        with open(self.token_file, 'w') as token:
             token.write(self.creds.to_json())
+        self._token_mtime = os.path.getmtime(self.token_file)
     
     def _build_service(self):
-        """Build Gmail service"""
-        self.service = build('gmail', 'v1', credentials=self.creds)
+        """Build Gmail service from the discovery document bundled with the client library"""
+        self.service = build(
+            'gmail', 'v1',
+            http=ThreadLocalHttp(self),
+            static_discovery=True,
+            cache_discovery=False,
+            requestBuilder=ResilientHttpRequest
+        )
     
-    def get_messages(self, query='', max_results=10):
-        """Get messages based on query"""
+    def get_messages(self, query='', max_results=10, page_token=None):
+        """Get a page of messages based on query"""
         if not self.service:
             return None
         
+        local_results = self._search_local(query, max_results, page_token)
+        if local_results:
+            # Only fetched messages are indexed, so matches elsewhere in the mailbox are missing
+            return {'messages': local_results, 'next_page_token': None, 'partial': True}
+        
         try:
-            results = self.service.users().messages().list(
-                userId='me',
-                q=query,
-                maxResults=max_results
-            ).execute()
+            message_ids, next_page_token = self._list_message_ids(query, max_results, page_token)
+            return {
+                'messages': list(self._iter_parsed_messages(message_ids)),
+                'next_page_token': next_page_token
+            }
             
-            messages = results.get('messages', [])
+        except Exception as error:
+            print(f'An error occurred: {error}')
+            return None
+    
+    def stream_messages(self, query='', max_results=10, page_token=None):
+        """Return (iterator of messages, next_page_token); messages are fetched as the iterator advances"""
+        if not self.service:
+            return None
+        
+        if not query and self.store and (page_token is None or page_token.startswith(LOCAL_PAGE_PREFIX)):
+            page = self.get_stored_messages(max_results, page_token)
+            if page is None:
+                return None
+            return iter(page['messages']), page['next_page_token']
+        
+        local_results = self._search_local(query, max_results, page_token)
+        if local_results:
+            return iter(local_results), None
+        
+        try:
+            message_ids, next_page_token = self._list_message_ids(query, max_results, page_token)
+        except Exception as error:
+            print(f'An error occurred: {error}')
+            return None
+        
+        return self._iter_parsed_messages(message_ids, chunk_size=STREAM_CHUNK_SIZE), next_page_token
+    
+    def _list_message_ids(self, query='', max_results=10, page_token=None):
+        """List one page of message ids and the cursor for the next page"""
+        results = self.service.users().messages().list(
+            userId='me',
+            q=query,
+            maxResults=max_results,
+            pageToken=page_token
+        ).execute()
+        
+        message_ids = [m['id'] for m in results.get('messages', [])]
+        return message_ids, results.get('nextPageToken')
+    
+    def _iter_parsed_messages(self, message_ids, chunk_size=GMAIL_BATCH_SIZE):
+        """Fetch messages chunk by chunk and yield their parsed data"""
+        for start in range(0, len(message_ids), chunk_size):
+            items = []
+            for msg in self._batch_get_messages(message_ids[start:start + chunk_size], **LIST_REQUEST_PARAMS):
+                try:
+                    items.append((msg, self._extract_message_data(msg, include_body=False)))
+                except Exception as error:
+                    print(f"Failed to parse message {msg.get('id')}: {error}")
             
-            # Get full message details
-            full_messages = []
-            for message in messages:
-                msg = self.service.users().messages().get(
-                    userId='me',
-                    id=message['id']
-                ).execute()
+            self._index_messages(items)
+            for _, record in items:
+                yield record
+    
+    def _search_local(self, query, max_results, page_token=None):
+        """Answer a query from the local index; None means ask Gmail
+
+        Only a full page is answered locally. Fewer hits than max_results say little
+        about the rest of the mailbox, which the index has never seen.
+        """
+        if not self.search_index or not query or page_token:
+            return None
+        
+        try:
+            results = self.search_index.search(query, limit=max_results)
+        except Exception as error:
+            print(f'Local search failed: {error}')
+            return None
+        
+        if results is None or len(results) < max_results:
+            return None
+        return results
+    
+    def _index_messages(self, items):
+        """Add (raw message, record) pairs to the local search index"""
+        if not self.search_index or not items:
+            return
+        
+        try:
+            self.search_index.add(items)
+        except Exception as error:
+            print(f'Failed to index messages: {error}')
+    
+    def _batch_get(self, build_request, ids, label='message', http=None):
+        """Run build_request(id) for each id through the batch endpoint, keeping order
+
+        Items that fail with a retryable error (a per-user 429, a 5xx) are
+        re-batched with backoff; permanent failures such as a 404 are skipped.
+        """
+        results = {}
+        retry = {}
+        
+        def callback(request_id, response, exception):
+            # One failed item should not fail the whole page
+            if exception is None:
+                results[request_id] = response
+                return
+            retryable, retry_after = _gmail_classifier(exception)
+            if retryable:
+                retry[request_id] = (exception, retry_after)
+            else:
+                print(f'Failed to fetch {label} {request_id}: {exception}')
+        
+        pending = list(ids)
+        for attempt in range(gmail_upstream.max_attempts):
+            if attempt:
+                delays = [retry_after for _, retry_after in retry.values() if retry_after is not None]
+                gmail_upstream.pause(attempt - 1, max(delays, default=None))
+                retry.clear()
+            for start in range(0, len(pending), GMAIL_BATCH_SIZE):
+                batch = self.service.new_batch_http_request(callback=callback)
+                for item_id in pending[start:start + GMAIL_BATCH_SIZE]:
+                    batch.add(build_request(item_id), request_id=item_id)
+                gmail_upstream.call(batch.execute, http=http)
+            if not retry:
+                break
+            pending = [item_id for item_id in pending if item_id in retry]
+        
+        for item_id, (exception, _) in retry.items():
+            print(f'Failed to fetch {label} {item_id} after {gmail_upstream.max_attempts} attempts: {exception}')
+        return [results[item_id] for item_id in ids if item_id in results]
+    
+    def _batch_get_messages(self, message_ids, http=None, **kwargs):
+        """Fetch messages through the batch endpoint, keeping list order"""
+        return self._batch_get(
+            lambda message_id: self.service.users().messages().get(
+                userId='me', id=message_id, **kwargs
+            ),
+            message_ids,
+            http=http
+        )
+    
+    def sync_messages(self, force=False, http=None):
+        """Bring the local store up to date using Gmail history deltas
+
+        Background callers pass their own http; httplib2 connections are not thread-safe.
+        """
+        if not self.service or not self.store:
+            return False
+        
+        if not force and time.monotonic() - self._last_sync < Config.MESSAGE_SYNC_INTERVAL:
+            return True
+        
+        with self._sync_lock:
+            # Another thread may have finished a sync while this one waited
+            if not force and time.monotonic() - self._last_sync < Config.MESSAGE_SYNC_INTERVAL:
+                return True
+            try:
+                history_id = self.store.get_state('history_id')
+                if history_id is None:
+                    self._full_sync(http)
+                else:
+                    try:
+                        self._incremental_sync(history_id, http)
+                    except HttpError as error:
+                        # History older than Gmail keeps (about a week) needs a full resync
+                        if error.resp.status != 404:
+                            raise
+                        self._resync(http)
+                
+                self._last_sync = time.monotonic()
+                return True
                 
-                # Extract text content
-                email_data = self._extract_message_data(msg)
-                full_messages.append(email_data)
+            except Exception as error:
+                print(f'An error occurred: {error}')
+                return False
+    
+    def _full_sync(self, http=None):
+        """Load the newest messages and remember the mailbox historyId"""
+        # Record the history id first so nothing that arrives during the sync is missed
+        profile = self.service.users().getProfile(userId='me').execute(http=http)
+        
+        results = self.service.users().messages().list(
+            userId='me',
+            maxResults=Config.MESSAGE_SYNC_SIZE
+        ).execute(http=http)
+        self._store_messages([m['id'] for m in results.get('messages', [])], http=http)
+        
+        # The store holds the newest messages; Gmail's cursor continues after them
+        self.store.set_state('list_page_token', results.get('nextPageToken'))
+        self.store.set_state('history_id', profile['historyId'])
+    
+    def _resync(self, http=None):
+        """Full sync after the history cursor expired, keeping bodies of messages still listed
+
+        Whatever the fresh listing does not bring back may have been deleted or
+        trashed since, so it leaves the store and the index, opened-only rows included.
+        """
+        self.store.unlist_all()
+        self._full_sync(http)
+        removed = self.store.delete_unlisted()
+        if removed and self.search_index:
+            self.search_index.remove(removed)
+    
+    def _incremental_sync(self, history_id, http=None):
+        """Apply added, deleted and relabelled messages since history_id"""
+        # message id -> True if it belongs in the store, False if it should leave it;
+        # later history records overwrite earlier ones
+        membership = {}
+        page_token = None
+        latest_history_id = history_id
+        
+        while True:
+            results = self.service.users().history().list(
+                userId='me',
+                startHistoryId=history_id,
+                historyTypes=HISTORY_TYPES,
+                pageToken=page_token
+            ).execute(http=http)
             
-            return full_messages
+            for record in results.get('history', []):
+                for item in record.get('messagesAdded', []):
+                    membership[item['message']['id']] = self._is_listed(item['message'])
+                for item in record.get('labelsAdded', []) + record.get('labelsRemoved', []):
+                    # Only trash and spam moves change what the full sync's list would return
+                    if EXCLUDED_LABELS.intersection(item.get('labelIds', [])):
+                        membership[item['message']['id']] = self._is_listed(item['message'])
+                for item in record.get('messagesDeleted', []):
+                    membership[item['message']['id']] = False
             
-        except Exception as error:
-            print(f'An error occurred: {error}')
+            latest_history_id = results.get('historyId', latest_history_id)
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                break
+        
+        added = [message_id for message_id, listed in membership.items() if listed]
+        deleted = {message_id for message_id, listed in membership.items() if not listed}
+        if deleted:
+            self.store.delete_messages(list(deleted))
+            if self.search_index:
+                self.search_index.remove(list(deleted))
+        if added:
+            # A message restored from trash may predate the synced window; listing it
+            # would also repeat it once paging hands over to Gmail's cursor
+            self._store_messages(added, not_before=self.store.oldest_listed_date(), http=http)
+        
+        self.store.set_state('history_id', latest_history_id)
+    
+    @staticmethod
+    def _is_listed(message):
+        """Whether a history message (with its current labelIds) belongs in the inbox listing"""
+        return not EXCLUDED_LABELS.intersection(message.get('labelIds', []))
+    
+    def _store_messages(self, message_ids, not_before=None, http=None):
+        """Fetch, parse and save messages to the local store, skipping any older than not_before"""
+        items = []
+        for msg in self._batch_get_messages(message_ids, http=http, **LIST_REQUEST_PARAMS):
+            if not_before is not None and int(msg.get('internalDate', 0)) < not_before:
+                continue
+            try:
+                items.append((msg, self._extract_message_data(msg, include_body=False)))
+            except Exception as error:
+                print(f"Failed to parse message {msg.get('id')}: {error}")
+        # Index the stored records, which keep any body already fetched
+        items = self.store.put_messages(items)
+        self._index_messages(items)
+        return [record for _, record in items]
+    
+    def get_stored_messages(self, max_results=10, page_token=None):
+        """Page of newest messages from the local store, synced first"""
+        if page_token and not page_token.startswith(LOCAL_PAGE_PREFIX):
+            # Past the end of the store; continue with Gmail's cursor
+            return self.get_messages('', max_results, page_token)
+        
+        if not self.sync_messages():
             return None
+        
+        offset = int(page_token[len(LOCAL_PAGE_PREFIX):]) if page_token else 0
+        messages = self.store.list_messages(limit=max_results, offset=offset)
+        
+        if len(messages) == max_results:
+            next_page_token = f'{LOCAL_PAGE_PREFIX}{offset + max_results}'
+        else:
+            next_page_token = self.store.get_state('list_page_token')
+        
+        return {'messages': messages, 'next_page_token': next_page_token}
+    
+    def prefetch_bodies(self, limit, wait_turn=lambda: True, http=None):
+        """Fetch full bodies for the newest stored messages; wait_turn() gates each chunk"""
+        if not self.service or not self.store:
+            return 0
+        
+        missing = [record.id for record in self.store.list_messages(limit=limit) if not record.has_body]
+        http = http or self.thread_http()
+        fetched = 0
+        for start in range(0, len(missing), STREAM_CHUNK_SIZE):
+            if not wait_turn():
+                break
+            items = []
+            for msg in self._batch_get(
+                lambda message_id: self.service.users().messages().get(userId='me', id=message_id),
+                missing[start:start + STREAM_CHUNK_SIZE],
+                http=http
+            ):
+                try:
+                    items.append((msg, self._extract_message_data(msg, http=http)))
+                except Exception as error:
+                    print(f"Failed to parse message {msg.get('id')}: {error}")
+            # Never re-lists a message that left the listing while this chunk was in flight
+            self.store.put_messages(items, listed=False)
+            self._index_messages(items)
+            fetched += len(items)
+        return fetched
     
     def get_message_by_id(self, message_id):
         """Get specific message by ID"""
         if not self.service:
             return None
         
+        if self.store:
+            message = self.store.get_message(message_id)
+            # List syncs store metadata only; fetch the full message on first open
+            if message is not None and message.has_body:
+                return message
+        
         try:
             message = self.service.users().messages().get(
                 userId='me',
                 id=message_id
             ).execute()
             
-            return self._extract_message_data(message)
+            message_data = self._extract_message_data(message)
+            if self.store:
+                # Opened messages (e.g. old search hits) must not join the inbox listing
+                self.store.put_messages([(message, message_data)], listed=False)
+            self._index_messages([(message, message_data)])
+            return message_data
             
         except Exception as error:
             print(f'An error occurred: {error}')
             return None
     
-    def _extract_message_data(self, message):
-        """Extract relevant data from message"""
-        headers = message['payload'].get('headers', [])
-        
-        # Extract headers
-        subject = next((h['value'] for h in headers if h['name'] == 'Subject'), '')
-        sender = next((h['value'] for h in headers if h['name'] == 'From'), '')
-        date = next((h['value'] for h in headers if h['name'] == 'Date'), '')
+    def _extract_message_data(self, message, include_body=True, http=None):
+        """Extract relevant data from message; metadata-only messages skip the body"""
+        record = EmailRecord.from_message(message)
         
         # Extract body
-        body = self._extract_body(message['payload'])
-        
-        return {
-            'id': message['id'],
-            'subject': subject,
-            'sender': sender,
-            'date': date,
-            'body': body,
-            'snippet': message.get('snippet', '')
-        }
+        if include_body:
+            record.body, record.attachments = self._extract_body(message['payload'], message['id'], http=http)
+        
+        return record
     
-    def _extract_body(self, payload):
-        """Extract body text from message payload"""
-        body = ''
-        
-        if 'parts' in payload:
-            for part in payload['parts']:
-                if part['mimeType'] == 'text/plain':
-                    data = part['body']['data']
-                    body = base64.urlsafe_b64decode(data).decode('utf-8')
-                    break
-                elif part['mimeType'] == 'multipart/alternative':
-                    body = self._extract_body(part)
-        else:
-            if payload['mimeType'] == 'text/plain':
-                data = payload['body']['data']
-                body = base64.urlsafe_b64decode(data).decode('utf-8')
+    def _extract_body(self, payload, message_id, preferred_types=BODY_TYPE_PREFERENCE, http=None):
+        """Walk the MIME tree once; decode only the preferred text part and list attachments"""
+        candidates = {}
+        attachments = []
+        
+        # Iterative walk so deeply nested multiparts cannot hit the recursion limit
+        stack = [payload]
+        while stack:
+            part = stack.pop()
+            children = part.get('parts')
+            if children:
+                # Reversed so parts are visited in document order
+                stack.extend(reversed(children))
+                continue
+            
+            mime_type = part.get('mimeType', '')
+            part_body = part.get('body', {})
+            
+            if part.get('filename'):
+                attachments.append({
+                    'attachment_id': part_body.get('attachmentId'),
+                    'part_id': part.get('partId'),
+                    'filename': part['filename'],
+                    'mime_type': mime_type,
+                    'size': part_body.get('size', 0)
+                })
+            elif mime_type in preferred_types and mime_type not in candidates:
+                candidates[mime_type] = part_body
         
-        return body
+        for mime_type in preferred_types:
+            if mime_type in candidates:
+                return self._decode_part_body(candidates[mime_type], message_id, http), attachments
+        
+        return '', attachments
     
-    def send_email(self, to, subject, body, html_body=None, attachments=None):
-        """Send an email"""
+    def _decode_part_body(self, part_body, message_id, http=None):
+        """Decode a text part, fetching it first if Gmail stored it as an attachment"""
+        data = part_body.get('data')
+        if data is None and part_body.get('attachmentId'):
+            data = self.service.users().messages().attachments().get(
+                userId='me',
+                messageId=message_id,
+                id=part_body['attachmentId']
+            ).execute(http=http).get('data')
+        if not data:
+            return ''
+        return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4)).decode('utf-8', errors='replace')
+    
+    def get_attachment_info(self, message_id, attachment_id, part_id=None):
+        """The message's own descriptor (filename, mime_type, ...) for one of its attachments
+
+        Gmail issues new attachment ids each time a message is fetched, so a stale id
+        is matched by its MIME part id instead.
+        """
+        message = self.get_message_by_id(message_id)
+        if message is None:
+            return None
+        
+        attachments = message.attachments or []
+        for attachment in attachments:
+            if attachment['attachment_id'] == attachment_id:
+                return attachment
+        if part_id is not None:
+            for attachment in attachments:
+                if attachment['part_id'] == part_id:
+                    return attachment
+        return None
+    
+    def iter_attachment(self, message_id, attachment_id, chunk_size=ATTACHMENT_CHUNK_SIZE):
+        """Fetch an attachment and yield its decoded bytes chunk by chunk
+
+        attachments.get returns the whole attachment as one base64 string, so the
+        encoded payload is held in memory for the life of the iterator; chunking only
+        avoids a second, decoded copy of it. Memory is not bounded by chunk_size.
+        """
         if not self.service:
             return None
         
         try:
-            message = self._create_message(to, subject, body, html_body, attachments)
-            sent_message = self.service.users().messages().send(
+            data = self.service.users().messages().attachments().get(
                 userId='me',
-                body=message
-            ).execute()
+                messageId=message_id,
+                id=attachment_id
+            ).execute()['data']
+        except Exception as error:
+            print(f'An error occurred: {error}')
+            return None
+        
+        def chunks():
+            # Base64 decodes cleanly on 4-character boundaries
+            step = chunk_size - chunk_size % 4
+            for start in range(0, len(data), step):
+                chunk = data[start:start + step]
+                yield base64.urlsafe_b64decode(chunk + '=' * (-len(chunk) % 4))
+        
+        return chunks()
+    
+    def save_upload(self, fileobj, filename):
+        """Store an uploaded attachment under this user's upload dir; returns the id sends refer to"""
+        if not self.upload_dir:
+            raise ValueError('Uploads are not enabled')
+        self._prune_uploads()
+        upload_id = uuid.uuid4().hex
+        directory = os.path.join(self.upload_dir, upload_id)
+        os.makedirs(directory)
+        # One file per id, under its sanitized name so the attachment keeps it
+        with open(os.path.join(directory, filename), 'wb') as out:
+            shutil.copyfileobj(fileobj, out, BASE64_CHUNK_SIZE)
+        return upload_id
+    
+    def upload_paths(self, upload_ids):
+        """Resolve save_upload() ids to files; client-supplied paths are never opened"""
+        if upload_ids is None:
+            return []
+        if not isinstance(upload_ids, list):
+            raise ValueError('attachments must be a list of upload ids')
+        paths = []
+        for upload_id in upload_ids:
+            if not self.upload_dir or not isinstance(upload_id, str) or not UPLOAD_ID_PATTERN.fullmatch(upload_id):
+                raise ValueError(f'Unknown attachment: {upload_id!r}')
+            directory = os.path.join(self.upload_dir, upload_id)
+            try:
+                names = os.listdir(directory)
+            except FileNotFoundError:
+                raise ValueError(f'Unknown attachment: {upload_id!r}') from None
+            if len(names) != 1:
+                raise ValueError(f'Unknown attachment: {upload_id!r}')
+            paths.append(os.path.join(directory, names[0]))
+        return paths
+    
+    def _prune_uploads(self):
+        """Drop uploads older than UPLOAD_MAX_AGE; a batch may reuse one, so sends keep them"""
+        cutoff = time.time() - Config.UPLOAD_MAX_AGE
+        try:
+            entries = list(os.scandir(self.upload_dir))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+            except FileNotFoundError:
+                pass
+    
+    def send_email(self, to, subject, body, html_body=None, attachments=None):
+        """Send an email; attachments are server paths, so resolve client input with upload_paths()"""
+        if not self.service:
+            return None
+        
+        try:
+            prepared = self._prepare_message(to, subject, body, html_body, attachments)
+            sent_message = self._dispatch_message(prepared)
             
             return {
                 'id': sent_message['id'],
@@ -184,41 +789,130 @@ class GmailService:
             print(f'An error occurred: {error}')
             return None
     
-    def send_reply(self, original_message_id, to, subject, body, html_body=None):
-        """Reply to an existing email"""
+    def send_batch(self, messages, max_workers=None):
+        """Send many messages concurrently under the send rate limit; returns per-item status"""
         if not self.service:
             return None
         
+        with ThreadPoolExecutor(max_workers=max_workers or Config.SEND_MAX_WORKERS) as pool:
+            # Each worker builds its payload just before sending it, so at most
+            # max_workers temp files exist at once
+            return list(pool.map(self._build_and_send, range(len(messages)), messages))
+    
+    def _build_and_send(self, index, item):
+        return self._send_batch_payload(index, self._build_batch_payload(item))
+    
+    def _build_batch_payload(self, item):
+        """Return (payload, error) for one bulk-send item"""
+        if not isinstance(item, dict) or not item.get('to') or not item.get('subject') or not item.get('body'):
+            return None, 'Missing required fields: to, subject, body'
+        
         try:
-            # Get the original message to get thread ID
-            original_message = self.service.users().messages().get(
-                userId='me',
-                id=original_message_id
-            ).execute()
-            
-            thread_id = original_message['threadId']
-            
-            # Create reply message
-            message = self._create_message(to, subject, body, html_body)
-            message['threadId'] = thread_id
-            
-            # Add In-Reply-To and References headers
-            headers = message.get('payload', {}).get('headers', [])
-            message_id_header = next(
-                (h['value'] for h in original_message['payload']['headers'] 
-                 if h['name'] == 'Message-ID'), None
-            )
+            return self._prepare_message(
+                item['to'],
+                item['subject'],
+                item['body'],
+                item.get('html_body'),
+                item.get('attachments')
+            ), None
+        except Exception as error:
+            return None, f'Failed to build message: {error}'
+    
+    def _send_batch_payload(self, index, built):
+        prepared, error = built
+        if error:
+            return {'index': index, 'status': 'invalid', 'error': error}
+        
+        self.send_limiter.acquire()
+        try:
+            sent_message = self._dispatch_message(prepared, http=self.thread_http())
             
-            if message_id_header:
-                headers.extend([
-                    {'name': 'In-Reply-To', 'value': message_id_header},
-                    {'name': 'References', 'value': message_id_header}
-                ])
+            return {
+                'index': index,
+                'id': sent_message['id'],
+                'threadId': sent_message['threadId'],
+                'status': 'sent'
+            }
             
-            sent_message = self.service.users().messages().send(
+        except Exception as error:
+            print(f'An error occurred: {error}')
+            return {'index': index, 'status': 'failed', 'error': str(error)}
+    
+    def thread_http(self):
+        """httplib2 is not thread-safe, so each worker thread gets its own authorized connection
+
+        build_http() stops httplib2 following 308s, which resumable uploads use for
+        "chunk received"; a bare httplib2.Http() fails every media send.
+        """
+        http = getattr(self._local, 'http', None)
+        if http is None or http.credentials is not self.creds:
+            http = AuthorizedHttp(self.creds, http=build_http())
+            self._local.http = http
+        return http
+    
+    def get_thread_info(self, message_id):
+        """Subject, threadId and Message-ID of a message from one metadata fetch, cached briefly"""
+        if not self.service:
+            return None
+        
+        with self._thread_info_lock:
+            cached = self._thread_info.get(message_id)
+            if cached and cached[0] > time.monotonic():
+                return cached[1]
+        
+        try:
+            message = self.service.users().messages().get(
                 userId='me',
-                body=message
+                id=message_id,
+                **THREAD_INFO_REQUEST_PARAMS
             ).execute()
+        except Exception as error:
+            print(f'An error occurred: {error}')
+            return None
+        
+        headers = {}
+        for header in message.get('payload', {}).get('headers', []):
+            headers.setdefault(header['name'].lower(), header['value'])
+        
+        info = {
+            'thread_id': message['threadId'],
+            'subject': headers.get('subject', ''),
+            'message_id_header': headers.get('message-id'),
+            'references': headers.get('references')
+        }
+        
+        with self._thread_info_lock:
+            self._thread_info[message_id] = (time.monotonic() + Config.THREAD_INFO_TTL, info)
+            self._thread_info.move_to_end(message_id)
+            while len(self._thread_info) > THREAD_INFO_CACHE_SIZE:
+                self._thread_info.popitem(last=False)
+        
+        return info
+    
+    def send_reply(self, original_message_id, to, body, html_body=None, subject=None):
+        """Reply to an existing email in its thread"""
+        if not self.service:
+            return None
+        
+        thread_info = self.get_thread_info(original_message_id)
+        if thread_info is None:
+            return None
+        
+        if subject is None:
+            original_subject = thread_info['subject']
+            subject = original_subject if original_subject.lower().startswith('re:') else f'Re: {original_subject}'
+        
+        # In-Reply-To/References keep the reply threaded for the recipient too
+        headers = {}
+        message_id_header = thread_info['message_id_header']
+        if message_id_header:
+            references = thread_info['references']
+            headers['In-Reply-To'] = message_id_header
+            headers['References'] = f'{references} {message_id_header}' if references else message_id_header
+        
+        try:
+            prepared = self._prepare_message(to, subject, body, html_body, headers=headers)
+            sent_message = self._dispatch_message(prepared, thread_id=thread_info['thread_id'])
             
             return {
                 'id': sent_message['id'],
@@ -230,18 +924,127 @@ class GmailService:
             print(f'An error occurred: {error}')
             return None
     
-    def _create_message(self, to, subject, body, html_body=None, attachments=None):
+    def _prepare_message(self, to, subject, body, html_body=None, attachments=None, headers=None):
+        """Build a message inline when small, or into a temp .eml file when attachments are large"""
+        if self._attachments_size(attachments) < Config.STREAMING_SEND_THRESHOLD:
+            return {'body': self._create_message(to, subject, body, html_body, attachments, headers)}
+        
+        fd, path = tempfile.mkstemp(suffix='.eml')
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                self._write_message(fp, to, subject, body, html_body, attachments, headers)
+        except Exception:
+            os.unlink(path)
+            raise
+        
+        return {'media_path': path}
+    
+    def _dispatch_message(self, prepared, thread_id=None, http=None):
+        """Send a prepared message, uploading file-backed ones as resumable media"""
+        media_path = prepared.get('media_path')
+        media = None
+        try:
+            if media_path:
+                body = {}
+                media = MediaFileUpload(
+                    media_path,
+                    mimetype='message/rfc822',
+                    chunksize=UPLOAD_CHUNK_SIZE,
+                    resumable=True
+                )
+            else:
+                body = dict(prepared['body'])
+            
+            if thread_id:
+                body['threadId'] = thread_id
+            
+            return self.service.users().messages().send(
+                userId='me',
+                body=body,
+                media_body=media
+            ).execute(http=http)
+        finally:
+            if media_path:
+                # Windows cannot delete a file that is still open
+                if media is not None:
+                    media.stream().close()
+                os.unlink(media_path)
+    
+    @staticmethod
+    def _attachments_size(attachments):
+        return sum(os.path.getsize(path) for path in attachments or [])
+    
+    def _write_message(self, fp, to, subject, body, html_body=None, attachments=None, headers=None):
+        """Write a multipart/mixed message to fp, base64-encoding attachments chunk by chunk"""
+        boundary = f'==============={uuid.uuid4().hex}=='
+        extra_headers = ''.join(f'{name}: {value}\n' for name, value in (headers or {}).items())
+        fp.write((
+            f'To: {self._format_addresses(to)}\n'
+            f'Subject: {Header(subject, "utf-8").encode()}\n'
+            f'{extra_headers}'
+            'MIME-Version: 1.0\n'
+            f'Content-Type: multipart/mixed; boundary="{boundary}"\n\n'
+        ).encode())
+        
+        # Text parts are small, so the email package renders them
+        if html_body:
+            text = MIMEMultipart('alternative')
+            text.attach(MIMEText(body, 'plain'))
+            text.attach(MIMEText(html_body, 'html'))
+        else:
+            text = MIMEText(body, 'plain')
+        fp.write(f'--{boundary}\n'.encode())
+        fp.write(text.as_bytes())
+        
+        for attachment_path in attachments or []:
+            filename = os.path.basename(attachment_path).replace('"', '')
+            fp.write((
+                f'\n--{boundary}\n'
+                f'Content-Type: {self._guess_content_type(attachment_path)}; name="{filename}"\n'
+                'Content-Transfer-Encoding: base64\n'
+                f'Content-Disposition: attachment; filename="{filename}"\n\n'
+            ).encode())
+            self._write_base64(fp, attachment_path)
+        
+        fp.write(f'\n--{boundary}--\n'.encode())
+    
+    @staticmethod
+    def _format_addresses(to):
+        """Address list for a raw header; only non-ASCII display names become encoded-words"""
+        return ', '.join(formataddr(pair, 'utf-8') for pair in getaddresses([to]))
+    
+    @staticmethod
+    def _write_base64(fp, path):
+        """Base64-encode a file into fp, one chunk in memory at a time
+
+        Plain reads, not an mmap: mapped pages stay resident until the mapping is
+        closed, so RSS would grow with the attachment.
+        """
+        with open(path, 'rb') as source:
+            for chunk in iter(lambda: source.read(BASE64_CHUNK_SIZE), b''):
+                fp.write(base64.encodebytes(chunk))
+    
+    @staticmethod
+    def _guess_content_type(path):
+        content_type, encoding = mimetypes.guess_type(path)
+        if content_type is None or encoding is not None:
+            content_type = 'application/octet-stream'
+        return content_type
+    
+    def _create_message(self, to, subject, body, html_body=None, attachments=None, headers=None):
         """Create a message for an email"""
         if html_body or attachments:
             message = MIMEMultipart('alternative')
         else:
             message = MIMEText(body)
-            message['to'] = to
-            message['subject'] = subject
-            return {'raw': base64.urlsafe_b64encode(message.as_bytes()).decode()}
         
         message['to'] = to
         message['subject'] = subject
+        for name, value in (headers or {}).items():
+            message[name] = value
+        
+        if not (html_body or attachments):
+            return {'raw': base64.urlsafe_b64encode(message.as_bytes()).decode()}
         
         # Add plain text part
         text_part = MIMEText(body, 'plain')
@@ -261,12 +1064,7 @@ class GmailService:
     
     def _add_attachment(self, message, attachment_path):
         """Add an attachment to the message"""
-        content_type, encoding = mimetypes.guess_type(attachment_path)
-        
-        if content_type is None or encoding is not None:
-            content_type = 'application/octet-stream'
-        
-        main_type, sub_type = content_type.split('/', 1)
+        main_type, sub_type = self._guess_content_type(attachment_path).split('/', 1)
         
         with open(attachment_path, 'rb') as fp:
             attachment_data = fp.read()
@@ -283,27 +1081,48 @@ class GmailService:
         
         message.attach(attachment)
     
-    def get_draft_messages(self):
-        """Get draft messages"""
+    def get_draft_messages(self, max_results=20, page_token=None, refresh=False, http=None):
+        """Get a page of draft messages; the first page is cached for DRAFTS_CACHE_TTL"""
         if not self.service:
             return None
         
+        cached = self._drafts_cache
+        if (not refresh and page_token is None and cached is not None
+                and cached[0] > time.monotonic() and cached[1] == max_results):
+            return cached[2]
+        
         try:
-            results = self.service.users().drafts().list(userId='me').execute()
+            results = self.service.users().drafts().list(
+                userId='me',
+                maxResults=max_results,
+                pageToken=page_token
+            ).execute(http=http)
             drafts = results.get('drafts', [])
             
+            # Hydrate the page in batched requests
             draft_details = []
-            for draft in drafts:
-                draft_detail = self.service.users().drafts().get(
-                    userId='me',
-                    id=draft['id']
-                ).execute()
-                
-                message_data = self._extract_message_data(draft_detail['message'])
-                message_data['draft_id'] = draft['id']
+            hydrated = self._batch_get(
+                lambda draft_id: self.service.users().drafts().get(userId='me', id=draft_id),
+                [draft['id'] for draft in drafts],
+                label='draft',
+                http=http
+            )
+            for draft_detail in hydrated:
+                try:
+                    message_data = self._extract_message_data(draft_detail['message'], http=http)
+                except Exception as error:
+                    print(f"Failed to parse draft {draft_detail.get('id')}: {error}")
+                    continue
+                message_data.draft_id = draft_detail['id']
                 draft_details.append(message_data)
             
-            return draft_details
+            page = {
+                'drafts': draft_details,
+                'next_page_token': results.get('nextPageToken')
+            }
+            if page_token is None:
+                self._drafts_cache = (time.monotonic() + Config.DRAFTS_CACHE_TTL, max_results, page)
+            return page
             
         except Exception as error:
             print(f'An error occurred: {error}')
@@ -324,6 +1143,8 @@ class GmailService:
                 userId='me',
                 body=draft
             ).execute()
+            # The cached first page no longer lists every draft
+            self._drafts_cache = None
             
             return {
                 'id': draft['id'],
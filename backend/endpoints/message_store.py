@@ -0,0 +1,161 @@
+import json
+import sqlite3
+import threading
+from dataclasses import replace
+from backend.endpoints.email_record import EmailRecord
+from backend.endpoints.fast_json import dumps
+
+# Ids per IN (...) query, under SQLite's default limit on bound variables
+SQL_VARIABLE_CHUNK = 500
+
+
+class MessageStore:
+    """SQLite store of parsed Gmail messages keyed by message id"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS messages (
+                id TEXT PRIMARY KEY,
+                thread_id TEXT,
+                internal_date INTEGER,
+                history_id INTEGER,
+                data TEXT NOT NULL,
+                -- 0 for messages only opened (e.g. from search), kept out of the listing
+                listed INTEGER NOT NULL DEFAULT 1
+            );
+            CREATE INDEX IF NOT EXISTS messages_internal_date
+                ON messages (internal_date DESC);
+            CREATE TABLE IF NOT EXISTS sync_state (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(messages)")}
+        if 'listed' not in columns:
+            # Stores created before detail-only rows existed
+            self._conn.execute("ALTER TABLE messages ADD COLUMN listed INTEGER NOT NULL DEFAULT 1")
+        self._conn.commit()
+
+    def put_messages(self, items, listed=True):
+        """Insert or update (raw message, EmailRecord) pairs; returns the pairs as stored
+
+        listed=False stores messages for detail reads only; a row that is already
+        listed stays listed. A metadata-only record keeps the body already stored
+        for its id (message content never changes), so a resync or a restore from
+        trash does not throw away bodies that were fetched.
+        """
+        with self._lock:
+            stored = self._stored_bodies([record.id for _, record in items if not record.has_body])
+            items = [
+                (raw, replace(record, body=stored[record.id].body, attachments=stored[record.id].attachments)
+                 if record.id in stored else record)
+                for raw, record in items
+            ]
+            rows = [
+                (
+                    record.id,
+                    raw.get('threadId'),
+                    int(raw.get('internalDate', 0)),
+                    int(raw.get('historyId', 0)),
+                    dumps(record),
+                    int(listed)
+                )
+                for raw, record in items
+            ]
+            self._conn.executemany(
+                "INSERT INTO messages (id, thread_id, internal_date, history_id, data, listed) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET thread_id = excluded.thread_id, "
+                "internal_date = excluded.internal_date, history_id = excluded.history_id, "
+                "data = excluded.data, listed = MAX(listed, excluded.listed)",
+                rows
+            )
+            self._conn.commit()
+        return items
+
+    def _stored_bodies(self, message_ids):
+        """id -> stored EmailRecord for those of message_ids that have a body; caller holds the lock"""
+        records = {}
+        for start in range(0, len(message_ids), SQL_VARIABLE_CHUNK):
+            chunk = message_ids[start:start + SQL_VARIABLE_CHUNK]
+            rows = self._conn.execute(
+                f"SELECT data FROM messages WHERE id IN ({', '.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            for row in rows:
+                record = EmailRecord.from_dict(json.loads(row[0]))
+                if record.has_body:
+                    records[record.id] = record
+        return records
+
+    def unlist_all(self):
+        """Take every row out of the listing ahead of a full resync that re-lists what remains"""
+        with self._lock:
+            self._conn.execute("UPDATE messages SET listed = 0")
+            self._conn.commit()
+
+    def delete_unlisted(self):
+        """Remove rows that are not in the listing; returns their ids"""
+        with self._lock:
+            message_ids = [row[0] for row in self._conn.execute("SELECT id FROM messages WHERE listed = 0")]
+            self._conn.execute("DELETE FROM messages WHERE listed = 0")
+            self._conn.commit()
+        return message_ids
+
+    def delete_messages(self, message_ids):
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM messages WHERE id = ?",
+                [(message_id,) for message_id in message_ids]
+            )
+            self._conn.commit()
+
+    def get_message(self, message_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM messages WHERE id = ?", (message_id,)
+            ).fetchone()
+        return EmailRecord.from_dict(json.loads(row[0])) if row else None
+
+    def list_messages(self, limit=10, offset=0):
+        """Newest messages first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM messages WHERE listed = 1 "
+                "ORDER BY internal_date DESC LIMIT ? OFFSET ?",
+                (limit, offset)
+            ).fetchall()
+        return [EmailRecord.from_dict(json.loads(row[0])) for row in rows]
+
+    def oldest_listed_date(self):
+        """internalDate of the oldest listed message, or None if nothing is listed"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(internal_date) FROM messages WHERE listed = 1"
+            ).fetchone()
+        return row[0]
+
+    def get_state(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM sync_state WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_state(self, key, value):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)",
+                (key, None if value is None else str(value))
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM messages")
+            self._conn.execute("DELETE FROM sync_state")
+            self._conn.commit()
@@ -0,0 +1,73 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from config import Config
+
+
+class Prefetcher:
+    """Warms a user's message store and drafts cache in the background after Gmail login"""
+
+    def __init__(self, max_workers=Config.PREFETCH_WORKERS,
+                 yield_seconds=Config.PREFETCH_YIELD_SECONDS, clock=time.monotonic):
+        # Bounds how many users are prefetched at once
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='gmail-prefetch')
+        self.yield_seconds = yield_seconds
+        self._clock = clock
+        # sub -> (cancel event, future) for the user's running prefetch
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def schedule(self, sub, service):
+        """Start warming service for sub, cancelling any prefetch already queued for them"""
+        cancelled = threading.Event()
+        with self._lock:
+            previous = self._jobs.get(sub)
+            if previous is not None:
+                previous[0].set()
+            future = self._executor.submit(self._run, sub, service, cancelled)
+            self._jobs[sub] = (cancelled, future)
+        return future
+
+    def cancel(self, sub, timeout=Config.PREFETCH_CANCEL_TIMEOUT):
+        """Stop the user's prefetch and wait for it so nothing is written after logout"""
+        with self._lock:
+            job = self._jobs.pop(sub, None)
+        if job is None:
+            return
+        cancelled, future = job
+        cancelled.set()
+        try:
+            future.result(timeout=timeout)
+        except TimeoutError:
+            print(f'Prefetch did not stop within {timeout}s')
+
+    def _wait_turn(self, service, cancelled):
+        """Block while the user is active; False once the prefetch is cancelled"""
+        while not cancelled.is_set():
+            idle = self._clock() - service.last_foreground
+            if idle >= self.yield_seconds:
+                return True
+            cancelled.wait(self.yield_seconds - idle)
+        return False
+
+    def _run(self, sub, service, cancelled):
+        wait_turn = lambda: self._wait_turn(service, cancelled)
+        try:
+            # Foreground requests use the service's shared httplib2 connection, which
+            # is not thread-safe; every prefetch call goes over this thread's own
+            http = service.thread_http()
+            # Newest metadata first: this is what the dashboard's inbox list reads
+            if wait_turn():
+                service.sync_messages(force=True, http=http)
+            if wait_turn():
+                service.get_draft_messages(Config.PREFETCH_DRAFTS, refresh=True, http=http)
+            # Then bodies, chunk by chunk, so opening a recent message is a store hit
+            if Config.PREFETCH_MESSAGES:
+                service.prefetch_bodies(Config.PREFETCH_MESSAGES, wait_turn, http=http)
+        except Exception as e:
+            print(f'Prefetch failed: {e}')
+        finally:
+            with self._lock:
+                job = self._jobs.get(sub)
+                if job is not None and job[0] is cancelled:
+                    del self._jobs[sub]
@@ -1,31 +1,127 @@
+import os
+import threading
+import time
 from flask import jsonify
-from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import and_, func, or_, select
 from Auth.auth import *
 
-db = SQLAlchemy()
+from database import db, dialect_insert
 from models.User import User
 
+# How long a user row is served from memory before re-reading the database
+USER_CACHE_TTL = int(os.environ.get("USER_CACHE_TTL", 300))
+
+
+class UserCache:
+    """Small TTL cache of user rows keyed by auth0_id"""
+
+    def __init__(self, ttl=USER_CACHE_TTL, clock=time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, auth0_id):
+        with self._lock:
+            entry = self._entries.get(auth0_id)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if self._clock() >= expires_at:
+                del self._entries[auth0_id]
+                return None
+            return user
+
+    def put(self, user):
+        with self._lock:
+            self._entries[user["auth0_id"]] = (self._clock() + self.ttl, user)
+
+    def invalidate(self, auth0_id):
+        with self._lock:
+            self._entries.pop(auth0_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache()
+
+
+def _user_to_dict(row):
+    return {
+        "id": row.id,
+        "auth0_id": row.auth0_id,
+        "email": row.email,
+        "name": row.name
+    }
+
+
+def upsert_user(auth0_id, email, name):
+    """Insert the user or update changed fields in a single statement
+
+    Claims missing from the token (None) never overwrite stored values.
+    """
+    insert = dialect_insert()
+    if insert is None or email is None:
+        # No ON CONFLICT support, or no email to insert (the column is NOT NULL):
+        # select-then-insert, updating only the claims the token carries
+        user = User.query.filter_by(auth0_id=auth0_id).first()
+        if not user:
+            user = User(auth0_id=auth0_id, email=email, name=name)
+            db.session.add(user)
+        else:
+            if email is not None:
+                user.email = email
+            if name is not None:
+                user.name = name
+        db.session.commit()
+        return _user_to_dict(user)
+
+    stmt = insert(User).values(auth0_id=auth0_id, email=email, name=name)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[User.auth0_id],
+        set_={"email": stmt.excluded.email,
+              "name": func.coalesce(stmt.excluded.name, User.name)},
+        # Only write when something actually changed
+        where=or_(User.email != stmt.excluded.email,
+                  and_(stmt.excluded.name.isnot(None),
+                       User.name.is_distinct_from(stmt.excluded.name)))
+    ).returning(User.id, User.auth0_id, User.email, User.name)
+
+    row = db.session.execute(stmt).first()
+    db.session.commit()
+
+    if row is None:
+        # Conflict with no changes: the existing row is already current
+        row = db.session.execute(
+            select(User.id, User.auth0_id, User.email, User.name)
+            .where(User.auth0_id == auth0_id)
+        ).first()
+
+    return _user_to_dict(row)
+
+
 def create_get_user(payload):
     try:
         auth0_id = payload.get('sub')
         email = payload.get('email')
         name = payload.get('name')
 
-        user = User.query.filter_by(auth0_id=auth0_id).first()
+        user = user_cache.get(auth0_id)
 
-        if not user:
-            user = User(auth0_id=auth0_id, email=email, name=name)
-            db.session.add(user)
-            db.session.commit()
+        # A changed email or name in the token invalidates the cached row;
+        # claims the token does not carry are not compared
+        if (user is None
+                or (email is not None and user["email"] != email)
+                or (name is not None and user["name"] != name)):
+            user = upsert_user(auth0_id, email, name)
+            user_cache.put(user)
 
         return jsonify ({
             "message": "User profile retrieved successfully",
-            "user": {
-                "id": user.id,
-                "auth0_id": user.auth0_id,
-                "email": user.email,
-                "name": user.name
-            }
+            "user": user
         })
     except Exception as e:
-        return jsonify(error=str(e)), 500
\ No newline at end of file
+        db.session.rollback()
+        return jsonify(error=str(e)), 500
@@ -0,0 +1,40 @@
+import threading
+import time
+
+# Float refills can leave a deficit smaller than the clock can advance; treat it as paid
+EPSILON = 1e-9
+
+
+class TokenBucket:
+    """Thread-safe token bucket; clock and sleep are injectable for tests"""
+
+    def __init__(self, rate, capacity, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = capacity
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def try_acquire(self, tokens=1):
+        """Take tokens if available; otherwise return the seconds to wait"""
+        with self._lock:
+            self._refill()
+            if self._tokens + EPSILON >= tokens:
+                self._tokens = max(0.0, self._tokens - tokens)
+                return 0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens=1):
+        """Block until tokens are available"""
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0:
+                return
+            self._sleep(wait)
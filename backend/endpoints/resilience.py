@@ -0,0 +1,201 @@
+import random
+import socket
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+# Status codes worth retrying: rate limiting and transient server errors
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+# Callables invoked as hook(upstream_name, event, **data) for every call event
+metrics_hooks = []
+
+
+def add_metrics_hook(hook):
+    metrics_hooks.append(hook)
+
+
+def _emit(upstream, event, **data):
+    for hook in metrics_hooks:
+        try:
+            hook(upstream, event, **data)
+        except Exception as e:
+            print(f"Metrics hook failed: {e}")
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open"""
+
+    def __init__(self, upstream, retry_in):
+        super().__init__(f"{upstream} is unavailable; retry in {retry_in:.0f}s")
+        self.upstream = upstream
+        self.retry_in = retry_in
+
+
+def _status_and_headers(error):
+    """Pull an HTTP status and response headers out of the client libraries' errors"""
+    # googleapiclient.errors.HttpError
+    resp = getattr(error, 'resp', None)
+    if resp is not None and getattr(resp, 'status', None) is not None:
+        return int(resp.status), resp
+    # openai.APIStatusError and requests.HTTPError
+    response = getattr(error, 'response', None)
+    status = getattr(error, 'status_code', None) or getattr(response, 'status_code', None)
+    if status is not None:
+        return int(status), getattr(response, 'headers', None) or {}
+    return None, {}
+
+
+def _parse_retry_after(headers):
+    value = headers.get('retry-after') or headers.get('Retry-After') if headers else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def default_classifier(error):
+    """Return (retryable, retry_after_seconds) for an exception"""
+    status, headers = _status_and_headers(error)
+    if status is not None:
+        return status in RETRYABLE_STATUSES, _parse_retry_after(headers)
+    if isinstance(error, (ConnectionError, TimeoutError, socket.timeout, socket.gaierror)):
+        return True, None
+    return False, None
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures; after reset_timeout lets a single probe through"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0
+        self._probe_in_flight = False
+
+    def allow(self):
+        """Return 0 if a call may proceed, else seconds until the next probe"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return 0
+            elapsed = self._clock() - self._opened_at
+            if self.state == self.OPEN and elapsed >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return 0
+            return max(self.reset_timeout - elapsed, 1)
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        """Returns True if this failure opened the circuit"""
+        with self._lock:
+            self._failures += 1
+            was_open = self.state == self.OPEN
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = self._clock()
+            self._probe_in_flight = False
+            return self.state == self.OPEN and not was_open
+
+    def release_probe(self):
+        """A probe ended without a verdict (e.g. a client error); let another through"""
+        with self._lock:
+            self._probe_in_flight = False
+
+
+class Upstream:
+    """Retry with backoff, a concurrency cap and a circuit breaker for one external API"""
+
+    def __init__(self, name, max_attempts=3, base_delay=0.5, max_delay=10,
+                 max_concurrency=8, failure_threshold=5, reset_timeout=30,
+                 classifier=default_classifier, is_quota_error=None,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.name = name
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.classifier = classifier
+        # Per-caller quota errors are retried but say nothing about the upstream's health,
+        # so they never count towards opening the shared circuit
+        self.is_quota_error = is_quota_error or (lambda error: False)
+        self._sleep = sleep
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout, clock)
+
+    def backoff(self, attempt, retry_after=None):
+        """Full-jitter exponential backoff, never shorter than the server's Retry-After"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+    def pause(self, attempt, retry_after=None):
+        """Sleep out the backoff before a retry the caller drives itself, e.g. of batch items"""
+        delay = self.backoff(attempt, retry_after)
+        self._sleep(delay)
+        return delay
+
+    def call(self, fn, *args, **kwargs):
+        return self.call_with(self.classifier, fn, *args, **kwargs)
+
+    def call_with(self, classifier, fn, *args, **kwargs):
+        """call() with a per-call classifier, e.g. a stricter one for non-idempotent requests"""
+        for attempt in range(self.max_attempts):
+            retry_in = self.breaker.allow()
+            if retry_in:
+                _emit(self.name, 'rejected', retry_in=retry_in)
+                raise CircuitOpenError(self.name, retry_in)
+
+            started = time.monotonic()
+            try:
+                with self._slots:
+                    result = fn(*args, **kwargs)
+            except Exception as error:
+                retryable, retry_after = classifier(error)
+                elapsed = time.monotonic() - started
+                if not retryable:
+                    # The upstream answered; a bad request says nothing about its health
+                    self.breaker.release_probe()
+                    _emit(self.name, 'error', error=error, elapsed=elapsed)
+                    raise
+
+                if self.is_quota_error(error):
+                    self.breaker.release_probe()
+                    opened = False
+                else:
+                    opened = self.breaker.record_failure()
+                if opened:
+                    _emit(self.name, 'circuit_open')
+                # No point waiting out a backoff just to be rejected by the open circuit
+                if opened or attempt + 1 >= self.max_attempts:
+                    _emit(self.name, 'failure', error=error, elapsed=elapsed, attempts=attempt + 1)
+                    raise
+
+                delay = self.backoff(attempt, retry_after)
+                _emit(self.name, 'retry', error=error, elapsed=elapsed, attempt=attempt + 1, delay=delay)
+                self._sleep(delay)
+                continue
+
+            self.breaker.record_success()
+            _emit(self.name, 'success', elapsed=time.monotonic() - started, attempts=attempt + 1)
+            return result
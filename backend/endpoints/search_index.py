@@ -0,0 +1,131 @@
+import json
+import re
+import sqlite3
+import threading
+from dataclasses import replace
+from backend.endpoints.email_record import EmailRecord
+from backend.endpoints.fast_json import dumps
+
+# A search term: optional operator, then a quoted phrase or a bare word
+TERM_PATTERN = re.compile(r'(?:(\w+):)?("[^"]*"|\S+)')
+
+# Boolean operators, exclusion and grouping change Gmail's meaning; leave them to Gmail
+UNSUPPORTED_SYNTAX = re.compile(r'(?:^|\s)-|[(){}]|\b(?:OR|AND)\b')
+
+# Gmail operators the local index can answer, mapped to FTS columns
+SUPPORTED_OPERATORS = {
+    'from': 'sender',
+    'subject': 'subject'
+}
+
+
+class SearchIndex:
+    """SQLite FTS5 index over subject, sender and body of fetched messages"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS indexed_messages (
+                rowid INTEGER PRIMARY KEY,
+                id TEXT UNIQUE NOT NULL,
+                internal_date INTEGER,
+                data TEXT NOT NULL
+            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts
+                USING fts5(subject, sender, body, tokenize='unicode61');
+        """)
+        self._conn.commit()
+
+    def add(self, items):
+        """Index (raw message, EmailRecord) pairs, replacing earlier entries for the same id
+
+        A metadata-only record keeps the body already indexed for its id, so
+        listing a page again does not drop body text from the index.
+        """
+        with self._lock:
+            for raw, record in items:
+                if not record.has_body:
+                    row = self._conn.execute(
+                        "SELECT data FROM indexed_messages WHERE id = ?", (record.id,)
+                    ).fetchone()
+                    indexed = EmailRecord.from_dict(json.loads(row[0])) if row else None
+                    if indexed is not None and indexed.has_body:
+                        record = replace(record, body=indexed.body, attachments=indexed.attachments)
+                rowid = self._conn.execute(
+                    "INSERT INTO indexed_messages (id, internal_date, data) VALUES (?, ?, ?) "
+                    "ON CONFLICT (id) DO UPDATE SET internal_date = excluded.internal_date, "
+                    "data = excluded.data "
+                    "RETURNING rowid",
+                    (record.id, int(raw.get('internalDate', 0)), dumps(record))
+                ).fetchone()[0]
+
+                # Metadata-only records fall back to the snippet for body text
+                self._conn.execute("DELETE FROM messages_fts WHERE rowid = ?", (rowid,))
+                self._conn.execute(
+                    "INSERT INTO messages_fts (rowid, subject, sender, body) VALUES (?, ?, ?, ?)",
+                    (rowid, record.subject, record.sender, record.body or record.snippet)
+                )
+            self._conn.commit()
+
+    def remove(self, message_ids):
+        with self._lock:
+            for message_id in message_ids:
+                row = self._conn.execute(
+                    "SELECT rowid FROM indexed_messages WHERE id = ?", (message_id,)
+                ).fetchone()
+                if row is None:
+                    continue
+                self._conn.execute("DELETE FROM messages_fts WHERE rowid = ?", (row[0],))
+                self._conn.execute("DELETE FROM indexed_messages WHERE rowid = ?", (row[0],))
+            self._conn.commit()
+
+    def search(self, query, limit=10):
+        """Newest matching records, or None if the query needs Gmail to answer it"""
+        match = self._to_fts_query(query)
+        if match is None:
+            return None
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT m.data FROM messages_fts f "
+                "JOIN indexed_messages m ON m.rowid = f.rowid "
+                "WHERE messages_fts MATCH ? "
+                "ORDER BY m.internal_date DESC LIMIT ?",
+                (match, limit)
+            ).fetchall()
+        return [EmailRecord.from_dict(json.loads(row[0])) for row in rows]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM messages_fts")
+            self._conn.execute("DELETE FROM indexed_messages")
+            self._conn.commit()
+
+    @staticmethod
+    def _to_fts_query(query):
+        """Translate a Gmail-style query (words, "phrases", prefix*, from:) to FTS5 syntax"""
+        if UNSUPPORTED_SYNTAX.search(query):
+            return None
+        
+        terms = []
+        for operator, value in TERM_PATTERN.findall(query):
+            column = None
+            if operator:
+                column = SUPPORTED_OPERATORS.get(operator.lower())
+                if column is None:
+                    # is:, label:, after: etc. only Gmail can evaluate
+                    return None
+
+            prefix = value.endswith('*') and not value.startswith('"')
+            text = value.strip('"').rstrip('*')
+            if not text:
+                continue
+
+            term = '"' + text.replace('"', '""') + '"' + ('*' if prefix else '')
+            terms.append(f'{column} : {term}' if column else term)
+
+        return ' '.join(terms) if terms else None
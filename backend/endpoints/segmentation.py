@@ -0,0 +1,96 @@
+from dataclasses import dataclass
+from backend.endpoints.audio_ingest import TARGET_RATE, TARGET_SAMPLE_WIDTH
+
+# Analysis frame length for the energy VAD
+FRAME_MS = 30
+# Frames quieter than this (about -50 dBFS) are never speech, however quiet the recording
+MIN_SPEECH_RMS = 100.0
+# Speech must be this many times louder than the recording's noise floor...
+NOISE_FLOOR_RATIO = 3.0
+# ...but never more than this fraction of its loud frames, for recordings with few pauses
+LOUD_FRAME_RATIO = 0.2
+
+
+@dataclass(slots=True)
+class Segment:
+    """A voiced stretch of 16 kHz mono 16-bit PCM and where it sits in the recording"""
+    index: int
+    start: float
+    end: float
+    pcm: bytes
+
+
+def _frame_energy(pcm, frame_len):
+    import numpy as np
+
+    samples = np.frombuffer(pcm, dtype='<i2')
+    n_frames = len(samples) // frame_len
+    frames = samples[:n_frames * frame_len].reshape(n_frames, frame_len).astype(np.float32)
+    return np.sqrt((frames ** 2).mean(axis=1))
+
+
+def _voiced_spans(voiced, min_silence):
+    """(start, end) frame ranges of speech separated by at least min_silence quiet frames"""
+    spans = []
+    start = None
+    silence = 0
+    for i, is_voiced in enumerate(voiced):
+        if is_voiced:
+            if start is None:
+                start = i
+            silence = 0
+        elif start is not None:
+            silence += 1
+            if silence >= min_silence:
+                spans.append((start, i - silence + 1))
+                start = None
+                silence = 0
+    if start is not None:
+        spans.append((start, len(voiced) - silence))
+    return spans
+
+
+def _split_long(spans, energy, max_frames):
+    """Cut spans longer than max_frames at the quietest frame in the back half of each window"""
+    import numpy as np
+
+    result = []
+    for start, end in spans:
+        while end - start > max_frames:
+            window_start = start + max_frames // 2
+            cut = window_start + int(np.argmin(energy[window_start:start + max_frames]))
+            result.append((start, cut))
+            start = cut
+        result.append((start, end))
+    return result
+
+
+def split_on_silence(pcm, min_silence_ms=400, max_segment_seconds=30, padding_ms=150):
+    """Split PCM into voiced Segments on pauses; silent stretches are dropped"""
+    frame_len = TARGET_RATE * FRAME_MS // 1000
+    frame_bytes = frame_len * TARGET_SAMPLE_WIDTH
+    energy = _frame_energy(pcm, frame_len)
+    if len(energy) == 0:
+        return []
+
+    import numpy as np
+
+    # Adapt to the recording: speech sits well above its quietest frames
+    floor, loud = np.percentile(energy, [5, 90])
+    threshold = max(min(floor * NOISE_FLOOR_RATIO, loud * LOUD_FRAME_RATIO), MIN_SPEECH_RMS)
+    spans = _voiced_spans(energy > threshold, max(1, min_silence_ms // FRAME_MS))
+
+    # Pad at real pauses so word onsets and tails are not clipped; forced cuts get no overlap
+    pad = padding_ms // FRAME_MS
+    spans = [(max(0, start - pad), min(len(energy), end + pad)) for start, end in spans]
+    spans = _split_long(spans, energy, max(1, int(max_segment_seconds * 1000) // FRAME_MS))
+
+    segments = []
+    for index, (start, end) in enumerate(spans):
+        segments.append(Segment(
+            index=index,
+            start=start * FRAME_MS / 1000,
+            end=end * FRAME_MS / 1000,
+            pcm=pcm[start * frame_bytes:end * frame_bytes]
+        ))
+    return segments
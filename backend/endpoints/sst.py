@@ -1,13 +1,25 @@
-from flask import Flask, request, jsonify, redirect, session
-from speech_service import SpeechToTextService
+from flask import Flask, request, jsonify, redirect, session, Response, stream_with_context
+from backend.endpoints.stt_service import SpeechToTextService
+from backend.endpoints.transcription_jobs import QueueFull, TranscriptionJobs
+from backend.endpoints.fast_json import dumps
 import os
 from werkzeug.utils import secure_filename
+import multiprocessing
+from config import Config
+
+app = Flask(__name__)
 
 # Initialize speech service
 speech_service = SpeechToTextService()
 
-# Load Whisper model at startup (optional)
-# speech_service.load_whisper_model("base")  # Uncomment to use Whisper
+# Opt-in for pre-forking servers (gunicorn --preload): load Whisper at import so workers
+# share the weights. Otherwise the model loads in the background on first use. Spawned
+# transcription pool processes re-import this module and must not load it again
+if Config.WHISPER_PRELOAD and multiprocessing.parent_process() is None:
+    speech_service.whisper_models.preload()
+
+# Background transcription so slow decodes do not hold a web worker
+transcription_jobs = TranscriptionJobs(speech_service)
 
 @app.route('/api/transcribe', methods=['POST'])
 def transcribe_audio():
@@ -33,7 +45,9 @@ def transcribe_audio():
                 'transcription': result['transcription'],
                 'method': result['method'],
                 'confidence': result.get('confidence', 1.0),
-                'language': result.get('language', 'unknown')
+                'language': result.get('language', 'unknown'),
+                'audio': result.get('audio'),
+                'segments': result.get('segments')
             })
         else:
             return jsonify({
@@ -59,13 +73,87 @@ def get_available_methods():
     # Google is available if we have internet
     available['google'] = True
     
-    # Whisper is available if model is loaded
-    available['whisper'] = speech_service.whisper_model is not None
+    # Whisper is available once this process has the model loaded
+    available['whisper'] = speech_service.whisper_models.ready
     
     # Sphinx is usually available
     available['sphinx'] = True
     
     return jsonify({
         'methods': methods,
-        'available': available
-    })
\ No newline at end of file
+        'available': available,
+        'whisper': speech_service.whisper_models.status()
+    })
+
+@app.route('/api/transcribe/jobs', methods=['POST'])
+def create_transcription_job():
+    """Queue an uploaded audio file for transcription and return its job id"""
+    if 'audio' not in request.files:
+        return jsonify({'error': 'No audio file provided'}), 400
+    
+    audio_file = request.files['audio']
+    
+    if audio_file.filename == '':
+        return jsonify({'error': 'No file selected'}), 400
+    
+    method = request.args.get('method', 'google')
+    
+    # Read the upload now; the request stream is gone once this handler returns
+    try:
+        job = transcription_jobs.submit(audio_file.read(), audio_file.mimetype, method=method)
+    except QueueFull as e:
+        response = jsonify({'error': str(e)})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    
+    return jsonify({
+        'job': job.to_dict(),
+        'status_url': f'/api/transcribe/jobs/{job.id}',
+        'events_url': f'/api/transcribe/jobs/{job.id}/events'
+    }), 202
+
+@app.route('/api/transcribe/jobs/<job_id>', methods=['GET'])
+def get_transcription_job(job_id):
+    """Poll a transcription job's status, progress and result"""
+    job = transcription_jobs.get(job_id)
+    
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify({'job': job.to_dict()})
+
+@app.route('/api/transcribe/jobs/<job_id>/events', methods=['GET'])
+def stream_transcription_job(job_id):
+    """Server-sent events with the job's state on every change, ending once it finishes"""
+    job = transcription_jobs.get(job_id)
+    
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    def generate():
+        current = job
+        while True:
+            event = 'result' if current.finished else 'progress'
+            yield b'event: ' + event.encode() + b'\ndata: ' + dumps(current.to_dict()) + b'\n\n'
+            if current.finished:
+                return
+            
+            version = current.version
+            while True:
+                current = transcription_jobs.store.wait_for_change(
+                    job_id, version, timeout=Config.TRANSCRIBE_SSE_HEARTBEAT
+                )
+                if current is None:
+                    # Expired or dropped while we waited
+                    yield b'event: error\ndata: {"error": "Job not found"}\n\n'
+                    return
+                if current.version > version:
+                    break
+                # Comment line keeps proxies from closing an idle stream
+                yield b': keep-alive\n\n'
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
@@ -1,23 +1,68 @@
+import multiprocessing
+import threading
 import speech_recognition as sr
-import whisper
-import tempfile
-import os
-from pydub import AudioSegment
-import io
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from backend.endpoints.audio_ingest import DecodedAudio, decode_audio
+from backend.endpoints.resilience import Upstream, default_classifier
+from backend.endpoints.segmentation import split_on_silence
+from backend.endpoints.whisper_model import whisper_models
+from config import Config
+
+def _speech_classifier(error):
+    """RequestError means the Google API call failed; UnknownValueError is a real answer"""
+    if isinstance(error, sr.RequestError):
+        return True, None
+    return default_classifier(error)
+
+
+google_speech_upstream = Upstream(
+    'google_speech',
+    max_attempts=Config.RETRY_MAX_ATTEMPTS,
+    max_concurrency=Config.GOOGLE_SPEECH_MAX_CONCURRENCY,
+    failure_threshold=Config.CIRCUIT_FAILURE_THRESHOLD,
+    reset_timeout=Config.CIRCUIT_RESET_TIMEOUT,
+    classifier=_speech_classifier
+)
+
+# CPU-bound segment work (Sphinx) runs here, created on first long recording
+_process_pool = None
+_process_pool_lock = threading.Lock()
+# The service each pool process uses for its segments
+_segment_service = None
+
+
+def _get_process_pool():
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            # spawn, not fork: a forked copy of a threaded web worker can inherit held locks
+            _process_pool = ProcessPoolExecutor(
+                max_workers=Config.STT_MAX_WORKERS,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _process_pool
+
+
+def _transcribe_segment(method, pcm):
+    """Process pool entry point: transcribe one segment's PCM"""
+    global _segment_service
+    if _segment_service is None:
+        _segment_service = SpeechToTextService()
+    return _segment_service._transcribe_one(method, DecodedAudio(pcm))
 
 class SpeechToTextService:
-    def __init__(self):
+    def __init__(self, whisper_models=whisper_models):
         self.recognizer = sr.Recognizer()
-        self.whisper_model = None
+        # Process-wide model manager so forked workers share one copy of the weights
+        self.whisper_models = whisper_models
+    
+    @property
+    def whisper_model(self):
+        return self.whisper_models.model
         
-    def load_whisper_model(self, model_size="base"):
+    def load_whisper_model(self, model_size=None):
         """Load Whisper model (run once at startup)"""
-        try:
-            self.whisper_model = whisper.load_model(model_size)
-            return True
-        except Exception as e:
-            print(f"Failed to load Whisper model: {e}")
-            return False
+        return self.whisper_models.load(model_size)
     
     def transcribe_with_google(self, audio_file):
         """Transcribe using Google Speech Recognition (free, requires internet)"""
@@ -29,7 +74,7 @@ class SpeechToTextService:
                 audio = self.recognizer.record(source)
             
             # Recognize speech using Google
-            text = self.recognizer.recognize_google(audio)
+            text = google_speech_upstream.call(self.recognizer.recognize_google, audio)
             return {
                 'success': True,
                 'transcription': text,
@@ -58,35 +103,34 @@ class SpeechToTextService:
     
     def transcribe_with_whisper(self, audio_file):
         """Transcribe using OpenAI Whisper (offline, more accurate)"""
-        if not self.whisper_model:
-            if not self.load_whisper_model():
-                return {
-                    'success': False,
-                    'error': 'Whisper model not loaded',
-                    'method': 'whisper'
-                }
+        if not self.whisper_models.ready:
+            # Never block a request on a multi-second model load
+            if self.whisper_models.state == self.whisper_models.UNLOADED:
+                self.whisper_models.load_in_background()
+            return {
+                'success': False,
+                'error': f'Whisper model not ready ({self.whisper_models.state})',
+                'method': 'whisper'
+            }
         
         try:
-            # Save uploaded file temporarily
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as tmp_file:
-                # Convert to format Whisper can handle
-                audio_segment = self._convert_to_wav(audio_file)
-                audio_segment.export(tmp_file.name, format='wav')
-                
-                # Transcribe with Whisper
-                result = self.whisper_model.transcribe(tmp_file.name)
-                
-                # Clean up
-                os.unlink(tmp_file.name)
-                
-                return {
-                    'success': True,
-                    'transcription': result['text'].strip(),
-                    'confidence': 1.0,  # Whisper doesn't provide confidence scores
-                    'language': result.get('language', 'unknown'),
-                    'method': 'whisper'
-                }
-                
+            # Decode once into the array Whisper expects; no temp file or second ffmpeg run
+            samples = self._decode(audio_file).to_float32()
+            
+            # fp16 is only supported on GPU; say so up front instead of warning per request
+            # Inference is serialized inside the manager; the shared model is not reentrant
+            result = self.whisper_models.transcribe(samples, fp16=False)
+            if result is None:
+                raise RuntimeError('Whisper model was unloaded')
+            
+            return {
+                'success': True,
+                'transcription': result['text'].strip(),
+                'confidence': 1.0,  # Whisper doesn't provide confidence scores
+                'language': result.get('language', 'unknown'),
+                'method': 'whisper'
+            }
+            
         except Exception as e:
             return {
                 'success': False,
@@ -130,72 +174,143 @@ class SpeechToTextService:
                 'method': 'sphinx'
             }
     
+    @staticmethod
+    def _decode(audio):
+        """Decode an upload once; already-decoded audio is passed through"""
+        if isinstance(audio, DecodedAudio):
+            return audio
+        return decode_audio(audio)
+    
     def _prepare_audio_for_sr(self, audio_file):
         """Convert audio file to format suitable for speech_recognition library"""
         try:
-            # Convert to WAV format
-            audio_segment = self._convert_to_wav(audio_file)
-            
-            # Export to BytesIO
-            wav_io = io.BytesIO()
-            audio_segment.export(wav_io, format='wav')
-            wav_io.seek(0)
-            
-            return wav_io
-            
+            return self._decode(audio_file).wav_io()
         except Exception as e:
             raise Exception(f"Audio preparation failed: {e}")
     
-    def _convert_to_wav(self, audio_file):
-        """Convert any audio format to WAV using pydub"""
+    def transcribe(self, audio_file, method='google', progress=None):
+        """Main transcription method that tries multiple approaches; see transcribe_segmented for progress"""
+        # Every method (and every fallback) shares this single decode
         try:
-            # Read the file content
-            audio_file.seek(0)
-            file_content = audio_file.read()
-            
-            # Detect format based on file content
-            audio_segment = AudioSegment.from_file(
-                io.BytesIO(file_content),
-                format="webm"  # Default to webm since that's what MediaRecorder produces
-            )
-            
-            # Convert to mono, 16kHz (good for speech recognition)
-            audio_segment = audio_segment.set_channels(1).set_frame_rate(16000)
-            
-            return audio_segment
-            
+            audio = self._decode(audio_file)
         except Exception as e:
-            # Try alternative formats
-            formats_to_try = ['wav', 'mp3', 'ogg', 'm4a']
-            
-            for fmt in formats_to_try:
-                try:
-                    audio_file.seek(0)
-                    file_content = audio_file.read()
-                    audio_segment = AudioSegment.from_file(
-                        io.BytesIO(file_content),
-                        format=fmt
-                    )
-                    return audio_segment.set_channels(1).set_frame_rate(16000)
-                except:
-                    continue
-            
-            raise Exception(f"Could not convert audio file: {e}")
+            return {
+                'success': False,
+                'error': f'Could not decode audio: {e}',
+                'method': method
+            }
+        
+        result = self._transcribe_decoded(audio, method, progress)
+        result['audio'] = audio.timing()
+        return result
     
-    def transcribe(self, audio_file, method='google'):
-        """Main transcription method that tries multiple approaches"""
+    def _transcribe_one(self, method, audio):
         methods = {
             'google': self.transcribe_with_google,
             'whisper': self.transcribe_with_whisper,
             'sphinx': self.transcribe_with_sphinx
         }
+        return methods[method](audio)
+    
+    def _run_method(self, method, audio, progress=None):
+        """Long recordings are split on silence; short ones go to the backend whole"""
+        if audio.duration_seconds > Config.STT_SEGMENT_MIN_SECONDS:
+            return self.transcribe_segmented(audio, method, progress)
+        result = self._transcribe_one(method, audio)
+        if progress:
+            progress(1, 1)
+        return result
+    
+    def transcribe_segmented(self, audio, method, progress=None):
+        """Transcribe voiced segments in parallel and reassemble them in order with timestamps
+
+        progress(done, total) is called as each segment's result comes back in order.
+        """
+        segments = split_on_silence(
+            audio.pcm,
+            min_silence_ms=Config.STT_MIN_SILENCE_MS,
+            max_segment_seconds=Config.STT_MAX_SEGMENT_SECONDS
+        )
+        if not segments:
+            return {
+                'success': False,
+                'error': 'No speech detected',
+                'method': method
+            }
         
-        if method in methods:
-            return methods[method](audio_file)
+        try:
+            if method == 'sphinx':
+                # Pure CPU work: one process per core
+                results = self._collect(_get_process_pool().map(
+                    _transcribe_segment,
+                    [method] * len(segments),
+                    [segment.pcm for segment in segments]
+                ), len(segments), progress)
+            elif method == 'google':
+                # Network-bound, and the circuit breaker must stay shared, so threads suffice
+                with ThreadPoolExecutor(max_workers=Config.GOOGLE_SPEECH_MAX_CONCURRENCY) as executor:
+                    results = self._collect(executor.map(
+                        lambda segment: self._transcribe_one(method, DecodedAudio(segment.pcm)),
+                        segments
+                    ), len(segments), progress)
+            else:
+                # Whisper already spreads one segment over the process's torch threads
+                results = self._collect(
+                    (self._transcribe_one(method, DecodedAudio(segment.pcm)) for segment in segments),
+                    len(segments), progress
+                )
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Segmented transcription failed: {e}',
+                'method': method
+            }
+        
+        timeline = []
+        for segment, result in zip(segments, results):
+            entry = {
+                'start': segment.start,
+                'end': segment.end,
+                'text': result.get('transcription', '') if result['success'] else ''
+            }
+            if not result['success']:
+                entry['error'] = result['error']
+            timeline.append(entry)
+        
+        succeeded = [result for result in results if result['success']]
+        if not succeeded:
+            return {
+                'success': False,
+                'error': results[0]['error'],
+                'method': method,
+                'segments': timeline
+            }
+        
+        return {
+            'success': True,
+            'transcription': ' '.join(entry['text'] for entry in timeline if entry['text']),
+            'confidence': 1.0,
+            'language': succeeded[0].get('language', 'unknown'),
+            'method': method,
+            'segments': timeline
+        }
+    
+    @staticmethod
+    def _collect(results, total, progress=None):
+        collected = []
+        for result in results:
+            collected.append(result)
+            if progress:
+                progress(len(collected), total)
+        return collected
+    
+    def _transcribe_decoded(self, audio, method, progress=None):
+        if method in ('google', 'whisper', 'sphinx'):
+            return self._run_method(method, audio, progress)
         else:
             # Try all methods in order of preference
             for method_name in ['whisper', 'google', 'sphinx']:
-                result = methods[method_name](audio_file)
+                result = self._run_method(method_name, audio, progress)
                 if result['success']:
                     return result
             
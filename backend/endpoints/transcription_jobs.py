@@ -0,0 +1,211 @@
+import io
+import os
+import queue
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Optional
+from backend.endpoints.audio_ingest import decode_audio
+from config import Config
+
+
+class QueueFull(Exception):
+    """Raised by a backend that cannot take more work right now"""
+
+
+@dataclass(slots=True)
+class TranscriptionJob:
+    """State of one queued transcription, as reported by the job endpoints"""
+    id: str
+    method: str
+    status: str = 'queued'
+    stage: Optional[str] = None
+    progress: float = 0.0
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    # Bumped on every change so event streams know when to send
+    version: int = 0
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'method': self.method,
+            'status': self.status,
+            'stage': self.stage,
+            'progress': round(self.progress, 3),
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
+        }
+
+
+class JobStore:
+    """In-memory job table; waiters are woken on every update"""
+
+    def __init__(self, ttl=Config.TRANSCRIBE_JOB_TTL):
+        self.ttl = ttl
+        self._jobs = {}
+        self._changed = threading.Condition()
+
+    def add(self, job):
+        with self._changed:
+            self._expire()
+            self._jobs[job.id] = job
+
+    def get(self, job_id):
+        with self._changed:
+            job = self._jobs.get(job_id)
+            # Snapshot, so callers never see a half-applied update
+            return None if job is None else TranscriptionJob(**{
+                name: getattr(job, name) for name in TranscriptionJob.__slots__
+            })
+
+    def update(self, job_id, **fields):
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            for name, value in fields.items():
+                setattr(job, name, value)
+            job.updated_at = time.time()
+            job.version += 1
+            self._changed.notify_all()
+
+    def remove(self, job_id):
+        with self._changed:
+            if self._jobs.pop(job_id, None) is not None:
+                # Event streams waiting on this job should end now, not at their next heartbeat
+                self._changed.notify_all()
+
+    def wait_for_change(self, job_id, version, timeout):
+        """Snapshot of the job once its version passes version, or after timeout"""
+        with self._changed:
+            self._changed.wait_for(
+                lambda: job_id not in self._jobs or self._jobs[job_id].version > version,
+                timeout=timeout
+            )
+        return self.get(job_id)
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished and job.updated_at < cutoff]:
+            del self._jobs[job_id]
+
+
+class ThreadQueueBackend:
+    """Default backend: a bounded in-process queue drained by a fixed set of worker threads"""
+
+    def __init__(self, workers=Config.TRANSCRIBE_JOB_WORKERS, max_queue=Config.TRANSCRIBE_JOB_QUEUE_SIZE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._queue = None
+        self._started_pid = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, task):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(task)
+        except queue.Full:
+            raise QueueFull('Transcription queue is full') from None
+
+    def pending(self):
+        return self._queue.qsize() if self._started_pid == os.getpid() else 0
+
+    def _ensure_started(self):
+        """Start the queue and threads on first use in each process
+
+        Under gunicorn --preload this module is imported in the master, and threads
+        do not survive fork; workers started there would leave every job queued.
+        """
+        if self._started_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._started_pid == os.getpid():
+                return
+            # A fresh queue too: one copied mid-operation may carry a held lock
+            self._queue = queue.Queue(maxsize=self.max_queue)
+            for i in range(self.workers):
+                threading.Thread(
+                    target=self._work, args=(self._queue,), name=f'transcribe-job-{i}', daemon=True
+                ).start()
+            self._started_pid = os.getpid()
+
+    @staticmethod
+    def _work(tasks):
+        while True:
+            task = tasks.get()
+            try:
+                task()
+            except Exception as e:
+                print(f"Transcription job crashed: {e}")
+            finally:
+                tasks.task_done()
+
+
+class InlineBackend:
+    """Runs each job as it is submitted; a deterministic stand-in for tests and debugging"""
+
+    def submit(self, task):
+        task()
+
+    def pending(self):
+        return 0
+
+
+# Backends selectable with TRANSCRIBE_JOB_BACKEND
+JOB_BACKENDS = {
+    'thread': ThreadQueueBackend,
+    'inline': InlineBackend
+}
+
+
+class TranscriptionJobs:
+    """Accepts uploads, runs SpeechToTextService.transcribe on a backend and tracks progress"""
+
+    def __init__(self, speech_service, backend=None, store=None):
+        self.speech_service = speech_service
+        self.backend = backend or JOB_BACKENDS[Config.TRANSCRIBE_JOB_BACKEND]()
+        self.store = store or JobStore()
+
+    def submit(self, data, mimetype=None, method='google'):
+        """Queue an upload's bytes; raises QueueFull when the backend is saturated"""
+        job = TranscriptionJob(id=uuid.uuid4().hex, method=method)
+        self.store.add(job)
+        try:
+            self.backend.submit(lambda: self._run(job.id, data, mimetype, method))
+        except QueueFull:
+            self.store.remove(job.id)
+            raise
+        return self.store.get(job.id)
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def _run(self, job_id, data, mimetype, method):
+        self.store.update(job_id, status='running', stage='decoding')
+        try:
+            audio = decode_audio(io.BytesIO(data), mimetype)
+            self.store.update(job_id, stage='transcribing')
+            result = self.speech_service.transcribe(
+                audio,
+                method=method,
+                progress=lambda done, total: self.store.update(job_id, progress=done / total)
+            )
+        except Exception as e:
+            self.store.update(job_id, status='failed', stage=None, error=f'Transcription failed: {e}')
+            return
+
+        if result['success']:
+            self.store.update(job_id, status='done', stage=None, progress=1.0, result=result)
+        else:
+            self.store.update(job_id, status='failed', stage=None, result=result, error=result['error'])
@@ -1,13 +1,41 @@
-import openai
 import io
 import base64
 from typing import Dict, Any, Optional
 import os
+from backend.endpoints.resilience import Upstream, default_classifier
+from config import Config
+
+
+def _openai_classifier(error):
+    """Connection errors carry no status code; match them by name so openai stays a lazy import"""
+    if type(error).__name__ in ('APIConnectionError', 'APITimeoutError'):
+        return True, None
+    return default_classifier(error)
+
+
+openai_upstream = Upstream(
+    'openai',
+    max_attempts=Config.RETRY_MAX_ATTEMPTS,
+    max_concurrency=Config.OPENAI_MAX_CONCURRENCY,
+    failure_threshold=Config.CIRCUIT_FAILURE_THRESHOLD,
+    reset_timeout=Config.CIRCUIT_RESET_TIMEOUT,
+    classifier=_openai_classifier
+)
 
 class OpenAITranslationService:
     def __init__(self, api_key: str):
         """Initialize with OpenAI API key"""
-        self.client = openai.OpenAI(api_key=api_key)
+        self.api_key = api_key
+        self._client = None
+
+    @property
+    def client(self):
+        """OpenAI client, created on first use"""
+        if self._client is None:
+            import openai
+            # Retries are handled by openai_upstream
+            self._client = openai.OpenAI(api_key=self.api_key, max_retries=0)
+        return self._client
     
     def translate_text(self, text: str, source_lang: str = 'auto', target_lang: str = 'English') -> Dict[str, Any]:
         """Translate text using OpenAI GPT"""
@@ -21,7 +49,8 @@ class OpenAITranslationService:
                 source_language = self._get_language_name(source_lang)
                 prompt = f"Translate the following {source_language} text to {target_language}:\n\n{text}"
             
-            response = self.client.chat.completions.create(
+            response = openai_upstream.call(
+                self.client.chat.completions.create,
                 model="gpt-3.5-turbo",  # or "gpt-4" for better quality
                 messages=[
                     {"role": "system", "content": "You are a professional translator. Only return the translated text, nothing else."},
@@ -52,7 +81,8 @@ class OpenAITranslationService:
         try:
             prompt = f"What language is this text written in? Respond with only the language name and a confidence percentage (0-100):\n\n{text}"
             
-            response = self.client.chat.completions.create(
+            response = openai_upstream.call(
+                self.client.chat.completions.create,
                 model="gpt-3.5-turbo",
                 messages=[
                     {"role": "system", "content": "You are a language detection expert. Respond in format: 'Language: [language], Confidence: [percentage]%'"},
@@ -88,7 +118,8 @@ class OpenAITranslationService:
     def text_to_speech(self, text: str, voice: str = 'alloy', speed: float = 1.0) -> Dict[str, Any]:
         """Convert text to speech using OpenAI TTS"""
         try:
-            response = self.client.audio.speech.create(
+            response = openai_upstream.call(
+                self.client.audio.speech.create,
                 model="tts-1",  # or "tts-1-hd" for higher quality
                 voice=voice,    # alloy, echo, fable, onyx, nova, shimmer
                 input=text,
@@ -115,10 +146,15 @@ class OpenAITranslationService:
         """Convert speech to text using OpenAI Whisper (bonus feature!)"""
         try:
             with open(audio_file_path, "rb") as audio_file:
-                transcript = self.client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file
-                )
+                def transcribe():
+                    # Rewind so a retried upload sends the whole file again
+                    audio_file.seek(0)
+                    return self.client.audio.transcriptions.create(
+                        model="whisper-1",
+                        file=audio_file
+                    )
+                
+                transcript = openai_upstream.call(transcribe)
             
             return {
                 'success': True,
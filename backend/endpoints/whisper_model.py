@@ -0,0 +1,132 @@
+import gc
+import os
+import threading
+import time
+from config import Config
+
+
+class WhisperModelManager:
+    """Loads one Whisper model per process and reports whether it is ready
+
+    Calling preload() at import time in a pre-forking server (gunicorn --preload)
+    loads the weights once in the master; workers then share those pages
+    copy-on-write instead of each holding its own copy.
+    """
+
+    UNLOADED = 'unloaded'
+    LOADING = 'loading'
+    READY = 'ready'
+    FAILED = 'failed'
+
+    def __init__(self, model_size=Config.WHISPER_MODEL_SIZE, torch_threads=Config.WHISPER_TORCH_THREADS):
+        self.model_size = model_size
+        self.torch_threads = torch_threads
+        self.model = None
+        self.state = self.UNLOADED
+        self.error = None
+        self.load_seconds = None
+        self._lock = threading.Lock()
+        # Whisper's decoder installs per-call KV-cache hooks on the shared modules,
+        # so two concurrent transcribe() calls on one model corrupt each other
+        self._inference_lock = threading.Lock()
+        self._pinned_pid = None
+        # Each forked worker gets its own thread budget instead of inheriting all cores
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_thread_pin)
+
+    @property
+    def ready(self):
+        return self.state == self.READY
+
+    def load(self, model_size=None):
+        """Load the model synchronously; returns True once it is ready"""
+        with self._lock:
+            if model_size and model_size != self.model_size:
+                self.model_size = model_size
+                self.model = None
+                self.state = self.UNLOADED
+            if self.state == self.READY:
+                return True
+
+            self.state = self.LOADING
+            started = time.monotonic()
+            try:
+                # whisper pulls in torch, so only import it when a model is needed
+                import whisper
+                model = whisper.load_model(self.model_size, device='cpu')
+                model.eval()
+            except Exception as e:
+                print(f"Failed to load Whisper model: {e}")
+                self.state = self.FAILED
+                self.error = str(e)
+                return False
+
+            self.model = model
+            self.error = None
+            self.load_seconds = time.monotonic() - started
+            self.state = self.READY
+        return True
+
+    def preload(self):
+        """Load in a pre-fork master and freeze the heap so workers keep sharing it"""
+        if not self.load():
+            return False
+        # Keep the collector from touching (and so un-sharing) the model's objects after
+        # fork. Only worth it before forking: in a live worker it would just pin garbage.
+        if hasattr(gc, 'freeze'):
+            gc.freeze()
+        return True
+
+    def load_in_background(self):
+        """Start loading without blocking the caller; no-op if loading or loaded"""
+        # load() holds the lock for the whole multi-second load; don't queue behind it
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            if self.state in (self.LOADING, self.READY):
+                return
+            self.state = self.LOADING
+        finally:
+            self._lock.release()
+        threading.Thread(target=self.load, name='whisper-load', daemon=True).start()
+
+    def get(self):
+        """The loaded model with this process's torch thread budget applied, or None"""
+        if not self.ready:
+            return None
+        self._pin_threads()
+        return self.model
+
+    def transcribe(self, samples, **options):
+        """Run model.transcribe, one call at a time per process; None if not ready"""
+        model = self.get()
+        if model is None:
+            return None
+        with self._inference_lock:
+            return model.transcribe(samples, **options)
+
+    def _reset_thread_pin(self):
+        self._pinned_pid = None
+
+    def _pin_threads(self):
+        if self._pinned_pid == os.getpid():
+            return
+        self._pinned_pid = os.getpid()
+        try:
+            import torch
+            torch.set_num_threads(self.torch_threads)
+        except Exception as e:
+            print(f"Could not set torch threads: {e}")
+
+    def status(self):
+        return {
+            'state': self.state,
+            'model': self.model_size,
+            'torch_threads': self.torch_threads,
+            'load_seconds': self.load_seconds,
+            'error': self.error
+        }
+
+
+# Shared by every SpeechToTextService in the process
+whisper_models = WhisperModelManager()
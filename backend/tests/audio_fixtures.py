@@ -0,0 +1,47 @@
+"""Synthetic 16 kHz recordings for the speech tests and benchmarks
+
+Tones stand in for speech and digital silence (plus optional hiss) for pauses,
+so segmentation and decode behaviour can be checked without real recordings.
+"""
+import io
+import wave
+import numpy as np
+
+RATE = 16000
+
+
+def tone(seconds, frequency=220.0, amplitude=0.3, rate=RATE):
+    """int16 samples of a sine tone"""
+    t = np.arange(int(seconds * rate)) / rate
+    return (np.sin(2 * np.pi * frequency * t) * amplitude * 32767).astype('<i2')
+
+
+def silence(seconds, noise=0.0, rate=RATE, seed=0):
+    """int16 samples of silence, with low-level hiss if noise (0-1) is set"""
+    count = int(seconds * rate)
+    if not noise:
+        return np.zeros(count, dtype='<i2')
+    rng = np.random.default_rng(seed)
+    return (rng.standard_normal(count) * noise * 32767).astype('<i2')
+
+
+def recording(pattern, noise=0.0):
+    """16-bit PCM bytes from [(seconds, voiced), ...] with a different pitch per voiced stretch"""
+    parts = []
+    for i, (seconds, voiced) in enumerate(pattern):
+        if voiced:
+            parts.append(tone(seconds, frequency=180 + 40 * (i % 5)) + silence(seconds, noise, seed=i))
+        else:
+            parts.append(silence(seconds, noise, seed=i))
+    return np.concatenate(parts).astype('<i2').tobytes()
+
+
+def wav_bytes(pcm, rate=RATE, channels=1, sample_width=2):
+    """PCM wrapped in a WAV header"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(sample_width)
+        wav.setframerate(rate)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
@@ -0,0 +1,34 @@
+import os
+import sys
+import pytest
+
+# Modules import both `config` (backend/) and `backend.endpoints...` (repo root)
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (BACKEND_DIR, os.path.dirname(BACKEND_DIR)):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+class FakeClock:
+    """Manual clock whose sleep() just advances time"""
+
+    def __init__(self, now=0.0):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def fake_gmail():
+    """A running FakeGmail server; skipped when the Google client library is missing"""
+    pytest.importorskip('googleapiclient')
+    from fake_gmail import FakeGmail
+
+    with FakeGmail(messages=120) as fake:
+        yield fake
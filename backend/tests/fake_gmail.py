@@ -0,0 +1,351 @@
+"""A local stand-in for the parts of the Gmail REST API the backend uses
+
+Serves list/get/attachments/profile/history/drafts/send, the multipart batch
+endpoint and resumable media uploads from an in-memory mailbox over real HTTP,
+so googleapiclient talks to it exactly as it talks to Gmail. Every round trip
+can be slowed by a fixed latency, and message ids in fail_ids answer 500.
+Ids in rate_limited_ids answer 429 that many times before succeeding.
+add_message, delete_message and relabel change the mailbox and record history,
+and history_expired makes history.list answer 404 as Gmail does for an old cursor.
+Statuses queued in send_errors answer the next sends: 429 refuses the message,
+anything else delivers it and then reports the error, as a lost reply would.
+"""
+import base64
+import json
+import threading
+import time
+import uuid
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+USER_PATH = '/gmail/v1/users/me/'
+
+
+def b64url(data):
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def make_message(index, attachment_size=2048):
+    """A multipart Gmail message resource with a text body and one attachment"""
+    message_id = f'msg{index:06d}'
+    body = f'Body of message {index}\n'.encode() * 4
+    return {
+        'id': message_id,
+        'threadId': f'thread{index:06d}',
+        'labelIds': ['INBOX'],
+        'snippet': f'Snippet {index}',
+        'historyId': str(1000 + index),
+        # Newest first, like Gmail's list order
+        'internalDate': str(1_700_000_000_000 - index * 60_000),
+        'sizeEstimate': len(body) + attachment_size,
+        'payload': {
+            'partId': '',
+            'mimeType': 'multipart/mixed',
+            'filename': '',
+            'headers': [
+                {'name': 'From', 'value': f'Sender {index} <sender{index}@example.com>'},
+                {'name': 'To', 'value': 'me@example.com'},
+                {'name': 'Subject', 'value': f'Subject {index}'},
+                {'name': 'Date', 'value': 'Tue, 14 Nov 2023 22:13:20 +0000'},
+                {'name': 'Message-ID', 'value': f'<{message_id}@example.com>'},
+            ],
+            'body': {'size': 0},
+            'parts': [
+                {'partId': '0', 'mimeType': 'text/plain', 'filename': '',
+                 'headers': [], 'body': {'size': len(body), 'data': b64url(body)}},
+                {'partId': '1', 'mimeType': 'application/pdf', 'filename': f'report-{index}.pdf',
+                 'headers': [], 'body': {'size': attachment_size, 'attachmentId': f'att-{message_id}'}},
+            ]
+        }
+    }
+
+
+def write_token_file(path, expiry='2099-01-01T00:00:00Z'):
+    """An authorized-user token file that stays valid without a refresh"""
+    with open(path, 'w') as f:
+        json.dump({
+            'token': 'fake-token',
+            'refresh_token': 'fake-refresh-token',
+            'client_id': 'fake-client-id',
+            'client_secret': 'fake-client-secret',
+            'expiry': expiry
+        }, f)
+
+
+class FakeGmail:
+    """In-memory mailbox served over HTTP; use as a context manager"""
+
+    def __init__(self, messages=100, latency=0.0, attachment_size=2048):
+        self.latency = latency
+        self.messages = [make_message(i, attachment_size) for i in range(messages)]
+        self.by_id = {message['id']: message for message in self.messages}
+        self.attachments = {
+            f'att-{message["id"]}': bytes(range(256)) * (attachment_size // 256) + b'x' * (attachment_size % 256)
+            for message in self.messages
+        }
+        self.drafts = [{'id': f'draft{i:04d}', 'message': make_message(100_000 + i)} for i in range(10)]
+        self.history_id = 5000
+        # History records, oldest first; history.list returns those after startHistoryId
+        self.history = []
+        self.history_expired = False
+        self.fail_ids = set()
+        self.rate_limited_ids = {}
+        self.sent = []
+        self.send_errors = []
+        # HTTP round trips and API calls (a batch is one round trip, many calls)
+        self.round_trips = 0
+        self.calls = 0
+        self._uploads = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    def add_message(self, message):
+        """Deliver message (newest first) and record messagesAdded"""
+        self.messages.insert(0, message)
+        self.by_id[message['id']] = message
+        self._record('messagesAdded', message)
+
+    def delete_message(self, message_id, record=True):
+        """Delete for good; record=False leaves no history, as after the cursor expired"""
+        message = self.by_id.pop(message_id)
+        self.messages.remove(message)
+        if record:
+            self._record('messagesDeleted', message)
+
+    def relabel(self, message_id, add=(), remove=()):
+        """Change labels (e.g. move to TRASH and back), recording labelsAdded/labelsRemoved"""
+        message = self.by_id[message_id]
+        message['labelIds'] = [label for label in message['labelIds'] if label not in remove] + list(add)
+        if add:
+            self._record('labelsAdded', message, labelIds=list(add))
+        if remove:
+            self._record('labelsRemoved', message, labelIds=list(remove))
+
+    def _record(self, kind, message, **fields):
+        self.history_id += 1
+        summary = {'id': message['id'], 'threadId': message['threadId'], 'labelIds': list(message['labelIds'])}
+        self.history.append({'id': str(self.history_id), kind: [dict(fields, message=summary)]})
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body leave in one segment, so delayed ACKs add no latency
+            wbufsize = -1
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _handle(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                status, headers, payload = fake.handle(self.command, self.path, self.headers, body)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def discovery_document(self):
+        """The bundled Gmail discovery document pointed at this server"""
+        from googleapiclient import discovery_cache
+
+        document = json.loads(discovery_cache.get_static_doc('gmail', 'v1'))
+        document['rootUrl'] = document['mtlsRootUrl'] = document['baseUrl'] = self.url
+        return document
+
+    def build(self, http=None, request_builder=None):
+        """A googleapiclient Gmail resource talking to this server"""
+        from googleapiclient.discovery import build_from_document
+        from googleapiclient.http import HttpRequest, build_http
+
+        return build_from_document(
+            self.discovery_document(),
+            http=http or build_http(),
+            requestBuilder=request_builder or HttpRequest
+        )
+
+    def connect(self, service):
+        """Point a GmailService at this server, logging it in unless it loaded a token"""
+        from google.oauth2.credentials import Credentials
+        from backend.endpoints.gmail_service import ResilientHttpRequest, ThreadLocalHttp
+
+        service.creds = service.creds or Credentials(token='fake-token')
+        service.service = self.build(http=ThreadLocalHttp(service), request_builder=ResilientHttpRequest)
+        return service
+
+    # Request handling
+
+    def handle(self, method, path, headers, body):
+        with self._lock:
+            self.round_trips += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        if method == 'POST' and path.split('?')[0] == '/batch':
+            return self._batch(headers, body)
+        status, response_headers, payload = self.route(method, path, headers, body)
+        return status, dict(response_headers, **{'Content-Type': 'application/json'}), payload
+
+    def route(self, method, path, headers, body):
+        """(status, headers, JSON bytes) for one API call"""
+        with self._lock:
+            self.calls += 1
+        url = urlsplit(path)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+
+        if url.path.startswith('/upload' + USER_PATH):
+            return self._start_upload(url.path[len('/upload' + USER_PATH):], query, body)
+        if url.path.startswith('/upload-session/'):
+            return self._continue_upload(url.path[len('/upload-session/'):], headers, body)
+        if not url.path.startswith(USER_PATH):
+            return self._error(404, f'Unknown path {url.path}')
+
+        parts = url.path[len(USER_PATH):].split('/')
+        if parts == ['profile']:
+            return self._ok({'emailAddress': 'me@example.com', 'historyId': str(self.history_id)})
+        if parts == ['history']:
+            if self.history_expired:
+                return self._error(404, 'Requested entity was not found.')
+            start = int(query.get('startHistoryId', 0))
+            records = [record for record in self.history if int(record['id']) > start]
+            return self._ok({'history': records, 'historyId': str(self.history_id)})
+        if parts == ['messages'] and method == 'GET':
+            # Like Gmail, the default listing leaves out spam and trash
+            listed = [m for m in self.messages if not {'SPAM', 'TRASH'}.intersection(m['labelIds'])]
+            return self._list(listed, 'messages', query, lambda m: {'id': m['id'], 'threadId': m['threadId']})
+        if parts == ['messages', 'send'] and method == 'POST':
+            return self._send(json.loads(body or b'{}'))
+        if parts[0] == 'messages' and len(parts) == 2:
+            return self._message(parts[1], query)
+        if parts[0] == 'messages' and len(parts) == 4 and parts[2] == 'attachments':
+            data = self.attachments.get(parts[3])
+            if data is None or parts[1] not in self.by_id:
+                return self._error(404, 'Requested entity was not found.')
+            return self._ok({'size': len(data), 'data': b64url(data)})
+        if parts == ['drafts'] and method == 'GET':
+            return self._list(self.drafts, 'drafts', query, lambda d: {'id': d['id']})
+        if parts[0] == 'drafts' and len(parts) == 2:
+            draft = next((d for d in self.drafts if d['id'] == parts[1]), None)
+            return self._ok(draft) if draft else self._error(404, 'Requested entity was not found.')
+        return self._error(404, f'Unknown path {url.path}')
+
+    def _list(self, items, key, query, summarize):
+        offset = int(query.get('pageToken') or 0)
+        limit = int(query.get('maxResults') or 100)
+        page = items[offset:offset + limit]
+        result = {key: [summarize(item) for item in page], 'resultSizeEstimate': len(items)}
+        if offset + limit < len(items):
+            result['nextPageToken'] = str(offset + limit)
+        return self._ok(result)
+
+    def _message(self, message_id, query):
+        if message_id in self.fail_ids:
+            return self._error(500, 'Backend Error')
+        with self._lock:
+            if self.rate_limited_ids.get(message_id):
+                self.rate_limited_ids[message_id] -= 1
+                return self._error(429, 'Too many concurrent requests for user')
+        message = self.by_id.get(message_id)
+        if message is None:
+            return self._error(404, 'Requested entity was not found.')
+        if query.get('format') == 'metadata':
+            message = dict(message, payload={
+                'mimeType': message['payload']['mimeType'],
+                'headers': message['payload']['headers']
+            })
+        return self._ok(message)
+
+    def _send(self, resource, raw_size=None):
+        if raw_size is None:
+            raw_size = len(resource.get('raw', ''))
+        with self._lock:
+            status = self.send_errors.pop(0) if self.send_errors else None
+            if status == 429:
+                return self._error(429, 'Rate Limit Exceeded')
+            sent = {'id': f'sent{len(self.sent):06d}', 'threadId': resource.get('threadId') or f'sent-thread{len(self.sent)}'}
+            self.sent.append(dict(sent, raw_size=raw_size, raw=resource.get('raw')))
+        if status:
+            return self._error(status, 'Backend Error')
+        return self._ok(sent)
+
+    def _start_upload(self, rest, query, body):
+        if rest != 'messages/send' or query.get('uploadType') != 'resumable':
+            return self._error(400, 'Unsupported upload')
+        session = uuid.uuid4().hex
+        with self._lock:
+            self._uploads[session] = {'resource': json.loads(body or b'{}'), 'received': 0}
+        return 200, {'Location': f'{self.url}upload-session/{session}'}, b''
+
+    def _continue_upload(self, session, headers, body):
+        upload = self._uploads.get(session)
+        if upload is None:
+            return self._error(404, 'Unknown upload session')
+        # Content-Range: bytes first-last/total (or */total for a status query)
+        span, _, total = (headers.get('Content-Range') or '').partition(' ')[2].partition('/')
+        if '-' in span and body:
+            # A retried chunk overwrites rather than adds
+            upload['received'] = int(span.split('-')[1]) + 1
+        if total.isdigit() and upload['received'] >= int(total):
+            status, response_headers, payload = self._send(upload['resource'], raw_size=upload['received'])
+            if status == 200:
+                del self._uploads[session]
+            return status, response_headers, payload
+        return 308, {'Range': f'bytes=0-{upload["received"] - 1}'}, b''
+
+    def _batch(self, headers, body):
+        request = BytesParser().parsebytes(
+            f'Content-Type: {headers["Content-Type"]}\r\n\r\n'.encode() + body
+        )
+        boundary = f'batch_{uuid.uuid4().hex}'
+        out = []
+        for part in request.get_payload():
+            http_request = part.get_payload()
+            request_line, _, rest = http_request.partition('\n')
+            method, path, _ = request_line.split(' ', 2)
+            status, _, payload = self.route(method, path, {}, b'')
+            content_id = part['Content-ID'][1:-1]
+            out.append(
+                f'--{boundary}\r\n'
+                'Content-Type: application/http\r\n'
+                f'Content-ID: <response-{content_id}>\r\n\r\n'
+                f'HTTP/1.1 {status} {"OK" if status == 200 else "Error"}\r\n'
+                'Content-Type: application/json; charset=UTF-8\r\n\r\n'
+                f'{payload.decode()}\r\n'
+            )
+        out.append(f'--{boundary}--\r\n')
+        return 200, {'Content-Type': f'multipart/mixed; boundary={boundary}'}, ''.join(out).encode()
+
+    @staticmethod
+    def _ok(resource):
+        return 200, {}, json.dumps(resource).encode()
+
+    @staticmethod
+    def _error(status, message):
+        return status, {}, json.dumps({'error': {'code': status, 'message': message}}).encode()
@@ -0,0 +1,122 @@
+import io
+import sys
+import tempfile
+import numpy as np
+import pytest
+from audio_fixtures import recording, tone, wav_bytes
+from backend.endpoints.audio_ingest import DecodedAudio, decode_audio, sniff_format
+
+
+class Upload(io.BytesIO):
+    """The parts of werkzeug's FileStorage that decode_audio uses"""
+
+    def __init__(self, data, mimetype=None):
+        super().__init__(data)
+        self.mimetype = mimetype
+
+
+@pytest.mark.parametrize('header, expected', [
+    (b'RIFF\x00\x00\x00\x00WAVEfmt ', 'wav'),
+    (b'\x1a\x45\xdf\xa3\x9f\x42\x86\x81', 'webm'),
+    (b'OggS\x00\x02\x00\x00', 'ogg'),
+    (b'fLaC\x00\x00\x00\x22', 'flac'),
+    (b'\x00\x00\x00\x20ftypM4A ', 'mp4'),
+    (b'ID3\x04\x00\x00\x00\x00', 'mp3'),
+    (b'\xff\xfb\x90\x64\x00\x00', 'mp3'),
+])
+def test_format_is_sniffed_from_magic_bytes(header, expected):
+    # Magic bytes win over a wrong or generic MIME type
+    assert sniff_format(header + b'\x00' * 32, 'application/octet-stream') == expected
+
+
+def test_unknown_bytes_fall_back_to_the_mime_type():
+    assert sniff_format(b'\x00' * 16, 'audio/webm;codecs=opus') == 'webm'
+    assert sniff_format(b'\x00' * 16, 'Audio/X-WAV') == 'wav'
+    assert sniff_format(b'\x00' * 16, 'text/plain') is None
+    assert sniff_format(b'\x00' * 16) is None
+
+
+def test_target_wav_skips_ffmpeg(monkeypatch):
+    # pydub is where ffmpeg comes in; make importing it fail
+    monkeypatch.setitem(sys.modules, 'pydub', None)
+    pcm = recording([(1, True), (0.5, False)])
+    upload = Upload(wav_bytes(pcm))
+    upload.seek(0, io.SEEK_END)
+
+    audio = decode_audio(upload)
+
+    assert audio.fast_path is True
+    assert audio.pcm == pcm
+    assert audio.source_format == 'wav'
+    assert audio.duration_seconds == pytest.approx(1.5)
+    assert audio.timing()['fast_path'] is True
+
+
+def test_decoding_writes_no_temp_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path))
+
+    decode_audio(Upload(wav_bytes(tone(2).tobytes()))).to_float32()
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_empty_upload_is_rejected():
+    with pytest.raises(ValueError):
+        decode_audio(Upload(b''))
+
+
+def test_float32_samples_match_whisper_input():
+    pcm = np.array([-32768, -16384, 0, 16384, 32767], dtype='<i2').tobytes()
+
+    samples = DecodedAudio(pcm).to_float32()
+
+    assert samples.dtype == np.float32
+    assert samples.tolist() == pytest.approx([-1.0, -0.5, 0.0, 0.5, 32767 / 32768])
+
+
+def test_wav_io_round_trips_the_pcm():
+    pcm = tone(0.25).tobytes()
+
+    reread = decode_audio(Upload(DecodedAudio(pcm).wav_io().read()))
+
+    assert reread.fast_path and reread.pcm == pcm
+
+
+def test_other_layouts_are_downmixed_and_resampled():
+    pytest.importorskip('pydub')
+    left, right = tone(1, rate=44100), tone(1, frequency=330, rate=44100)
+    stereo = wav_bytes(np.column_stack((left, right)).tobytes(), rate=44100, channels=2)
+
+    audio = decode_audio(Upload(stereo, 'audio/wav'))
+
+    assert audio.fast_path is False
+    assert audio.duration_seconds == pytest.approx(1.0, abs=0.01)
+    assert len(audio.to_float32()) == pytest.approx(16000, abs=160)
+
+
+def test_whisper_gets_the_array_without_touching_disk(tmp_path, monkeypatch):
+    pytest.importorskip('speech_recognition')
+    from backend.endpoints.stt_service import SpeechToTextService
+
+    class Models:
+        """A ready model manager that keeps what it was asked to transcribe"""
+        ready = True
+
+        def __init__(self):
+            self.calls = []
+
+        def transcribe(self, samples, **options):
+            self.calls.append((samples, options))
+            return {'text': ' hello ', 'language': 'en'}
+
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path))
+    models = Models()
+    pcm = tone(2).tobytes()
+
+    result = SpeechToTextService(whisper_models=models).transcribe(Upload(wav_bytes(pcm)), method='whisper')
+
+    assert result['success'] and result['transcription'] == 'hello'
+    samples, options = models.calls[0]
+    assert samples.dtype == np.float32 and len(samples) == len(pcm) // 2
+    assert options == {'fp16': False}
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,281 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import rsa
+from jose import jwk, jwt
+from conftest import FakeClock
+from Auth import auth
+from Auth.auth import JWKSCache, TokenCache
+
+DOMAIN = 'tenant.example.com'
+AUDIENCE = 'https://api.example.com'
+
+
+@pytest.fixture(scope='module')
+def signing_key():
+    _, private_key = rsa.newkeys(1024)
+    pem = private_key.save_pkcs1().decode()
+    public = jwk.construct(pem, 'RS256').public_key().to_dict()
+    return pem, dict(public, kid='key-1')
+
+
+class JWKSServer:
+    """A local JWKS endpoint that counts fetches; status and delay simulate an outage or a slow IdP"""
+
+    def __init__(self, keys):
+        self.keys = list(keys)
+        self.status = 200
+        self.delay = 0
+        self.fetches = 0
+        self._server = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/.well-known/jwks.json'
+
+    def __enter__(self):
+        jwks = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                jwks.fetches += 1
+                time.sleep(jwks.delay)
+                body = json.dumps({'keys': jwks.keys}).encode()
+                self.send_response(jwks.status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def jwks_server(signing_key):
+    _, public = signing_key
+    with JWKSServer([public]) as server:
+        yield server
+
+
+@pytest.fixture
+def clock():
+    return FakeClock(now=1000)
+
+
+def make_token(pem, sub='auth0|alice', ttl=300, kid='key-1'):
+    claims = {'sub': sub, 'aud': AUDIENCE, 'iss': f'https://{DOMAIN}/', 'exp': int(time.time()) + ttl}
+    return jwt.encode(claims, pem, algorithm='RS256', headers={'kid': kid})
+
+
+@pytest.fixture
+def verifier(monkeypatch, signing_key):
+    """verify_jwt wired to a local JWKS and fresh caches; returns its decode counter"""
+    _, public = signing_key
+    decodes = []
+    real_decode = jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        decodes.append(args[0])
+        return real_decode(*args, **kwargs)
+
+    monkeypatch.setattr(auth, 'AUTH0_DOMAIN', DOMAIN)
+    monkeypatch.setattr(auth, 'API_IDENTIFIER', AUDIENCE)
+    monkeypatch.setattr(auth, 'jwks_cache', JWKSCache('unused', fetch=lambda: {'keys': [public]}))
+    monkeypatch.setattr(auth, 'token_cache', TokenCache(maxsize=8))
+    monkeypatch.setattr(auth.jwt, 'decode', counting_decode)
+    return decodes
+
+
+def test_token_cache_hits_until_exp():
+    clock = FakeClock(now=1000)
+    cache = TokenCache(clock=clock)
+    cache.put('token', {'sub': 'a', 'exp': 1060})
+
+    assert cache.get('token') == {'sub': 'a', 'exp': 1060}
+    clock.now = 1060
+    assert cache.get('token') is None
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'size': 0}
+
+
+def test_token_cache_evicts_least_recently_used():
+    cache = TokenCache(maxsize=2, clock=FakeClock())
+    for name in ('a', 'b'):
+        cache.put(name, {'sub': name, 'exp': 10})
+    cache.get('a')
+    cache.put('c', {'sub': 'c', 'exp': 10})
+
+    assert cache.get('b') is None
+    assert cache.get('a')['sub'] == 'a'
+    assert cache.get('c')['sub'] == 'c'
+
+
+def test_token_cache_skips_tokens_without_exp():
+    cache = TokenCache(clock=FakeClock())
+    cache.put('token', {'sub': 'a'})
+    assert cache.get('token') is None
+
+    disabled = TokenCache(maxsize=0, clock=FakeClock())
+    disabled.put('token', {'sub': 'a', 'exp': 10})
+    assert disabled.get('token') is None
+
+
+def test_verify_jwt_checks_signature_once_per_token(verifier, signing_key):
+    pem, _ = signing_key
+    token = make_token(pem)
+
+    first = auth.verify_jwt(token)
+    second = auth.verify_jwt(token)
+
+    assert first == second
+    assert first['sub'] == 'auth0|alice'
+    assert len(verifier) == 1
+    assert auth.token_cache.stats()['hits'] == 1
+
+
+def test_verify_jwt_keeps_tokens_apart(verifier, signing_key):
+    pem, _ = signing_key
+    alice = auth.verify_jwt(make_token(pem, sub='auth0|alice'))
+    bob = auth.verify_jwt(make_token(pem, sub='auth0|bob'))
+
+    assert (alice['sub'], bob['sub']) == ('auth0|alice', 'auth0|bob')
+    assert len(verifier) == 2
+
+
+def test_verify_jwt_rejects_expired_tokens(verifier, signing_key):
+    pem, _ = signing_key
+    with pytest.raises(jwt.ExpiredSignatureError):
+        auth.verify_jwt(make_token(pem, ttl=-60))
+    assert auth.token_cache.stats()['size'] == 0
+
+
+def test_verify_jwt_rejects_tampered_tokens(verifier, signing_key):
+    pem, _ = signing_key
+    header, payload, signature = make_token(pem).split('.')
+    forged = '.'.join((header, payload, signature[::-1]))
+
+    with pytest.raises(jwt.JWTError):
+        auth.verify_jwt(forged)
+
+
+def test_jwks_cache_fetches_once_while_fresh(jwks_server, clock):
+    cache = JWKSCache(jwks_server.url, ttl=3600, clock=clock)
+
+    assert cache.get_key('key-1') is not None
+    clock.now += 3599
+    assert cache.get_key('key-1') is not None
+
+    assert jwks_server.fetches == 1
+
+
+def test_jwks_cache_refetches_after_the_ttl(jwks_server, clock, signing_key):
+    _, public = signing_key
+    cache = JWKSCache(jwks_server.url, ttl=3600, clock=clock)
+    cache.get_key('key-1')
+
+    jwks_server.keys = [dict(public, kid='key-2')]
+    clock.now += 3600
+
+    assert cache.get_key('key-1') is None
+    assert cache.get_key('key-2') is not None
+    assert jwks_server.fetches == 2
+
+
+def test_unknown_kid_refreshes_for_a_rotated_key(jwks_server, clock, signing_key, monkeypatch):
+    pem, public = signing_key
+    cache = JWKSCache(jwks_server.url, min_refresh_interval=30, clock=clock)
+    monkeypatch.setattr(auth, 'AUTH0_DOMAIN', DOMAIN)
+    monkeypatch.setattr(auth, 'API_IDENTIFIER', AUDIENCE)
+    monkeypatch.setattr(auth, 'jwks_cache', cache)
+    monkeypatch.setattr(auth, 'token_cache', TokenCache(maxsize=8))
+    auth.verify_jwt(make_token(pem, kid='key-1'))
+
+    # The IdP rotates its signing key well inside the TTL
+    jwks_server.keys = [public, dict(public, kid='key-2')]
+    clock.now += 30
+
+    assert auth.verify_jwt(make_token(pem, kid='key-2'))['sub'] == 'auth0|alice'
+    assert jwks_server.fetches == 2
+
+
+def test_unknown_kids_back_off_for_min_refresh_interval(jwks_server, clock):
+    cache = JWKSCache(jwks_server.url, min_refresh_interval=30, clock=clock)
+    cache.get_key('key-1')
+
+    # Tokens with made-up kids must not turn into a fetch each
+    for second in range(30):
+        clock.now = 1000 + second
+        assert cache.get_key(f'forged-{second}') is None
+    assert jwks_server.fetches == 1
+
+    clock.now = 1030
+    assert cache.get_key('forged') is None
+    assert jwks_server.fetches == 2
+
+
+def test_concurrent_callers_share_one_fetch(jwks_server, clock, signing_key):
+    _, public = signing_key
+    cache = JWKSCache(jwks_server.url, min_refresh_interval=30, clock=clock)
+    cache.get_key('key-1')
+    jwks_server.keys = [public, dict(public, kid='key-2')]
+    jwks_server.delay = 0.2
+    clock.now += 60
+
+    callers = 16
+    barrier = threading.Barrier(callers)
+    found = []
+
+    def verify():
+        barrier.wait()
+        found.append(cache.get_key('key-2'))
+
+    threads = [threading.Thread(target=verify) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(found) == callers and all(key is not None for key in found)
+    assert jwks_server.fetches == 2
+
+
+def test_failed_refresh_serves_cached_keys_then_retries(jwks_server, clock):
+    cache = JWKSCache(jwks_server.url, ttl=3600, min_refresh_interval=30, clock=clock)
+    cache.get_key('key-1')
+
+    jwks_server.status = 503
+    clock.now += 3600
+    assert cache.get_key('key-1') is not None
+    assert jwks_server.fetches == 2
+
+    # Still down and still stale, but no fetch until min_refresh_interval has passed
+    clock.now += 29
+    assert cache.get_key('key-1') is not None
+    assert jwks_server.fetches == 2
+
+    jwks_server.status = 200
+    clock.now += 1
+    assert cache.get_key('key-1') is not None
+    assert jwks_server.fetches == 3
+    clock.now += 60
+    cache.get_key('key-1')
+    assert jwks_server.fetches == 3
+
+
+def test_failed_first_fetch_raises(jwks_server, clock):
+    jwks_server.status = 503
+    cache = JWKSCache(jwks_server.url, clock=clock)
+
+    with pytest.raises(Exception):
+        cache.get_key('key-1')
@@ -0,0 +1,87 @@
+import csv
+import pytest
+from flask import Flask
+from sqlalchemy import select, text
+from config import Config
+from database import db, init_db, users_cli
+from models.User import User
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'DATABASE_URL', f'sqlite:///{tmp_path / "users.db"}')
+    app = Flask(__name__)
+    init_db(app)
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['auth0_id', 'email', 'name'])
+        writer.writerows(rows)
+    return str(path)
+
+
+def run_users(app, *args):
+    result = app.test_cli_runner().invoke(users_cli, list(args))
+    assert result.exit_code == 0, result.output
+    return result
+
+
+def stored_users():
+    return {(user.auth0_id, user.email, user.name) for user in db.session.scalars(select(User))}
+
+
+def test_sqlite_connections_are_tuned(app):
+    with db.engine.connect() as connection:
+        assert connection.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+        # NORMAL
+        assert connection.execute(text('PRAGMA synchronous')).scalar() == 1
+        assert connection.execute(text('PRAGMA busy_timeout')).scalar() == Config.SQLITE_BUSY_TIMEOUT_MS
+
+
+def test_import_skips_duplicates_and_invalid_rows(app, tmp_path):
+    db.session.add(User(auth0_id='auth0|existing', email='taken@example.com', name='Existing'))
+    db.session.commit()
+
+    path = write_csv(tmp_path / 'users.csv', [
+        ['auth0|a', 'a@example.com', 'A'],
+        ['auth0|existing', 'other@example.com', 'Same sub'],
+        ['auth0|b', 'taken@example.com', 'Same email'],
+        ['auth0|c', '', 'No email'],
+        ['auth0|d', '   ', 'Blank email'],
+        ['', 'e@example.com', 'No sub'],
+        ['auth0|a', 'a2@example.com', 'Repeated in file'],
+        ['auth0|f', 'f@example.com', ''],
+    ])
+    result = run_users(app, 'import', path, '--batch-size', '2')
+
+    assert stored_users() == {
+        ('auth0|existing', 'taken@example.com', 'Existing'),
+        ('auth0|a', 'a@example.com', 'A'),
+        ('auth0|f', 'f@example.com', None),
+    }
+    assert 'Imported 2 users' in result.output
+    assert 'skipped 3 duplicates and 3 invalid rows' in result.output
+    assert 'line 5: missing email' in result.stderr
+
+
+def test_export_round_trips_through_import(app, tmp_path):
+    db.session.add_all([
+        User(auth0_id=f'auth0|{i}', email=f'user{i}@example.com', name=f'User {i}' if i % 2 else None)
+        for i in range(25)
+    ])
+    db.session.commit()
+    expected = stored_users()
+
+    path = str(tmp_path / 'export.csv')
+    run_users(app, 'export', path, '--batch-size', '7')
+    db.session.execute(User.__table__.delete())
+    db.session.commit()
+    run_users(app, 'import', path, '--batch-size', '10')
+
+    assert stored_users() == expected
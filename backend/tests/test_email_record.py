@@ -0,0 +1,71 @@
+import json
+import pytest
+from endpoints import fast_json
+from endpoints.email_record import EmailRecord
+
+
+def message(headers, **fields):
+    return dict({'id': 'm1', 'snippet': 'Hello', 'payload': {'headers': headers}}, **fields)
+
+
+def test_headers_are_indexed_case_insensitively():
+    record = EmailRecord.from_message(message([
+        {'name': 'SUBJECT', 'value': 'Quarterly report'},
+        {'name': 'from', 'value': 'Ana <ana@example.com>'},
+        {'name': 'Date', 'value': 'Mon, 1 Jan 2024 10:00:00 +0000'},
+    ]))
+
+    assert (record.subject, record.sender, record.date) == (
+        'Quarterly report', 'Ana <ana@example.com>', 'Mon, 1 Jan 2024 10:00:00 +0000'
+    )
+
+
+def test_first_header_wins_like_the_old_lookup():
+    record = EmailRecord.from_message(message([
+        {'name': 'Subject', 'value': 'First'},
+        {'name': 'Subject', 'value': 'Second'},
+    ]))
+    assert record.subject == 'First'
+
+
+def test_missing_headers_default_to_empty():
+    record = EmailRecord.from_message({'id': 'm1', 'payload': {}})
+    assert record.to_dict() == {'id': 'm1', 'subject': '', 'sender': '', 'date': '', 'snippet': ''}
+
+
+def test_to_dict_includes_body_fields_only_once_loaded():
+    record = EmailRecord(id='m1', subject='Hi')
+    assert 'body' not in record.to_dict()
+
+    record.body = 'Text'
+    record.draft_id = 'd1'
+    data = record.to_dict()
+    assert data['body'] == 'Text'
+    assert data['attachments'] == []
+    assert data['draft_id'] == 'd1'
+    assert EmailRecord.from_dict(data).to_dict() == data
+
+
+def test_records_use_slots():
+    with pytest.raises(AttributeError):
+        EmailRecord(id='m1').unexpected = True
+
+
+@pytest.mark.parametrize('use_orjson', [True, False])
+def test_dumps_encodes_records_through_to_dict(monkeypatch, use_orjson):
+    if not use_orjson:
+        monkeypatch.setattr(fast_json, 'orjson', None)
+    elif fast_json.orjson is None:
+        pytest.skip('orjson is not installed')
+
+    page = {'messages': [EmailRecord(id='m1', subject='Grüße', body='x')], 'next_page_token': None}
+    assert json.loads(fast_json.dumps(page)) == {
+        'messages': [{'id': 'm1', 'subject': 'Grüße', 'sender': '', 'date': '', 'snippet': '',
+                      'body': 'x', 'attachments': []}],
+        'next_page_token': None
+    }
+
+
+def test_dumps_rejects_unknown_objects():
+    with pytest.raises(TypeError):
+        fast_json.dumps({'value': object()})
@@ -0,0 +1,59 @@
+import pytest
+
+pytest.importorskip('googleapiclient')
+
+from Auth import auth
+from backend.endpoints.gmail_service import GmailService
+from endpoints import gmail
+
+HEADERS = {'Authorization': 'Bearer test-token'}
+
+
+@pytest.fixture
+def service(fake_gmail):
+    return fake_gmail.connect(GmailService())
+
+
+@pytest.fixture
+def client(monkeypatch, service):
+    monkeypatch.setattr(auth, 'verify_jwt', lambda token: {'sub': 'auth0|alice'})
+    monkeypatch.setattr(gmail.gmail_pool, 'load', lambda sub: service)
+    return gmail.app.test_client()
+
+
+def test_attachment_streams_with_server_side_metadata(client, fake_gmail):
+    response = client.get(
+        '/api/emails/msg000001/attachments/att-msg000001'
+        '?filename=evil.html&mime_type=text/html',
+        headers=HEADERS
+    )
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/pdf'
+    assert response.headers['Content-Disposition'] == 'attachment; filename="report-1.pdf"'
+    assert response.headers['X-Content-Type-Options'] == 'nosniff'
+    assert response.data == fake_gmail.attachments['att-msg000001']
+
+
+def test_unknown_attachment_is_not_served(client):
+    # An attachment id from another message must not be fetched under this one
+    response = client.get('/api/emails/msg000001/attachments/att-msg000002', headers=HEADERS)
+    assert response.status_code == 404
+
+    response = client.get('/api/emails/missing/attachments/att-msg000001', headers=HEADERS)
+    assert response.status_code == 404
+
+
+def test_reissued_attachment_id_is_matched_by_part(client, fake_gmail):
+    response = client.get('/api/emails/msg000003/attachments/stale-id?part_id=1', headers=HEADERS)
+
+    assert response.status_code == 200
+    assert response.headers['Content-Disposition'] == 'attachment; filename="report-3.pdf"'
+    assert response.data == fake_gmail.attachments['att-msg000003']
+
+
+def test_iter_attachment_decodes_in_chunks(service, fake_gmail):
+    chunks = list(service.iter_attachment('msg000004', 'att-msg000004', chunk_size=1000))
+
+    assert b''.join(chunks) == fake_gmail.attachments['att-msg000004']
+    assert max(len(chunk) for chunk in chunks) <= 750
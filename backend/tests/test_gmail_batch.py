@@ -0,0 +1,71 @@
+import pytest
+
+gmail_service = pytest.importorskip('backend.endpoints.gmail_service')
+
+
+@pytest.fixture
+def service(fake_gmail):
+    return fake_gmail.connect(gmail_service.GmailService())
+
+
+def test_page_is_fetched_in_batches(service, fake_gmail):
+    page = service.get_messages(max_results=60)
+
+    assert [record.id for record in page['messages']] == [m['id'] for m in fake_gmail.messages[:60]]
+    assert page['next_page_token'] == '60'
+    # One list call, then 50 + 10 messages in two batch round trips
+    assert fake_gmail.round_trips == 3
+    assert fake_gmail.calls == 61
+
+
+def test_list_view_is_metadata_only(service):
+    record = service.get_messages(max_results=1)['messages'][0]
+
+    assert record.subject == 'Subject 0'
+    assert record.sender == 'Sender 0 <sender0@example.com>'
+    assert not record.has_body
+
+
+def test_one_failed_message_does_not_fail_the_page(service, fake_gmail, monkeypatch):
+    delays = []
+    monkeypatch.setattr(gmail_service.gmail_upstream, 'max_attempts', 3)
+    monkeypatch.setattr(gmail_service.gmail_upstream, '_sleep', delays.append)
+    fake_gmail.fail_ids.add('msg000002')
+    fake_gmail.rate_limited_ids['msg000004'] = 1
+    del fake_gmail.by_id['msg000007']
+
+    page = service.get_messages(max_results=10)
+
+    ids = [record.id for record in page['messages']]
+    assert len(ids) == 8
+    assert 'msg000004' in ids
+    assert 'msg000002' not in ids and 'msg000007' not in ids
+    assert ids == sorted(ids)
+    # The 429 and the 500 are re-batched with backoff, the 500 until it runs out
+    # of attempts; the 404 is permanent and asked for once
+    assert len(delays) == 2
+    assert fake_gmail.calls == 1 + 10 + 2 + 1
+
+
+def test_stream_fetches_chunk_by_chunk(service, fake_gmail):
+    messages, _ = service.stream_messages(max_results=25)
+    assert fake_gmail.round_trips == 1
+
+    first = next(messages)
+    assert first.id == 'msg000000'
+    assert fake_gmail.round_trips == 2
+
+    assert len([first, *messages]) == 25
+    assert fake_gmail.round_trips == 1 + -(-25 // gmail_service.STREAM_CHUNK_SIZE)
+
+
+def test_drafts_are_hydrated_in_one_batch(service, fake_gmail):
+    page = service.get_draft_messages(max_results=5)
+
+    assert [draft.draft_id for draft in page['drafts']] == [f'draft{i:04d}' for i in range(5)]
+    assert page['drafts'][0].body.startswith('Body of message 100000')
+    assert fake_gmail.round_trips == 2
+
+    # The first page is served from cache until refreshed
+    service.get_draft_messages(max_results=5)
+    assert fake_gmail.round_trips == 2
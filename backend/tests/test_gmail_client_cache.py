@@ -0,0 +1,105 @@
+import datetime
+import os
+import pytest
+
+pytest.importorskip('googleapiclient')
+
+from google.oauth2.credentials import Credentials
+from fake_gmail import write_token_file
+from backend.endpoints.gmail_service import GmailService
+
+
+@pytest.fixture
+def token_file(tmp_path):
+    path = str(tmp_path / 'token.json')
+    write_token_file(path)
+    return path
+
+
+@pytest.fixture
+def builds(fake_gmail, monkeypatch):
+    """Services built against the fake server, counted"""
+    built = []
+
+    def build_service(self):
+        built.append(self)
+        fake_gmail.connect(self)
+
+    monkeypatch.setattr(GmailService, '_build_service', build_service)
+    return built
+
+
+def touch(path, seconds=10):
+    mtime = os.path.getmtime(path) + seconds
+    os.utime(path, (mtime, mtime))
+
+
+def test_unchanged_token_file_reuses_the_client(token_file, builds):
+    service = GmailService(token_file=token_file)
+
+    assert service.load_credentials()
+    client, creds = service.service, service.creds
+    for _ in range(5):
+        assert service.load_credentials()
+
+    assert len(builds) == 1
+    assert service.service is client and service.creds is creds
+    assert service.get_messages(max_results=2)['messages']
+
+
+def test_changed_token_file_reloads_and_rebuilds(token_file, builds):
+    service = GmailService(token_file=token_file)
+    service.load_credentials()
+    client = service.service
+
+    # Another worker logged the user in again
+    write_token_file(token_file)
+    touch(token_file)
+    assert service.load_credentials()
+
+    assert len(builds) == 2
+    assert service.service is not client
+
+
+def test_removed_token_file_drops_the_client(token_file, builds):
+    service = GmailService(token_file=token_file)
+    service.load_credentials()
+
+    os.remove(token_file)
+
+    assert service.load_credentials() is False
+    assert service.service is None and service.creds is None
+
+
+def test_expiring_token_is_refreshed_in_place(token_file, builds, monkeypatch):
+    soon = datetime.datetime.utcnow() + datetime.timedelta(seconds=30)
+    write_token_file(token_file, expiry=soon.strftime('%Y-%m-%dT%H:%M:%SZ'))
+    refreshes = []
+
+    def refresh(creds, request):
+        refreshes.append(creds)
+        creds.token = 'refreshed-token'
+        creds.expiry = datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+
+    monkeypatch.setattr(Credentials, 'refresh', refresh)
+    service = GmailService(token_file=token_file)
+
+    assert service.load_credentials()
+    assert service.load_credentials()
+
+    assert len(refreshes) == 1
+    # The refreshed token is saved, and the saved file does not count as a change
+    with open(token_file) as f:
+        assert 'refreshed-token' in f.read()
+    assert len(builds) == 1
+
+
+def test_client_is_built_from_the_bundled_discovery_document(token_file, monkeypatch):
+    def no_network(self):
+        raise AssertionError('discovery document fetched over HTTP')
+
+    monkeypatch.setattr(GmailService, 'thread_http', no_network)
+    service = GmailService(token_file=token_file)
+
+    assert service.load_credentials()
+    assert service.service.users().messages() is not None
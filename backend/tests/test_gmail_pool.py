@@ -0,0 +1,124 @@
+import os
+import threading
+import pytest
+
+pytest.importorskip('googleapiclient')
+
+from fake_gmail import write_token_file
+from backend.endpoints.gmail_pool import CredentialStore, GmailClientPool
+from backend.endpoints.gmail_service import GmailService
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CredentialStore(str(tmp_path / 'user_data'))
+
+
+@pytest.fixture
+def pool(store, fake_gmail, monkeypatch):
+    # Logged-in users talk to the fake server instead of Google
+    monkeypatch.setattr(GmailService, '_build_service', lambda self: fake_gmail.connect(self))
+    return GmailClientPool(store, maxsize=3)
+
+
+def log_in(store, sub):
+    write_token_file(store.token_file(sub))
+
+
+def test_users_get_separate_directories(store):
+    alice, bob = store.user_dir('auth0|alice'), store.user_dir('auth0|bob')
+
+    assert alice != bob
+    assert os.path.isdir(alice) and os.path.isdir(bob)
+    # Hashed, so a sub cannot escape the data directory
+    assert os.path.dirname(store.user_dir('../../etc')) == store.root
+
+
+def test_pool_reuses_clients_and_evicts_least_recently_used(pool):
+    alice = pool.get('alice')
+    assert pool.get('alice') is alice
+
+    for sub in ('bob', 'carol', 'dave'):
+        pool.get(sub)
+    assert list(pool._services) == ['bob', 'carol', 'dave']
+
+    pool.get('bob')
+    pool.get('erin')
+    assert list(pool._services) == ['dave', 'bob', 'erin']
+    assert pool.get('alice') is not alice
+
+
+def test_only_users_with_a_token_are_loaded(pool, store):
+    log_in(store, 'alice')
+
+    assert pool.load('bob') is None
+    service = pool.load('alice')
+    assert service is not None
+    assert service.get_messages(max_results=2)['messages'][0].id == 'msg000000'
+
+
+def test_logout_only_affects_that_user(pool, store):
+    for sub in ('alice', 'bob'):
+        log_in(store, sub)
+        pool.load(sub).sync_messages(force=True)
+    alice_dir = store.user_dir('alice')
+
+    pool.logout('alice')
+
+    assert not os.path.exists(store.token_file('alice'))
+    assert pool.load('alice') is None
+    assert pool.get('alice').store.list_messages(limit=5) == []
+    assert os.path.isdir(alice_dir)
+    bob = pool.load('bob')
+    assert bob is not None
+    assert len(bob.store.list_messages(limit=5)) == 5
+
+
+def test_concurrent_first_requests_build_one_client(pool):
+    barrier = threading.Barrier(8)
+    services = []
+
+    def first_request():
+        barrier.wait()
+        services.append(pool.get('alice'))
+
+    threads = [threading.Thread(target=first_request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(service) for service in services}) == 1
+
+
+def test_user_locks_are_not_kept_per_sub(pool):
+    for i in range(50):
+        pool.get(f'user{i}')
+    assert len(pool._user_locks) == 0
+
+
+def test_one_users_concurrent_requests_get_their_own_responses(pool, store):
+    # A shared httplib2 connection would interleave these and cross the replies
+    log_in(store, 'alice')
+    service = pool.load('alice')
+    barrier = threading.Barrier(8)
+    pages, errors = [], []
+
+    def request(size):
+        barrier.wait()
+        try:
+            for _ in range(5):
+                pages.append((size, service.get_messages(max_results=size)))
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=request, args=(size,)) for size in range(2, 10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(pages) == 40
+    for size, page in pages:
+        assert [message.id for message in page['messages']] == [f'msg{i:06d}' for i in range(size)]
@@ -0,0 +1,189 @@
+import email
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import pytest
+from conftest import BACKEND_DIR
+from backend.endpoints.rate_limit import TokenBucket
+
+gmail_service = pytest.importorskip('backend.endpoints.gmail_service')
+
+# Builds one message in a fresh interpreter and reports how far its RSS high-water
+# mark rose. VmHWM belongs to the new address space; ru_maxrss would carry over
+# pytest's own peak through fork and exec.
+RSS_PROBE = '''
+import json, sys
+from backend.endpoints.gmail_service import GmailService
+
+def high_water_kb():
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1])
+
+path, streamed = sys.argv[1], sys.argv[2] == 'streamed'
+service = GmailService()
+before = high_water_kb()
+if streamed:
+    with open(path + '.eml', 'wb') as fp:
+        service._write_message(fp, 'to@example.com', 'Report', 'See attached', attachments=[path])
+else:
+    service._create_message('to@example.com', 'Report', 'See attached', attachments=[path])
+print(json.dumps({'grown_mb': (high_water_kb() - before) / 1024}))
+'''
+needs_proc = pytest.mark.skipif(not os.path.exists('/proc/self/status'), reason='needs Linux /proc')
+
+
+def make_attachment(directory, size, name='report.pdf'):
+    path = os.path.join(directory, name)
+    with open(path, 'wb') as f:
+        f.write(os.urandom(size))
+    return path
+
+
+def peak_rss_growth_mb(path, streamed):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join((BACKEND_DIR, os.path.dirname(BACKEND_DIR))))
+    result = subprocess.run(
+        [sys.executable, '-c', RSS_PROBE, path, 'streamed' if streamed else 'inline'],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=120
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])['grown_mb']
+
+
+@pytest.fixture
+def service(fake_gmail):
+    return fake_gmail.connect(gmail_service.GmailService())
+
+
+@pytest.fixture
+def temp_dir(tmp_path, monkeypatch):
+    """Send temp files land here so tests can check they are cleaned up"""
+    scratch = tmp_path / 'send-tmp'
+    scratch.mkdir()
+    monkeypatch.setattr(tempfile, 'tempdir', str(scratch))
+    return scratch
+
+
+def test_streamed_message_parses_back(tmp_path):
+    path = make_attachment(tmp_path, 300_000)
+    fp = io.BytesIO()
+    gmail_service.GmailService()._write_message(
+        fp, 'Zoë Ångström <zoe@example.com>, bob@example.com', 'Grüße', 'Plain', html_body='<b>Rich</b>',
+        attachments=[path], headers={'In-Reply-To': '<orig@example.com>'}
+    )
+
+    message = email.message_from_bytes(fp.getvalue(), policy=email.policy.default)
+    assert message['Subject'] == 'Grüße'
+    assert message['In-Reply-To'] == '<orig@example.com>'
+    assert [address.addr_spec for address in message['To'].addresses] == ['zoe@example.com', 'bob@example.com']
+    assert message['To'].addresses[0].display_name == 'Zoë Ångström'
+
+    parts = list(message.iter_attachments())
+    assert [part.get_filename() for part in parts] == ['report.pdf']
+    assert parts[0].get_content_type() == 'application/pdf'
+    with open(path, 'rb') as f:
+        assert parts[0].get_content() == f.read()
+    assert message.get_body(('plain',)).get_content().strip() == 'Plain'
+    assert message.get_body(('html',)).get_content().strip() == '<b>Rich</b>'
+
+
+def test_small_messages_are_sent_inline(service, fake_gmail, tmp_path, temp_dir):
+    path = make_attachment(tmp_path, 10_000)
+    result = service.send_email('to@example.com', 'Small', 'Body', attachments=[path])
+
+    assert result['status'] == 'sent'
+    # One messages.send call with the base64url message in its JSON body
+    assert fake_gmail.round_trips == 1
+    assert fake_gmail.sent[-1]['raw_size'] > 10_000 * 4 / 3
+    assert os.listdir(temp_dir) == []
+
+
+def test_large_messages_use_a_resumable_upload(service, fake_gmail, tmp_path, temp_dir, monkeypatch):
+    monkeypatch.setattr(gmail_service, 'UPLOAD_CHUNK_SIZE', 256 * 1024)
+    size = 3 * 1024 * 1024
+    path = make_attachment(tmp_path, size)
+
+    result = service.send_email('to@example.com', 'Large', 'Body', attachments=[path])
+
+    assert result['status'] == 'sent'
+    # base64 grows the attachment by 4/3, plus headers and line breaks
+    assert size * 4 / 3 < fake_gmail.sent[-1]['raw_size'] < size * 1.4
+    # Session start plus one PUT per 256 KiB chunk
+    assert fake_gmail.round_trips > 10
+    assert os.listdir(temp_dir) == []
+
+
+def test_bulk_send_streams_large_messages_per_thread(service, fake_gmail, tmp_path, temp_dir, monkeypatch):
+    # Worker threads upload over their own connections from thread_http()
+    monkeypatch.setattr(gmail_service, 'UPLOAD_CHUNK_SIZE', 256 * 1024)
+    service.send_limiter = TokenBucket(rate=1000, capacity=1000)
+    path = make_attachment(tmp_path, 2 * 1024 * 1024)
+    items = [{'to': 'to@example.com', 'subject': f'Report {i}', 'body': 'Body', 'attachments': [path]}
+             for i in range(3)]
+
+    results = service.send_batch(items + [{'to': 'to@example.com'}], max_workers=3)
+
+    assert [result['status'] for result in results] == ['sent', 'sent', 'sent', 'invalid']
+    assert len(fake_gmail.sent) == 3
+    assert os.listdir(temp_dir) == []
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(gmail_service.gmail_upstream, '_sleep', lambda delay: None)
+
+
+@pytest.mark.parametrize('size', [10_000, 2 * 1024 * 1024], ids=['inline', 'resumable'])
+def test_server_error_on_send_is_not_retried(service, fake_gmail, tmp_path, no_backoff, size):
+    # Gmail may have delivered before answering 503; a retry would send it twice
+    fake_gmail.send_errors = [503]
+    path = make_attachment(tmp_path, size)
+
+    assert service.send_email('to@example.com', 'Once', 'Body', attachments=[path]) is None
+    assert len(fake_gmail.sent) == 1
+
+
+@pytest.mark.parametrize('size', [10_000, 2 * 1024 * 1024], ids=['inline', 'resumable'])
+def test_rate_limited_send_is_retried(service, fake_gmail, tmp_path, no_backoff, size):
+    fake_gmail.send_errors = [429]
+    path = make_attachment(tmp_path, size)
+
+    result = service.send_email('to@example.com', 'Later', 'Body', attachments=[path])
+
+    assert result['status'] == 'sent'
+    assert len(fake_gmail.sent) == 1
+
+
+def test_reads_are_still_retried(service, fake_gmail, no_backoff):
+    fake_gmail.fail_ids.add('msg000003')
+    calls = fake_gmail.calls
+    service.get_thread_info('msg000003')
+    assert fake_gmail.calls - calls == gmail_service.gmail_upstream.max_attempts
+
+
+def test_failed_upload_still_removes_the_temp_file(service, fake_gmail, tmp_path, temp_dir, monkeypatch):
+    monkeypatch.setattr(gmail_service.gmail_upstream, 'max_attempts', 1)
+    path = make_attachment(tmp_path, 2 * 1024 * 1024)
+    fake_gmail.stop()
+
+    assert service.send_email('to@example.com', 'Large', 'Body', attachments=[path]) is None
+    assert os.listdir(temp_dir) == []
+    fake_gmail.start()
+
+
+@needs_proc
+@pytest.mark.parametrize('megabytes', [1, 10, 25])
+def test_streamed_build_keeps_peak_rss_bounded(tmp_path, megabytes):
+    path = make_attachment(tmp_path, megabytes * 1024 * 1024)
+    assert peak_rss_growth_mb(path, streamed=True) < 8
+
+
+@needs_proc
+def test_inline_build_grows_with_the_attachment(tmp_path):
+    # Guards the probe itself: the in-memory builder must register
+    path = make_attachment(tmp_path, 10 * 1024 * 1024)
+    assert peak_rss_growth_mb(path, streamed=False) > 30
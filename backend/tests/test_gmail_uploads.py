@@ -0,0 +1,112 @@
+import base64
+import email
+import io
+import os
+import pytest
+
+pytest.importorskip('googleapiclient')
+
+from Auth import auth
+from backend.endpoints.gmail_service import GmailService
+from endpoints import gmail
+
+HEADERS = {'Authorization': 'Bearer test-token'}
+
+
+@pytest.fixture
+def service(fake_gmail, tmp_path):
+    return fake_gmail.connect(GmailService(upload_dir=str(tmp_path / 'alice' / 'uploads')))
+
+
+@pytest.fixture
+def client(monkeypatch, service):
+    monkeypatch.setattr(auth, 'verify_jwt', lambda token: {'sub': 'auth0|alice'})
+    monkeypatch.setattr(gmail.gmail_pool, 'load', lambda sub: service)
+    return gmail.app.test_client()
+
+
+@pytest.fixture
+def secret(tmp_path):
+    """A server file another tenant's request must never be able to attach"""
+    path = tmp_path / 'bob' / 'token.json'
+    path.parent.mkdir()
+    path.write_text('{"refresh_token": "bob-secret"}')
+    return str(path)
+
+
+def upload(client, data=b'%PDF-1.4 quarterly numbers', filename='../../Q3 report.pdf'):
+    response = client.post(
+        '/api/attachments',
+        data={'file': (io.BytesIO(data), filename)},
+        content_type='multipart/form-data',
+        headers=HEADERS
+    )
+    assert response.status_code == 201
+    return response.get_json()
+
+
+@pytest.mark.parametrize('attachments', [
+    'secret',
+    ['../bob/token.json'],
+    ['credentials.json'],
+    ['0' * 32],
+    [{'path': '/etc/passwd'}],
+    'not-a-list',
+])
+def test_send_rejects_anything_but_upload_ids(client, fake_gmail, secret, attachments):
+    if attachments == 'secret':
+        attachments = [secret]
+    response = client.post('/api/emails/send', json={
+        'to': 'me@example.com', 'subject': 'Loot', 'body': 'See attached', 'attachments': attachments
+    }, headers=HEADERS)
+
+    assert response.status_code == 400
+    assert fake_gmail.sent == []
+
+
+def test_batch_send_rejects_paths_before_sending_anything(client, fake_gmail, secret):
+    good = {'to': 'a@example.com', 'subject': 'Fine', 'body': 'Body'}
+    response = client.post('/api/emails/send/batch', json={
+        'messages': [good, dict(good, attachments=[secret])]
+    }, headers=HEADERS)
+
+    assert response.status_code == 400
+    assert 'messages[1]' in response.get_json()['error']
+    assert fake_gmail.sent == []
+
+
+def test_uploaded_file_is_attached_by_id(client, fake_gmail):
+    uploaded = upload(client)
+
+    response = client.post('/api/emails/send', json={
+        'to': 'me@example.com', 'subject': 'Report', 'body': 'Attached', 'attachments': [uploaded['id']]
+    }, headers=HEADERS)
+
+    assert response.status_code == 200
+    assert uploaded['filename'] == 'Q3_report.pdf'
+    assert len(fake_gmail.sent) == 1
+    message = email.message_from_bytes(base64.urlsafe_b64decode(fake_gmail.sent[0]['raw']))
+    parts = [part for part in message.walk() if part.get_filename()]
+    assert [part.get_filename() for part in parts] == ['Q3_report.pdf']
+    assert parts[0].get_payload(decode=True) == b'%PDF-1.4 quarterly numbers'
+
+
+def test_ids_are_scoped_to_the_users_upload_dir(service, fake_gmail, tmp_path):
+    upload_id = service.save_upload(io.BytesIO(b'data'), 'notes.txt')
+    other = GmailService(upload_dir=str(tmp_path / 'bob' / 'uploads'))
+
+    assert service.upload_paths([upload_id]) == [os.path.join(service.upload_dir, upload_id, 'notes.txt')]
+    with pytest.raises(ValueError):
+        other.upload_paths([upload_id])
+
+
+def test_old_uploads_are_pruned_and_logout_removes_them(service):
+    stale = service.save_upload(io.BytesIO(b'old'), 'old.txt')
+    old = os.path.getmtime(os.path.join(service.upload_dir, stale)) - 2 * 24 * 3600
+    os.utime(os.path.join(service.upload_dir, stale), (old, old))
+
+    fresh = service.save_upload(io.BytesIO(b'new'), 'new.txt')
+
+    assert os.listdir(service.upload_dir) == [fresh]
+    service.clear_local_data()
+    assert not os.path.exists(service.upload_dir)
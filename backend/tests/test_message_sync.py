@@ -0,0 +1,136 @@
+import copy
+import pytest
+
+gmail_service = pytest.importorskip('backend.endpoints.gmail_service')
+
+from fake_gmail import make_message
+from backend.endpoints.email_record import EmailRecord
+from backend.endpoints.message_store import MessageStore
+from backend.endpoints.search_index import SearchIndex
+from config import Config
+
+SYNC_SIZE = 20
+
+
+@pytest.fixture
+def service(fake_gmail, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'MESSAGE_SYNC_SIZE', SYNC_SIZE)
+    return fake_gmail.connect(gmail_service.GmailService(
+        store=MessageStore(str(tmp_path / 'messages.db')),
+        search_index=SearchIndex(str(tmp_path / 'search.db'))
+    ))
+
+
+def listed_ids(service):
+    return [record.id for record in service.store.list_messages(limit=1000)]
+
+
+def sync(service):
+    assert service.sync_messages(force=True)
+
+
+def newer_message(fake_gmail, index):
+    """A message delivered after everything in the fake mailbox"""
+    message = make_message(index)
+    message['internalDate'] = str(int(fake_gmail.messages[0]['internalDate']) + 60_000)
+    return message
+
+
+def test_initial_sync_stores_the_newest_messages(service, fake_gmail):
+    page = service.get_stored_messages(max_results=10)
+
+    assert [record.id for record in page['messages']] == [m['id'] for m in fake_gmail.messages[:10]]
+    assert page['next_page_token'] == f'{gmail_service.LOCAL_PAGE_PREFIX}10'
+    assert listed_ids(service) == [m['id'] for m in fake_gmail.messages[:SYNC_SIZE]]
+    assert service.store.get_state('history_id') == str(fake_gmail.history_id)
+    # Past the store, paging hands over to Gmail's cursor
+    assert service.store.get_state('list_page_token') == str(SYNC_SIZE)
+    # getProfile, messages.list and one batch of metadata gets
+    assert fake_gmail.round_trips == 3
+
+
+def test_history_applies_added_deleted_and_relabelled_messages(service, fake_gmail):
+    sync(service)
+    fake_gmail.add_message(newer_message(fake_gmail, 900))
+    fake_gmail.delete_message('msg000003')
+    fake_gmail.relabel('msg000005', add=['TRASH'])
+    fake_gmail.relabel('msg000006', add=['SPAM'])
+    fake_gmail.relabel('msg000007', add=['STARRED'])
+
+    sync(service)
+
+    ids = listed_ids(service)
+    assert ids[0] == 'msg000900'
+    assert not {'msg000003', 'msg000005', 'msg000006'}.intersection(ids)
+    assert 'msg000007' in ids
+    assert service.store.get_message('msg000003') is None
+    assert service.search_index.search('subject:"Subject 5"') == []
+    assert service.store.get_state('history_id') == str(fake_gmail.history_id)
+
+
+def test_restore_from_trash_relists_and_keeps_the_cached_body(service, fake_gmail):
+    sync(service)
+    assert service.get_message_by_id('msg000002').has_body
+    fake_gmail.relabel('msg000002', add=['TRASH'])
+    fake_gmail.relabel('msg000002', remove=['TRASH'])
+
+    sync(service)
+
+    assert 'msg000002' in listed_ids(service)
+    stored = service.store.get_message('msg000002')
+    assert stored.has_body and stored.attachments
+    # The search index is rebuilt from the stored record, body included
+    assert [r.id for r in service.search_index.search('"Body of message 2"')] == ['msg000002']
+
+
+def test_expired_history_resyncs_without_losing_bodies(service, fake_gmail):
+    sync(service)
+    opened = service.get_message_by_id('msg000001')
+    fake_gmail.delete_message('msg000004', record=False)
+    fake_gmail.history_expired = True
+    round_trips = fake_gmail.round_trips
+
+    sync(service)
+
+    ids = listed_ids(service)
+    assert ids == [m['id'] for m in fake_gmail.messages[:SYNC_SIZE]]
+    assert 'msg000004' not in ids and service.store.get_message('msg000004') is None
+    assert service.search_index.search('subject:"Subject 4"') == []
+    assert service.store.get_message('msg000001').body == opened.body
+    # Served from the store; the resync did not make the open fetch it again
+    before = fake_gmail.calls
+    assert service.get_message_by_id('msg000001').body == opened.body
+    assert fake_gmail.calls == before
+    # The 404 from history, then getProfile, messages.list and a batch
+    assert fake_gmail.round_trips - round_trips == 4
+
+
+def test_opened_only_messages_stay_out_of_the_listing(service, fake_gmail):
+    sync(service)
+    old = fake_gmail.messages[SYNC_SIZE + 30]['id']
+
+    assert service.get_message_by_id(old).has_body
+    fake_gmail.relabel(old, add=['STARRED'])
+    fake_gmail.relabel(old, add=['TRASH'])
+    fake_gmail.relabel(old, remove=['TRASH'])
+    sync(service)
+
+    assert old not in listed_ids(service)
+    assert service.store.get_message(old).has_body
+    assert len(listed_ids(service)) == SYNC_SIZE
+
+
+def test_metadata_put_keeps_a_stored_body(tmp_path):
+    store = MessageStore(str(tmp_path / 'messages.db'))
+    raw = make_message(1)
+    service = gmail_service.GmailService()
+    full = service._extract_message_data(copy.deepcopy(raw))
+    store.put_messages([(raw, full)], listed=False)
+
+    metadata = EmailRecord.from_message(raw)
+    metadata.snippet = 'Edited snippet'
+    (_, stored), = store.put_messages([(raw, metadata)])
+
+    assert stored.body == full.body and stored.snippet == 'Edited snippet'
+    assert store.get_message(raw['id']) == stored
+    assert store.list_messages() == [stored]
@@ -0,0 +1,34 @@
+import pytest
+from conftest import FakeClock
+from endpoints.rate_limit import TokenBucket
+
+
+def test_burst_then_wait():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=3, clock=clock, sleep=clock.sleep)
+
+    assert [bucket.try_acquire() for _ in range(3)] == [0, 0, 0]
+    assert bucket.try_acquire() == pytest.approx(0.5)
+
+
+def test_refill_is_capped_at_capacity():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=10, capacity=2, clock=clock, sleep=clock.sleep)
+    bucket.try_acquire(2)
+
+    clock.now += 100
+    assert bucket.try_acquire(2) == 0
+    assert bucket.try_acquire() > 0
+
+
+def test_acquire_with_fractional_rate_terminates():
+    # rate=2.5 leaves float residue that used to spin acquire() forever
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2.5, capacity=1, clock=clock, sleep=clock.sleep)
+
+    for _ in range(200):
+        bucket.acquire()
+
+    # 199 tokens after the first one at 2.5/s
+    assert clock.now == pytest.approx(199 / 2.5)
+    assert len(clock.sleeps) < 400
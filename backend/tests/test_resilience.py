@@ -0,0 +1,226 @@
+import threading
+import pytest
+from conftest import FakeClock
+from endpoints import resilience
+from endpoints.resilience import CircuitBreaker, CircuitOpenError, Upstream
+
+
+class FakeResponse(dict):
+    """httplib2-style response: a header dict carrying the status"""
+
+    def __init__(self, status, **headers):
+        super().__init__(headers)
+        self.status = status
+
+
+class FakeHttpError(Exception):
+    """Shaped like googleapiclient.errors.HttpError"""
+
+    def __init__(self, status, **headers):
+        super().__init__(f'HTTP {status}')
+        self.resp = FakeResponse(status, **headers)
+
+
+class FlakyUpstream:
+    """Fault-injecting stand-in: raises or returns the scripted outcomes in order"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        outcome = self.outcomes.pop(0) if self.outcomes else 'ok'
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def events(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(resilience, 'metrics_hooks', [])
+    resilience.add_metrics_hook(lambda upstream, event, **data: recorded.append(event))
+    return recorded
+
+
+def make_upstream(clock, **options):
+    options.setdefault('base_delay', 0)
+    return Upstream('test', clock=clock, sleep=clock.sleep, **options)
+
+
+def test_retries_server_errors_then_succeeds(clock, events):
+    upstream = make_upstream(clock, max_attempts=3)
+    flaky = FlakyUpstream(FakeHttpError(503), ConnectionError('reset'), 'done')
+
+    assert upstream.call(flaky) == 'done'
+    assert flaky.calls == 3
+    assert events == ['retry', 'retry', 'success']
+    assert upstream.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_gives_up_after_max_attempts(clock, events):
+    upstream = make_upstream(clock, max_attempts=2)
+    flaky = FlakyUpstream(FakeHttpError(502), FakeHttpError(502), 'never')
+
+    with pytest.raises(FakeHttpError):
+        upstream.call(flaky)
+    assert flaky.calls == 2
+    assert events == ['retry', 'failure']
+
+
+def test_per_call_classifier_overrides_the_default(clock, events):
+    upstream = make_upstream(clock, max_attempts=3)
+    flaky = FlakyUpstream(FakeHttpError(503), 'twice')
+
+    with pytest.raises(FakeHttpError):
+        upstream.call_with(lambda error: (False, None), flaky)
+    assert flaky.calls == 1
+    assert upstream.call(flaky) == 'twice'
+
+
+def test_backoff_waits_for_retry_after(clock):
+    upstream = make_upstream(clock, max_delay=10)
+    flaky = FlakyUpstream(FakeHttpError(429, **{'retry-after': '4'}), 'done')
+
+    assert upstream.call(flaky) == 'done'
+    assert clock.sleeps == [4.0]
+
+
+def test_retry_after_is_capped_at_max_delay(clock):
+    upstream = make_upstream(clock, max_delay=2)
+    flaky = FlakyUpstream(FakeHttpError(503, **{'Retry-After': '3600'}), 'done')
+
+    upstream.call(flaky)
+    assert clock.sleeps == [2]
+
+
+def test_client_errors_are_not_retried_or_counted(clock, events):
+    upstream = make_upstream(clock, failure_threshold=1)
+    flaky = FlakyUpstream(FakeHttpError(400), 'done')
+
+    with pytest.raises(FakeHttpError):
+        upstream.call(flaky)
+    assert flaky.calls == 1
+    assert clock.sleeps == []
+    assert events == ['error']
+    assert upstream.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_circuit_opens_and_rejects_without_calling(clock, events):
+    upstream = make_upstream(clock, max_attempts=1, failure_threshold=2, reset_timeout=30)
+    flaky = FlakyUpstream(FakeHttpError(500), FakeHttpError(500))
+
+    for _ in range(2):
+        with pytest.raises(FakeHttpError):
+            upstream.call(flaky)
+    assert upstream.breaker.state == CircuitBreaker.OPEN
+
+    clock.now += 10
+    with pytest.raises(CircuitOpenError) as rejected:
+        upstream.call(flaky)
+    assert rejected.value.retry_in == pytest.approx(20)
+    assert flaky.calls == 2
+    assert events == ['failure', 'circuit_open', 'failure', 'rejected']
+
+
+def test_opening_the_circuit_skips_the_remaining_backoff(clock):
+    upstream = make_upstream(clock, max_attempts=5, failure_threshold=2)
+    flaky = FlakyUpstream(*[FakeHttpError(503)] * 5)
+
+    with pytest.raises(FakeHttpError):
+        upstream.call(flaky)
+    assert flaky.calls == 2
+    assert len(clock.sleeps) == 1
+
+
+def test_half_open_probe_closes_on_success(clock):
+    upstream = make_upstream(clock, max_attempts=1, failure_threshold=1, reset_timeout=30)
+    with pytest.raises(FakeHttpError):
+        upstream.call(FlakyUpstream(FakeHttpError(503)))
+
+    clock.now += 30
+    assert upstream.call(FlakyUpstream('recovered')) == 'recovered'
+    assert upstream.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_probe_failure_reopens(clock):
+    upstream = make_upstream(clock, max_attempts=1, failure_threshold=3, reset_timeout=30)
+    for _ in range(3):
+        with pytest.raises(FakeHttpError):
+            upstream.call(FlakyUpstream(FakeHttpError(503)))
+
+    clock.now += 30
+    # A single failed probe is enough; the threshold only applies while closed
+    with pytest.raises(FakeHttpError):
+        upstream.call(FlakyUpstream(FakeHttpError(503)))
+    assert upstream.breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        upstream.call(FlakyUpstream('unreached'))
+
+
+def test_half_open_lets_one_probe_through(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5, clock=clock)
+    breaker.record_failure()
+    clock.now += 5
+
+    assert breaker.allow() == 0
+    assert breaker.allow() > 0
+    breaker.release_probe()
+    assert breaker.allow() == 0
+
+
+def test_quota_errors_never_open_the_circuit(clock):
+    quota = lambda error: isinstance(error, FakeHttpError) and error.resp.status == 429
+    upstream = make_upstream(clock, max_attempts=1, failure_threshold=1, is_quota_error=quota)
+
+    for _ in range(5):
+        with pytest.raises(FakeHttpError):
+            upstream.call(FlakyUpstream(FakeHttpError(429)))
+    assert upstream.breaker.state == CircuitBreaker.CLOSED
+    assert upstream.call(FlakyUpstream('served')) == 'served'
+
+
+def test_openai_style_errors_are_classified():
+    class Response:
+        headers = {'retry-after': '1.5'}
+
+    class StatusError(Exception):
+        status_code = 503
+        response = Response()
+
+    assert resilience.default_classifier(StatusError()) == (True, 1.5)
+    assert resilience.default_classifier(ValueError()) == (False, None)
+
+
+def test_concurrency_cap_is_enforced():
+    upstream = Upstream('capped', max_concurrency=2)
+    in_flight = 0
+    peak = 0
+    lock = threading.Lock()
+    release = threading.Event()
+
+    def slow_call():
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        release.wait(5)
+        with lock:
+            in_flight -= 1
+
+    threads = [threading.Thread(target=upstream.call, args=(slow_call,)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    # Give every thread the chance to reach the semaphore before letting them go
+    threading.Event().wait(0.2)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert peak == 2
@@ -0,0 +1,153 @@
+import pytest
+from fake_gmail import make_message
+from backend.endpoints.email_record import EmailRecord
+from backend.endpoints.search_index import SearchIndex
+
+to_fts = SearchIndex._to_fts_query
+
+
+def metadata(index, subject=None, snippet=None):
+    raw = make_message(index)
+    record = EmailRecord.from_message(raw)
+    if subject is not None:
+        record.subject = subject
+    if snippet is not None:
+        record.snippet = snippet
+    return raw, record
+
+
+def full(index, body, **kwargs):
+    raw, record = metadata(index, **kwargs)
+    record.body, record.attachments = body, []
+    return raw, record
+
+
+@pytest.fixture
+def index(tmp_path):
+    return SearchIndex(str(tmp_path / 'search.db'))
+
+
+def ids(records):
+    return [record.id for record in records]
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('invoice', '"invoice"'),
+    ('quarterly report', '"quarterly" "report"'),
+    ('"quarterly report"', '"quarterly report"'),
+    ('rep*', '"rep"*'),
+    # A star inside quotes is not a prefix operator
+    ('"rep*"', '"rep"'),
+    ('from:alice', 'sender : "alice"'),
+    ('From:alice@example.com', 'sender : "alice@example.com"'),
+    ('subject:"Q3 plan" budget', 'subject : "Q3 plan" "budget"'),
+    ('say "hi"', '"say" "hi"'),
+    ('e-mail', '"e-mail"'),
+])
+def test_supported_queries_translate_to_fts(query, expected):
+    assert to_fts(query) == expected
+
+
+@pytest.mark.parametrize('query', [
+    '',
+    '""',
+    '-draft',
+    'report -draft',
+    'report OR invoice',
+    'report AND invoice',
+    '(report invoice)',
+    '{report invoice}',
+    'label:work',
+    'is:unread report',
+    'after:2024/01/01',
+])
+def test_queries_only_gmail_can_answer_return_none(query):
+    assert to_fts(query) is None
+
+
+def test_exclusion_is_never_answered_as_inclusion(index):
+    # "report -draft" once became an FTS query for report AND draft
+    index.add([full(1, 'The report is still a draft'), full(2, 'Final report')])
+
+    assert index.search('report -draft') is None
+    assert ids(index.search('report')) == ['msg000001', 'msg000002']
+
+
+def test_words_phrases_prefixes_and_operators(index):
+    index.add([
+        full(1, 'Quarterly report attached', subject='Q3 numbers'),
+        full(2, 'Report on the quarterly offsite', subject='Offsite'),
+        full(3, 'Lunch?', subject='Reporting lines'),
+    ])
+
+    assert ids(index.search('quarterly report')) == ['msg000001', 'msg000002']
+    assert ids(index.search('"quarterly report"')) == ['msg000001']
+    assert ids(index.search('report*')) == ['msg000001', 'msg000002', 'msg000003']
+    assert ids(index.search('subject:offsite')) == ['msg000002']
+    assert ids(index.search('from:sender3')) == ['msg000003']
+    assert index.search('nothing-like-this') == []
+
+
+def test_metadata_record_is_reindexed_with_its_body(index):
+    index.add([metadata(1, snippet='Short preview')])
+    assert ids(index.search('preview')) == ['msg000001']
+    assert index.search('reconciliation') == []
+
+    index.add([full(1, 'Full text mentions reconciliation')])
+
+    assert ids(index.search('reconciliation')) == ['msg000001']
+    assert index.search('preview') == []
+    assert index.search('reconciliation')[0].has_body
+
+
+def test_metadata_record_does_not_drop_an_indexed_body(index):
+    index.add([full(1, 'Full text mentions reconciliation')])
+
+    index.add([metadata(1, subject='Renamed thread')])
+
+    (record,) = index.search('reconciliation')
+    assert record.subject == 'Renamed thread' and record.has_body
+    assert ids(index.search('subject:renamed')) == ['msg000001']
+
+
+def test_removed_messages_leave_the_index(index):
+    index.add([full(1, 'alpha'), full(2, 'alpha')])
+
+    index.remove(['msg000001', 'msg999999'])
+
+    assert ids(index.search('alpha')) == ['msg000002']
+    index.clear()
+    assert index.search('alpha') == []
+
+
+@pytest.fixture
+def service(fake_gmail, index):
+    from backend.endpoints.gmail_service import GmailService
+    return fake_gmail.connect(GmailService(search_index=index))
+
+
+def test_full_page_of_local_hits_skips_gmail(service, fake_gmail, index):
+    index.add([full(i, f'budget review {i}') for i in range(3)])
+
+    page = service.get_messages('budget', max_results=3)
+
+    assert ids(page['messages']) == ['msg000000', 'msg000001', 'msg000002']
+    assert page['partial'] and page['next_page_token'] is None
+    assert fake_gmail.round_trips == 0
+
+
+@pytest.mark.parametrize('query, page_token, hits', [
+    # Two hits cannot fill a page of three, and the rest of the mailbox was never indexed
+    ('budget', None, 2),
+    ('budget -draft', None, 3),
+    ('label:work budget', None, 3),
+    ('budget', '3', 3),
+])
+def test_local_search_falls_back_to_gmail(service, fake_gmail, index, query, page_token, hits):
+    index.add([full(i, f'budget review {i}') for i in range(hits)])
+
+    page = service.get_messages(query, max_results=3, page_token=page_token)
+
+    assert 'partial' not in page
+    assert len(page['messages']) == 3
+    assert fake_gmail.round_trips > 0
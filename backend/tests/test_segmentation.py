@@ -0,0 +1,83 @@
+import io
+import pytest
+from audio_fixtures import recording, silence, wav_bytes
+from backend.endpoints.segmentation import FRAME_MS, split_on_silence
+
+BYTES_PER_SECOND = 16000 * 2
+# Timestamps land on 30 ms frames, and real pauses are padded by 150 ms
+TOLERANCE = 0.2
+
+# Three utterances: 0.5-1.5 s, 2.5-5.7 s (a 0.2 s breath inside) and 6.7-9.7 s
+SPEECH = [(0.5, False), (1, True), (1, False), (2, True), (0.2, False), (1, True), (1, False), (3, True), (0.5, False)]
+
+
+def spans(segments):
+    return [(segment.start, segment.end) for segment in segments]
+
+
+@pytest.mark.parametrize('noise', [0.0, 0.005])
+def test_splits_on_pauses_not_on_breaths(noise):
+    segments = split_on_silence(recording(SPEECH, noise=noise), min_silence_ms=400)
+
+    assert [segment.index for segment in segments] == [0, 1, 2]
+    for (start, end), expected in zip(spans(segments), [(0.5, 1.5), (2.5, 5.7), (6.7, 9.7)]):
+        assert start == pytest.approx(expected[0], abs=TOLERANCE)
+        assert end == pytest.approx(expected[1], abs=TOLERANCE)
+
+
+def test_segment_audio_matches_its_timestamps():
+    pcm = recording(SPEECH)
+
+    for segment in split_on_silence(pcm):
+        offset = round(segment.start * 1000 / FRAME_MS) * FRAME_MS * BYTES_PER_SECOND // 1000
+        assert segment.pcm == pcm[offset:offset + len(segment.pcm)]
+        assert len(segment.pcm) / BYTES_PER_SECOND == pytest.approx(segment.end - segment.start)
+
+
+def test_long_speech_is_cut_into_contiguous_pieces():
+    pcm = recording([(0.5, False), (70, True), (0.5, False)])
+
+    segments = split_on_silence(pcm, max_segment_seconds=30)
+
+    assert len(segments) > 2
+    assert all(segment.end - segment.start <= 30 for segment in segments)
+    # Forced cuts neither overlap nor drop audio
+    for previous, following in zip(segments, segments[1:]):
+        assert previous.end == following.start
+    assert segments[0].start == pytest.approx(0.5, abs=TOLERANCE)
+    assert segments[-1].end == pytest.approx(70.5, abs=TOLERANCE)
+
+
+def test_silence_yields_no_segments():
+    assert split_on_silence(silence(3).tobytes()) == []
+    assert split_on_silence(silence(3, noise=0.001).tobytes()) == []
+    assert split_on_silence(b'') == []
+
+
+def test_segments_are_transcribed_and_reassembled_in_order(monkeypatch):
+    pytest.importorskip('speech_recognition')
+    from backend.endpoints.audio_ingest import decode_audio
+    from backend.endpoints.stt_service import SpeechToTextService
+
+    def fake_transcribe_one(self, method, audio):
+        # Answers with the segment's length so the order is checkable
+        seconds = round(audio.duration_seconds)
+        if seconds == 2:
+            return {'success': False, 'error': 'segment failed', 'method': method}
+        return {'success': True, 'transcription': f'{seconds}s', 'language': 'en', 'method': method}
+
+    monkeypatch.setattr(SpeechToTextService, '_transcribe_one', fake_transcribe_one)
+    pattern = [(0.5, False), (1, True), (1, False), (2, True), (1, False), (3, True), (0.5, False)]
+    progress = []
+
+    result = SpeechToTextService().transcribe_segmented(
+        decode_audio(io.BytesIO(wav_bytes(recording(pattern)))), 'google',
+        progress=lambda done, total: progress.append((done, total))
+    )
+
+    assert result['success'] is True
+    assert result['transcription'] == '1s 3s'
+    assert [entry['text'] for entry in result['segments']] == ['1s', '', '3s']
+    assert result['segments'][1]['error'] == 'segment failed'
+    assert result['segments'][0]['start'] < result['segments'][1]['start'] < result['segments'][2]['start']
+    assert progress == [(1, 3), (2, 3), (3, 3)]
@@ -0,0 +1,42 @@
+import json
+import os
+import subprocess
+import sys
+from conftest import BACKEND_DIR
+
+# Runs in a fresh interpreter: any network call at import time fails loudly
+PROBE = '''
+import json, sys
+import requests
+
+def no_network(*args, **kwargs):
+    raise AssertionError('network call during import')
+
+requests.get = requests.request = no_network
+
+import app
+import endpoints.translation_service
+import endpoints.whisper_model
+import endpoints.audio_ingest
+
+response = app.app.test_client().get('/api/hello')
+heavy = sorted(name for name in ('whisper', 'torch', 'openai', 'pydub') if name in sys.modules)
+print(json.dumps({'status': response.status_code, 'heavy': heavy}))
+'''
+
+
+def test_import_does_no_network_io_or_heavy_imports(tmp_path):
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join((BACKEND_DIR, os.path.dirname(BACKEND_DIR))),
+        DATABASE_URL=f'sqlite:///{tmp_path / "users.db"}',
+        WARMUP_ON_START='0'
+    )
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=60
+    )
+
+    assert result.returncode == 0, result.stderr
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    assert report == {'status': 200, 'heavy': []}
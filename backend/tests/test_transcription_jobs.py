@@ -0,0 +1,253 @@
+import importlib
+import importlib.util
+import io
+import json
+import os
+import sys
+import threading
+import time
+import types
+import pytest
+from audio_fixtures import tone, wav_bytes
+from backend.endpoints.transcription_jobs import (
+    InlineBackend, JobStore, QueueFull, ThreadQueueBackend, TranscriptionJob, TranscriptionJobs
+)
+from config import Config
+
+WAV = wav_bytes(tone(1).tobytes())
+
+
+class StubSpeech:
+    """Stands in for SpeechToTextService: reports two segments, then answers with the clip length"""
+
+    def __init__(self, success=True):
+        self.success = success
+        self.calls = []
+
+    def transcribe(self, audio, method='google', progress=None):
+        self.calls.append((audio.duration_seconds, method))
+        if progress:
+            progress(1, 2)
+            progress(2, 2)
+        if not self.success:
+            return {'success': False, 'error': 'Could not understand audio', 'method': method}
+        return {'success': True, 'transcription': f'{audio.duration_seconds:.0f}s of audio', 'method': method}
+
+
+class HeldBackend:
+    """Keeps submitted tasks until the test runs them"""
+
+    def __init__(self):
+        self.tasks = []
+
+    def submit(self, task):
+        self.tasks.append(task)
+
+    def pending(self):
+        return len(self.tasks)
+
+
+def wait_until_finished(store, job_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    job = store.get(job_id)
+    while not job.finished and time.monotonic() < deadline:
+        job = store.wait_for_change(job_id, job.version, timeout=0.5)
+    return job
+
+
+def test_inline_job_runs_to_completion():
+    speech = StubSpeech()
+    jobs = TranscriptionJobs(speech, backend=InlineBackend())
+
+    job = jobs.submit(WAV, 'audio/wav', method='sphinx')
+
+    assert job.status == 'done' and job.progress == 1.0
+    assert job.result['transcription'] == '1s of audio'
+    assert speech.calls == [(1.0, 'sphinx')]
+    assert jobs.get(job.id).to_dict()['status'] == 'done'
+
+
+def test_unsuccessful_and_undecodable_jobs_fail():
+    jobs = TranscriptionJobs(StubSpeech(success=False), backend=InlineBackend())
+
+    unheard = jobs.submit(WAV)
+    assert unheard.status == 'failed' and unheard.error == 'Could not understand audio'
+
+    empty = jobs.submit(b'')
+    assert empty.status == 'failed' and empty.error.startswith('Transcription failed')
+
+
+def test_full_queue_rejects_and_forgets_the_job():
+    store = JobStore()
+    jobs = TranscriptionJobs(StubSpeech(), backend=ThreadQueueBackend(workers=0, max_queue=1), store=store)
+    jobs.submit(WAV)
+
+    with pytest.raises(QueueFull):
+        jobs.submit(WAV)
+    assert len(store._jobs) == 1
+
+
+def test_thread_backend_runs_jobs():
+    store = JobStore()
+    jobs = TranscriptionJobs(StubSpeech(), backend=ThreadQueueBackend(workers=2, max_queue=4), store=store)
+
+    finished = [wait_until_finished(store, jobs.submit(WAV).id) for _ in range(3)]
+
+    assert [job.status for job in finished] == ['done'] * 3
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork')
+@pytest.mark.parametrize('used_before_fork', [False, True])
+def test_thread_backend_works_in_a_forked_worker(used_before_fork):
+    # gunicorn --preload builds the backend in the master, then forks the workers
+    backend = ThreadQueueBackend(workers=1, max_queue=4)
+    if used_before_fork:
+        done = threading.Event()
+        backend.submit(done.set)
+        assert done.wait(5)
+    read_end, write_end = os.pipe()
+
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.close(read_end)
+            ran = threading.Event()
+            backend.submit(ran.set)
+            os.write(write_end, b'ran' if ran.wait(5) else b'stuck')
+        finally:
+            os._exit(0)
+
+    os.close(write_end)
+    with os.fdopen(read_end, 'rb') as pipe:
+        outcome = pipe.read()
+    os.waitpid(pid, 0)
+    assert outcome == b'ran'
+
+
+def test_wait_for_change_wakes_on_update_and_times_out():
+    store = JobStore()
+    store.add(TranscriptionJob(id='job', method='google'))
+
+    threading.Timer(0.05, store.update, args=('job',), kwargs={'stage': 'decoding'}).start()
+    changed = store.wait_for_change('job', 0, timeout=5)
+    assert changed.version == 1 and changed.stage == 'decoding'
+
+    started = time.monotonic()
+    unchanged = store.wait_for_change('job', 1, timeout=0.05)
+    assert unchanged.version == 1
+    assert time.monotonic() - started >= 0.05
+
+    threading.Timer(0.05, store.remove, args=('job',)).start()
+    assert store.wait_for_change('job', 1, timeout=5) is None
+
+
+def test_snapshots_do_not_change_under_the_caller():
+    store = JobStore()
+    store.add(TranscriptionJob(id='job', method='google'))
+    snapshot = store.get('job')
+
+    store.update('job', status='running')
+
+    assert snapshot.status == 'queued'
+
+
+def test_finished_jobs_expire_after_the_ttl():
+    store = JobStore(ttl=60)
+    store.add(TranscriptionJob(id='old', method='google'))
+    store.add(TranscriptionJob(id='running', method='google'))
+    store.update('old', status='done')
+    store._jobs['old'].updated_at -= 120
+    store._jobs['running'].updated_at -= 120
+
+    store.add(TranscriptionJob(id='new', method='google'))
+
+    assert store.get('old') is None
+    assert store.get('running') is not None
+
+
+@pytest.fixture
+def sst(monkeypatch):
+    """The sst app with a stub speech service, importable without speech_recognition"""
+    names = ('backend.endpoints.sst', 'backend.endpoints.stt_service')
+    saved = {name: sys.modules.pop(name, None) for name in names}
+    if importlib.util.find_spec('speech_recognition') is None:
+        stub = types.ModuleType('speech_recognition')
+        stub.Recognizer = object
+        stub.RequestError = type('RequestError', (Exception,), {})
+        stub.UnknownValueError = type('UnknownValueError', (Exception,), {})
+        monkeypatch.setitem(sys.modules, 'speech_recognition', stub)
+    module = importlib.import_module('backend.endpoints.sst')
+    monkeypatch.setattr(module, 'transcription_jobs', TranscriptionJobs(StubSpeech(), backend=InlineBackend()))
+    yield module
+    for name in names:
+        sys.modules.pop(name, None)
+        if saved[name] is not None:
+            sys.modules[name] = saved[name]
+
+
+def post_audio(client, data=WAV):
+    return client.post(
+        '/api/transcribe/jobs?method=google',
+        data={'audio': (io.BytesIO(data), 'clip.wav', 'audio/wav')},
+        content_type='multipart/form-data'
+    )
+
+
+def parse_events(chunks):
+    """[(event, data)] from SSE chunks; keep-alive comments become ('keep-alive', None)"""
+    events = []
+    for block in b''.join(chunks).decode().split('\n\n'):
+        if block.startswith(': keep-alive'):
+            events.append(('keep-alive', None))
+        elif block:
+            fields = dict(line.split(': ', 1) for line in block.splitlines())
+            events.append((fields['event'], json.loads(fields['data'])))
+    return events
+
+
+def test_job_endpoints_report_the_result(sst):
+    client = sst.app.test_client()
+
+    response = post_audio(client)
+
+    assert response.status_code == 202
+    body = response.get_json()
+    assert body['job']['status'] == 'done'
+    polled = client.get(body['status_url']).get_json()['job']
+    assert polled['result']['transcription'] == '1s of audio'
+    assert client.get('/api/transcribe/jobs/missing').status_code == 404
+
+
+def test_full_queue_answers_503_with_retry_after(sst, monkeypatch):
+    backend = ThreadQueueBackend(workers=0, max_queue=1)
+    monkeypatch.setattr(sst, 'transcription_jobs', TranscriptionJobs(StubSpeech(), backend=backend))
+    client = sst.app.test_client()
+
+    assert post_audio(client).status_code == 202
+    response = post_audio(client)
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '5'
+
+
+def test_event_stream_follows_the_job_to_its_result(sst, monkeypatch):
+    backend = HeldBackend()
+    monkeypatch.setattr(sst, 'transcription_jobs', TranscriptionJobs(StubSpeech(), backend=backend))
+    monkeypatch.setattr(Config, 'TRANSCRIBE_SSE_HEARTBEAT', 0.05)
+    client = sst.app.test_client()
+    job_id = post_audio(client).get_json()['job']['id']
+
+    response = client.get(f'/api/transcribe/jobs/{job_id}/events', buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    stream = iter(response.response)
+    chunks = [next(stream), next(stream)]
+    # Nothing has run yet, so the second chunk is a heartbeat
+    backend.tasks.pop()()
+    chunks.extend(stream)
+
+    events = parse_events(chunks)
+    assert events[0][0] == 'progress' and events[0][1]['status'] == 'queued'
+    assert events[1] == ('keep-alive', None)
+    assert events[-1][0] == 'result' and events[-1][1]['status'] == 'done'
+    assert [event for event, _ in events[2:-1]] == ['progress'] * (len(events) - 3)
+    assert client.get('/api/transcribe/jobs/missing/events').status_code == 404
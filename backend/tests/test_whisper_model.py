@@ -0,0 +1,187 @@
+import gc
+import json
+import os
+import sys
+import threading
+import time
+import types
+import pytest
+from backend.endpoints.whisper_model import WhisperModelManager
+
+
+class FakeModel:
+    """Stands in for a Whisper model; records overlapping transcribe() calls"""
+
+    def __init__(self, size):
+        self.size = size
+        self.active = 0
+        self.max_active = 0
+
+    def eval(self):
+        return self
+
+    def transcribe(self, samples, **options):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        time.sleep(0.01)
+        self.active -= 1
+        return {'text': f' {len(samples)} samples ', 'language': 'en', 'options': options}
+
+
+@pytest.fixture
+def whisper(monkeypatch):
+    """whisper and torch stand-ins; load_model blocks while whisper.gate is cleared"""
+    module = types.ModuleType('whisper')
+    module.loads = []
+    module.gate = threading.Event()
+    module.gate.set()
+
+    def load_model(size, device=None):
+        module.gate.wait(5)
+        module.loads.append((size, device))
+        return FakeModel(size)
+
+    module.load_model = load_model
+    torch = types.ModuleType('torch')
+    torch.thread_calls = []
+    torch.set_num_threads = torch.thread_calls.append
+    monkeypatch.setitem(sys.modules, 'whisper', module)
+    monkeypatch.setitem(sys.modules, 'torch', torch)
+    module.torch = torch
+    return module
+
+
+def test_missing_whisper_is_reported_not_raised(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'whisper', None)
+    manager = WhisperModelManager('base', torch_threads=2)
+
+    assert manager.load() is False
+    assert manager.state == manager.FAILED
+    assert manager.status()['error']
+    assert manager.get() is None
+    assert manager.transcribe([0.0]) is None
+
+
+def test_model_is_loaded_once(whisper):
+    manager = WhisperModelManager('base', torch_threads=2)
+
+    assert manager.load() and manager.load()
+    assert whisper.loads == [('base', 'cpu')]
+    status = manager.status()
+    assert status['state'] == 'ready' and status['model'] == 'base'
+    assert status['load_seconds'] is not None
+
+
+def test_changing_the_size_reloads(whisper):
+    manager = WhisperModelManager('base', torch_threads=2)
+    manager.load()
+
+    manager.load('small')
+
+    assert whisper.loads == [('base', 'cpu'), ('small', 'cpu')]
+    assert manager.model.size == 'small'
+
+
+def test_background_load_does_not_block_readiness_checks(whisper):
+    manager = WhisperModelManager('base', torch_threads=2)
+    whisper.gate.clear()
+
+    manager.load_in_background()
+    manager.load_in_background()
+
+    assert manager.state == manager.LOADING
+    assert manager.get() is None
+    whisper.gate.set()
+    deadline = time.monotonic() + 5
+    while not manager.ready and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert manager.ready
+    assert len(whisper.loads) == 1
+
+
+def test_preload_freezes_the_heap(whisper, monkeypatch):
+    frozen = []
+    monkeypatch.setattr(gc, 'freeze', lambda: frozen.append(True))
+    manager = WhisperModelManager('base', torch_threads=2)
+
+    assert manager.preload()
+    assert frozen == [True]
+
+
+def test_preload_failure_leaves_the_heap_alone(monkeypatch):
+    frozen = []
+    monkeypatch.setattr(gc, 'freeze', lambda: frozen.append(True))
+    monkeypatch.setitem(sys.modules, 'whisper', None)
+
+    assert WhisperModelManager('base', torch_threads=2).preload() is False
+    assert frozen == []
+
+
+def test_inference_is_serialized(whisper):
+    manager = WhisperModelManager('base', torch_threads=2)
+    manager.load()
+    results = []
+
+    threads = [threading.Thread(target=lambda: results.append(manager.transcribe([0.0] * 10, fp16=False)))
+               for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [result['text'] for result in results] == [' 10 samples '] * 6
+    assert manager.model.max_active == 1
+
+
+def test_threads_are_pinned_once_per_process(whisper):
+    manager = WhisperModelManager('base', torch_threads=3)
+    manager.load()
+
+    manager.get()
+    manager.get()
+
+    assert whisper.torch.thread_calls == [3]
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork')
+def test_forked_workers_pin_their_own_thread_budget(whisper):
+    manager = WhisperModelManager('base', torch_threads=3)
+    manager.load()
+    manager.get()
+    read_end, write_end = os.pipe()
+
+    pid = os.fork()
+    if pid == 0:
+        # Worker: the model is inherited, the thread pin is not
+        try:
+            os.close(read_end)
+            model = manager.get()
+            os.write(write_end, json.dumps({
+                'ready': manager.ready,
+                'same_model': model is not None and model.size == 'base',
+                'thread_calls': whisper.torch.thread_calls
+            }).encode())
+        finally:
+            os._exit(0)
+
+    os.close(write_end)
+    with os.fdopen(read_end) as pipe:
+        child = json.loads(pipe.read())
+    os.waitpid(pid, 0)
+
+    assert child == {'ready': True, 'same_model': True, 'thread_calls': [3, 3]}
+    assert whisper.torch.thread_calls == [3]
+
+
+def test_methods_endpoint_reports_whisper_readiness(whisper, monkeypatch):
+    pytest.importorskip('speech_recognition')
+    from backend.endpoints import sst
+    manager = WhisperModelManager('base', torch_threads=2)
+    monkeypatch.setattr(sst.speech_service, 'whisper_models', manager)
+    client = sst.app.test_client()
+
+    assert client.get('/api/transcribe/methods').get_json()['available']['whisper'] is False
+    manager.load()
+    body = client.get('/api/transcribe/methods').get_json()
+    assert body['available']['whisper'] is True
+    assert body['whisper']['state'] == 'ready'
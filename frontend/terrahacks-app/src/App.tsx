@@ -16,7 +16,18 @@ import {
 import { PrivateRoute } from './auth/privateRoute'
 import RecordingPage from './pages/recording-page'
 
+import { useEffect } from 'react'
+import { useAuth0 } from '@auth0/auth0-react'
+import { setAccessTokenProvider } from './services/api'
+
 export default function App() {
+  const { getAccessTokenSilently, isAuthenticated } = useAuth0();
+
+  // Attach the Auth0 access token to every backend API call
+  useEffect(() => {
+    setAccessTokenProvider(isAuthenticated ? () => getAccessTokenSilently() : null);
+  }, [getAccessTokenSilently, isAuthenticated]);
+
   return (
     <Routes>
       <Route path="/" element={<Home/>}/>
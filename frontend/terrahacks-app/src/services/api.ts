@@ -7,6 +7,22 @@ const api = axios.create({
   withCredentials: true,
 });
 
+// The Gmail and profile routes require an Auth0 bearer token; App registers
+// getAccessTokenSilently here once Auth0 is available
+let getAccessToken: (() => Promise<string>) | null = null;
+
+export const setAccessTokenProvider = (provider: (() => Promise<string>) | null) => {
+  getAccessToken = provider;
+};
+
+api.interceptors.request.use(async (config) => {
+  if (getAccessToken) {
+    const token = await getAccessToken();
+    config.headers.Authorization = `Bearer ${token}`;
+  }
+  return config;
+});
+
 export const authAPI = {
   login: () => api.get('/auth/login'),
   status: () => api.get('/auth/status'),